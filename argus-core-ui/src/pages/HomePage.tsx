@@ -1,7 +1,7 @@
 import { useState, useRef, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './App.css';
-import { uploadVideoForAnalysis, getClip, getIncident } from '../services/api';
+import { uploadVideoForAnalysis, getClipStreamUrl, getIncident, openIncidentStream } from '../services/api';
 import { QRCodeSVG } from 'qrcode.react';
 
 const HomePage: React.FC = () => {
@@ -11,6 +11,7 @@ const HomePage: React.FC = () => {
   
   const [isPlaying, setIsPlaying] = useState(false);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
+  const [analysisProgress, setAnalysisProgress] = useState<number | null>(null);
   const [detectedAnomalies, setDetectedAnomalies] = useState<any[]>([]);
   const [showEmailAlertPopup, setShowEmailAlertPopup] = useState(false);
   
@@ -35,8 +36,20 @@ const HomePage: React.FC = () => {
       // Route through the Vite proxy and pass the secure token
       const wsUrl = `${protocol}//${window.location.host}/ws/live/${sessionId}/desktop?token=${token}`;
       const ws = new WebSocket(wsUrl);
+      ws.binaryType = 'arraybuffer';
+      let frameObjectUrl: string | null = null;
       
       ws.onmessage = (event) => {
+        // Binary messages are relayed camera frames: 12-byte header followed by JPEG bytes
+        if (event.data instanceof ArrayBuffer) {
+          if (frameObjectUrl) URL.revokeObjectURL(frameObjectUrl);
+          frameObjectUrl = URL.createObjectURL(new Blob([event.data.slice(12)], { type: 'image/jpeg' }));
+          if (videoRef.current) {
+             videoRef.current.src = frameObjectUrl;
+          }
+          return;
+        }
+
         const data = JSON.parse(event.data);
         
         if (data.type === 'frame') {
@@ -49,7 +62,10 @@ const HomePage: React.FC = () => {
         }
       };
       
-      return () => ws.close(); 
+      return () => {
+        ws.close();
+        if (frameObjectUrl) URL.revokeObjectURL(frameObjectUrl);
+      };
     }
   }, [activeTab, sessionId]);
 
@@ -87,6 +103,7 @@ const HomePage: React.FC = () => {
     if (!selectedFile) return;
     
     setIsAnalyzing(true);
+    setAnalysisProgress(null);
     setDetectedAnomalies([]);
 
     try {
@@ -94,9 +111,8 @@ const HomePage: React.FC = () => {
       const { clip_id, incident_id } = response.data;
 
       if (clip_id) {
-          const clipResponse = await getClip(clip_id);
-          const secureBlobUrl = URL.createObjectURL(clipResponse.data);
-          setVideoUrl(secureBlobUrl);
+          const streamUrl = await getClipStreamUrl(clip_id);
+          setVideoUrl(streamUrl);
           
           if (videoRef.current) {
               videoRef.current.load();
@@ -106,19 +122,17 @@ const HomePage: React.FC = () => {
       }
 
       if (incident_id) {
-          let isProcessing = true;
-          
-          while (isProcessing) {
-              await new Promise(resolve => setTimeout(resolve, 3000));
-              
-              try {
-                  const statusRes = await getIncident(incident_id);
-                  const incident = statusRes.data;
+          // The server pushes progress and the final status; no polling
+          await new Promise<void>((resolve) => {
+              let done = false;
+              const checkFinished = async () => {
+                  if (done) return;
+                  try {
+                      const statusRes = await getIncident(incident_id);
+                      const incident = statusRes.data;
+                      if (incident.status === "analyzing" || done) return;
+                      done = true;
 
-                  if (incident.status !== "analyzing") {
-                      isProcessing = false;
-                      setIsAnalyzing(false);
-                      
                       if (incident.note) {
                           const parsedEvents = JSON.parse(incident.note);
                           setDetectedAnomalies(parsedEvents);
@@ -127,13 +141,27 @@ const HomePage: React.FC = () => {
                       if (incident.status === "detected_from_upload") {
                           setShowEmailAlertPopup(true);
                       }
+                  } catch (statusError) {
+                      console.error("Error checking status:", statusError);
+                      done = true;
                   }
-              } catch (pollError) {
-                  console.error("Error checking status:", pollError);
-                  isProcessing = false; 
+                  stream.close();
                   setIsAnalyzing(false);
-              }
-          }
+                  setAnalysisProgress(null);
+                  resolve();
+              };
+              const stream = openIncidentStream({
+                  'incident.updated': (data) => {
+                      if (data.id === incident_id && data.status !== 'analyzing') checkFinished();
+                  },
+                  'analysis.progress': (data) => {
+                      if (data.incident_id === incident_id) setAnalysisProgress(data.percent);
+                  },
+                  'reset': () => checkFinished(),
+              });
+              // Also check on every (re)connect, in case analysis finished before we subscribed
+              stream.onopen = () => { checkFinished(); };
+          });
       }
 
     } catch (error: any) {
@@ -291,7 +319,9 @@ const HomePage: React.FC = () => {
         <h2>Analysis Results</h2>
         <ul className="timestamp-list">
           {isAnalyzing ? (
-            <li style={{ color: 'var(--accent-blue)' }}>Running 3D CNN inference...</li>
+            <li style={{ color: 'var(--accent-blue)' }}>
+              Running 3D CNN inference...{analysisProgress !== null ? ` ${analysisProgress}%` : ''}
+            </li>
           ) : detectedAnomalies.length > 0 ? (
             detectedAnomalies.map((ts, index) => (
               <li key={index} className="timestamp-item" style={{ padding: '10px', background: 'rgba(215, 38, 56, 0.1)', borderRadius: '8px', marginBottom: '8px', border: '1px solid var(--accent-red)' }}>
@@ -2,7 +2,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
 // Import the new downloadClip function
-import { getIncidentById, downloadClip } from '../services/api';
+import { getIncidentById, getIncidentTimeline, downloadClip, getClipStreamUrl, openIncidentStream } from '../services/api';
 
 // Define types for clarity
 interface Clip {
@@ -25,6 +25,38 @@ interface Incident {
   clips: Clip[];
 }
 
+interface Timeline {
+  samples: number;
+  frame_start: number[];
+  frame_end: number[];
+  series: { [name: string]: { min: number[]; max: number[] } };
+}
+
+const CHART_WIDTH = 600;
+const CHART_HEIGHT = 120;
+
+// Draws the min/max envelope of the anomaly score (1 - P(normal)) as a filled band
+const ScoreTimeline: React.FC<{ timeline: Timeline }> = ({ timeline }) => {
+  const anomaly = timeline.series.anomaly;
+  if (!anomaly || anomaly.max.length === 0) return null;
+  const n = anomaly.max.length;
+  const x = (i: number) => (n === 1 ? CHART_WIDTH / 2 : (i / (n - 1)) * CHART_WIDTH);
+  const y = (v: number) => CHART_HEIGHT - v * CHART_HEIGHT;
+  const upper = anomaly.max.map((v, i) => `${x(i).toFixed(1)},${y(v).toFixed(1)}`);
+  const lower = anomaly.min.map((v, i) => `${x(i).toFixed(1)},${y(v).toFixed(1)}`).reverse();
+  return (
+    <svg
+      viewBox={`0 0 ${CHART_WIDTH} ${CHART_HEIGHT}`}
+      preserveAspectRatio="none"
+      style={{ width: '100%', height: CHART_HEIGHT, background: 'rgba(255,255,255,0.03)' }}
+    >
+      <line x1={0} x2={CHART_WIDTH} y1={y(0.5)} y2={y(0.5)} stroke="currentColor" strokeOpacity={0.2} strokeDasharray="4 4" />
+      <polygon points={[...upper, ...lower].join(' ')} fill="var(--accent-red)" fillOpacity={0.25} />
+      <polyline points={upper.join(' ')} fill="none" stroke="var(--accent-red)" strokeWidth={1.5} />
+    </svg>
+  );
+};
+
 const IncidentDetailPage: React.FC = () => {
   const { id } = useParams<{ id: string }>();
   const [incident, setIncident] = useState<Incident | null>(null);
@@ -32,6 +64,8 @@ const IncidentDetailPage: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   // Add a new state to track which clip is downloading
   const [downloading, setDownloading] = useState<number | null>(null);
+  const [timeline, setTimeline] = useState<Timeline | null>(null);
+  const [streamUrl, setStreamUrl] = useState<string | null>(null);
 
   useEffect(() => {
     const fetchIncident = async () => {
@@ -49,9 +83,37 @@ const IncidentDetailPage: React.FC = () => {
         setLoading(false);
       }
     };
+    // Older incidents have no recorded score series (404); the chart is simply omitted
+    const fetchTimeline = () => {
+      if (!id) return;
+      getIncidentTimeline(Number(id))
+        .then((response) => setTimeline(response.data))
+        .catch(() => setTimeline(null));
+    };
     fetchIncident();
+    fetchTimeline();
+    // Re-fetch when the server pushes an update for this incident (e.g. analysis finished)
+    const stream = openIncidentStream({
+      'incident.updated': (data) => {
+        if (data.id === Number(id)) {
+          fetchIncident();
+          fetchTimeline();
+        }
+      },
+    });
+    return () => stream.close();
   }, [id]);
 
+  // Streams the clip straight into the player via a signed URL (seekable, no blob download)
+  const handlePlay = async (clip: Clip) => {
+    try {
+      setStreamUrl(await getClipStreamUrl(clip.id));
+    } catch (err) {
+      console.error("Failed to get stream link:", err);
+      alert("Failed to play clip. You may need to log in again.");
+    }
+  };
+
   // --- NEW: Function to handle the download click ---
   const handleDownload = async (clip: Clip) => {
     setDownloading(clip.id); // Show loading state on the button
@@ -146,6 +208,9 @@ const IncidentDetailPage: React.FC = () => {
                 {incident.clips && incident.clips.length > 0 ? (
                   incident.clips.map((clip: Clip) => (
                     <li key={clip.id}>
+                      <button onClick={() => handlePlay(clip)} className="evidence-link">
+                        {`Play Clip #${clip.id}`}
+                      </button>
                       {/* --- MODIFIED: Changed <a> to <button> --- */}
                       <button
                         onClick={() => handleDownload(clip)}
@@ -163,8 +228,18 @@ const IncidentDetailPage: React.FC = () => {
                   <li>No clips available.</li>
                 )}
               </ul>
+              {streamUrl && (
+                <video src={streamUrl} controls autoPlay muted style={{ width: '100%', marginTop: '10px' }} />
+              )}
             </div>
 
+            {timeline && (
+              <div className="setting-item">
+                <label>Anomaly Score Timeline ({timeline.samples} clips)</label>
+                <ScoreTimeline timeline={timeline} />
+              </div>
+            )}
+
             {/* ... (anomaly log remains the same) ... */}
             {anomalyEvents.length > 0 && (
               <div className="setting-item">
@@ -1,12 +1,13 @@
 // src/pages/IncidentListPage.tsx
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
-import { getIncidents } from '../services/api'; // Import the api function
+import { getIncidents, IncidentFilters, openIncidentStream } from '../services/api'; // Import the api function
 
 // Define an interface for the Incident object
 interface Clip {
   id: number;
   file_path: string;
+  poster_url?: string | null; // Signed, present once the clip has been post-processed
 }
 interface Incident {
   id: number;
@@ -18,35 +19,119 @@ interface Incident {
   clips: Clip[];
 }
 
+const PAGE_SIZE = 50;
+
+// Form state is kept as strings; empty means "no filter"
+const EMPTY_FILTERS = { camera_id: '', event_type: '', status: '', since: '', until: '' };
+
+const toApiFilters = (form: typeof EMPTY_FILTERS): IncidentFilters => ({
+  camera_id: form.camera_id ? Number(form.camera_id) : undefined,
+  event_type: form.event_type || undefined,
+  status: form.status || undefined,
+  since: form.since ? new Date(form.since).toISOString() : undefined,
+  until: form.until ? new Date(form.until).toISOString() : undefined,
+});
+
 const IncidentListPage: React.FC = () => {
   const [incidents, setIncidents] = useState<Incident[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [filterForm, setFilterForm] = useState(EMPTY_FILTERS);
+  const [appliedFilters, setAppliedFilters] = useState<IncidentFilters>({});
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
+  const fetchPage = useCallback(async (filters: IncidentFilters, cursor: string | null) => {
+    try {
+      const response = await getIncidents(filters, cursor, PAGE_SIZE);
+      setIncidents((prev) => (cursor ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
+      setError(null);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to fetch incidents.');
+    }
+  }, []);
+
+  // First page whenever the applied filters change
   useEffect(() => {
-    const fetchIncidents = async () => {
-      try {
-        const response = await getIncidents();
-        setIncidents(response.data);
-      } catch (err: any) {
-        setError(err.response?.data?.detail || 'Failed to fetch incidents.');
-      } finally {
-        setLoading(false);
-      }
-    };
-    fetchIncidents();
-  }, []); // Runs once on page load
-
-  if (loading) return <div className="page-container">Loading incidents...</div>;
-  if (error) return <div className="page-container" style={{ color: 'var(--accent-red)'}}>{error}</div>;
+    setLoading(true);
+    fetchPage(appliedFilters, null).finally(() => setLoading(false));
+  }, [appliedFilters, fetchPage]);
+
+  // Live updates: new incidents appear at the top (unfiltered view), updates patch in place
+  useEffect(() => {
+    const unfiltered = Object.values(appliedFilters).every((value) => value === undefined);
+    const stream = openIncidentStream({
+      'incident.created': (data) => {
+        if (!unfiltered) return;
+        setIncidents((prev) => (prev.some((inc) => inc.id === data.id) ? prev : [{ ...data, clips: [] }, ...prev]));
+      },
+      'incident.updated': (data) => {
+        setIncidents((prev) => prev.map((inc) => (inc.id === data.id ? { ...inc, ...data } : inc)));
+      },
+      'reset': () => { fetchPage(appliedFilters, null); },
+    });
+    return () => stream.close();
+  }, [appliedFilters, fetchPage]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    await fetchPage(appliedFilters, nextCursor);
+    setLoadingMore(false);
+  };
+
+  const updateFilter = (key: keyof typeof EMPTY_FILTERS) => (e: React.ChangeEvent<HTMLInputElement>) =>
+    setFilterForm({ ...filterForm, [key]: e.target.value });
+
+  const applyFilters = (e: React.FormEvent) => {
+    e.preventDefault();
+    setAppliedFilters(toApiFilters(filterForm));
+  };
+
+  const clearFilters = () => {
+    setFilterForm(EMPTY_FILTERS);
+    setAppliedFilters({});
+  };
+
+  if (error && incidents.length === 0) return <div className="page-container" style={{ color: 'var(--accent-red)'}}>{error}</div>;
 
   return (
     <div className="page-container incident-list-page">
       <h1>Incident History</h1>
-      <p>Showing all recorded events from analyses.</p>
+      <p>Showing recorded events from analyses, newest first.</p>
+
+      <form className="info-card incident-filters" onSubmit={applyFilters}>
+        <div className="setting-item">
+          <label>Camera ID</label>
+          <input type="number" min={1} value={filterForm.camera_id} onChange={updateFilter('camera_id')} />
+        </div>
+        <div className="setting-item">
+          <label>Event Type</label>
+          <input type="text" placeholder="e.g. Fighting" value={filterForm.event_type} onChange={updateFilter('event_type')} />
+        </div>
+        <div className="setting-item">
+          <label>Status</label>
+          <input type="text" placeholder="e.g. detected" value={filterForm.status} onChange={updateFilter('status')} />
+        </div>
+        <div className="setting-item">
+          <label>From</label>
+          <input type="datetime-local" value={filterForm.since} onChange={updateFilter('since')} />
+        </div>
+        <div className="setting-item">
+          <label>To</label>
+          <input type="datetime-local" value={filterForm.until} onChange={updateFilter('until')} />
+        </div>
+        <div className="save-button-container">
+          <button type="button" className="save-button" onClick={clearFilters}>Clear</button>
+          <button type="submit" className="save-button">Apply Filters</button>
+        </div>
+      </form>
+
+      {loading && <div className="page-container">Loading incidents...</div>}
 
       <div className="incident-list">
-        {incidents.length > 0 ? (
+        {loading ? null : incidents.length > 0 ? (
           incidents.map((incident) => (
             <Link 
               to={`/incidents/${incident.id}`} 
@@ -57,6 +142,14 @@ const IncidentListPage: React.FC = () => {
                 <h2>{incident.event_type}</h2>
                 <span className="incident-id">ID: {incident.id}</span>
               </div>
+              {incident.clips?.find((clip) => clip.poster_url) && (
+                <img
+                  className="incident-poster"
+                  src={incident.clips.find((clip) => clip.poster_url)!.poster_url!}
+                  alt={`Incident ${incident.id} preview`}
+                  loading="lazy"
+                />
+              )}
               <div className="incident-card-body">
                 <div className="setting-item">
                   <label>Date & Time</label>
@@ -83,6 +176,15 @@ const IncidentListPage: React.FC = () => {
           </div>
         )}
       </div>
+
+      {error && incidents.length > 0 && <p style={{ color: 'var(--accent-red)' }}>{error}</p>}
+      {nextCursor && !loading && (
+        <div className="save-button-container">
+          <button className="save-button" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,6 +1,18 @@
 import React, { useEffect, useRef, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 
+// Binary frame header expected by /ws/live: uint32 sequence + float64 capture time (ms), little-endian.
+const FRAME_HEADER_BYTES = 12;
+
+// Capture settings; the backend adjusts them with {"type": "control", ...} messages.
+interface CaptureSettings {
+  fps: number;
+  width: number;
+  height: number;
+  quality: number;
+}
+const DEFAULT_CAPTURE: CaptureSettings = { fps: 6.6, width: 224, height: 224, quality: 0.6 };
+
 const MobileCameraPage: React.FC = () => {
   const { sessionId } = useParams<{ sessionId: string }>();
   const navigate = useNavigate();
@@ -10,6 +22,8 @@ const MobileCameraPage: React.FC = () => {
   const wsRef = useRef<WebSocket | null>(null);
   const captureIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const streamRef = useRef<MediaStream | null>(null);
+  const sequenceRef = useRef(0);
+  const captureRef = useRef<CaptureSettings>({ ...DEFAULT_CAPTURE });
   
   const [status, setStatus] = useState('Ready to Broadcast');
   const [isBroadcasting, setIsBroadcasting] = useState(false);
@@ -51,27 +65,62 @@ const MobileCameraPage: React.FC = () => {
       const wsUrl = `${protocol}//${window.location.host}/ws/live/${sessionId}/mobile?token=${token}`;
       
       const ws = new WebSocket(wsUrl);
+      ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
 
+      const captureFrame = () => {
+        if (ws.readyState === WebSocket.OPEN && videoRef.current && canvasRef.current) {
+          const canvas = canvasRef.current;
+          const context = canvas.getContext('2d');
+          const { width, height, quality } = captureRef.current;
+          
+          if (context) {
+             canvas.width = width; 
+             canvas.height = height;
+             context.drawImage(videoRef.current, 0, 0, width, height);
+             const capturedAt = Date.now();
+             // Send raw JPEG bytes behind a small header instead of a base64 data URL
+             canvas.toBlob(async (blob) => {
+               if (!blob || ws.readyState !== WebSocket.OPEN) return;
+               const jpeg = new Uint8Array(await blob.arrayBuffer());
+               const packet = new Uint8Array(FRAME_HEADER_BYTES + jpeg.byteLength);
+               const header = new DataView(packet.buffer);
+               header.setUint32(0, sequenceRef.current++ >>> 0, true);
+               header.setFloat64(4, capturedAt, true);
+               packet.set(jpeg, FRAME_HEADER_BYTES);
+               ws.send(packet);
+             }, 'image/jpeg', quality);
+          }
+        }
+      };
+
+      const startCapture = () => {
+        if (captureIntervalRef.current) clearInterval(captureIntervalRef.current);
+        captureIntervalRef.current = setInterval(captureFrame, 1000 / captureRef.current.fps);
+      };
+
       ws.onopen = () => {
         setStatus('🟢 Live Streaming to Argus Core');
         setIsBroadcasting(true);
         
         // Start pumping frames to the backend
-        captureIntervalRef.current = setInterval(() => {
-          if (ws.readyState === WebSocket.OPEN && videoRef.current && canvasRef.current) {
-            const canvas = canvasRef.current;
-            const context = canvas.getContext('2d');
-            
-            if (context) {
-               canvas.width = 224; 
-               canvas.height = 224;
-               context.drawImage(videoRef.current, 0, 0, 224, 224);
-               const frameData = canvas.toDataURL('image/jpeg', 0.6);
-               ws.send(frameData);
-            }
-          }
-        }, 150); // ~6.6 FPS
+        startCapture();
+      };
+
+      // The backend slows us down (or speeds us up) based on its inference backlog
+      ws.onmessage = (event) => {
+        if (typeof event.data !== 'string') return;
+        const data = JSON.parse(event.data);
+        if (data.type === 'control') {
+          const fpsChanged = data.fps !== captureRef.current.fps;
+          captureRef.current = {
+            fps: data.fps ?? captureRef.current.fps,
+            width: data.width ?? captureRef.current.width,
+            height: data.height ?? captureRef.current.height,
+            quality: data.quality ?? captureRef.current.quality,
+          };
+          if (fpsChanged) startCapture();
+        }
       };
       
       ws.onerror = () => {
@@ -53,8 +53,8 @@ export const getRandomVideo = () => {
 };
 
 /**
- * Asks the backend to analyze a video specified by its relative URL.
- * Returns a list of detected anomaly events.
+ * Queues analysis of a video specified by its relative URL.
+ * Returns { job_id }; the anomaly events arrive in the job's result (see getJob).
  */
 export const detectAnomalies = (videoUrl: string) => {
   // videoUrl should be like "/datasets/ucf_crime/test/Fighting/Fighting001.mp4"
@@ -77,6 +77,13 @@ export const getIncidentById = (id: number) => {
   return api.get(`/incidents/${id}`);
 };
 
+/**
+ * Fetches an incident's score curve, reduced server-side to at most `points` min/max buckets.
+ */
+export const getIncidentTimeline = (id: number, points: number = 400) => {
+  return api.get(`/incidents/${id}/timeline`, { params: { points } });
+};
+
 /**
  * Fetches the current user's details (e.g., to display email).
  */
@@ -84,11 +91,25 @@ export const getCurrentUser = () => {
   return api.get('/users/me');
 };
 
+export interface IncidentFilters {
+  camera_id?: number;
+  event_type?: string;
+  status?: string;
+  since?: string; // ISO timestamp, inclusive
+  until?: string; // ISO timestamp, exclusive
+}
+
 /**
- * Fetches the list of incidents.
+ * Fetches one page of incidents, newest first.
+ * Returns { items, next_cursor }; pass next_cursor back to get the following page.
  */
-export const getIncidents = (limit: number = 100) => {
-    return api.get(`/incidents?limit=${limit}`);
+export const getIncidents = (filters: IncidentFilters = {}, cursor?: string | null, limit: number = 50) => {
+    const params: Record<string, string | number> = { limit };
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') params[key] = value;
+    });
+    if (cursor) params.cursor = cursor;
+    return api.get('/incidents', { params });
 };
 
 /**
@@ -104,10 +125,20 @@ export const getCameras = () => {
  */
 export const downloadClip = (clipId: number) => {
   return api.get(`/clips/${clipId}`, {
+    params: { download: true },
     responseType: 'blob', 
   });
 };
 
+/**
+ * Gets a short-lived signed URL for a clip. Use it directly as a <video> src: the browser
+ * then streams with Range requests (seeking, resuming) instead of downloading a blob first.
+ */
+export const getClipStreamUrl = async (clipId: number): Promise<string> => {
+  const response = await api.post(`/clips/${clipId}/link`);
+  return response.data.url;
+};
+
 export const uploadVideoForAnalysis = (file: File) => {
   const formData = new FormData();
   formData.append('file', file);
@@ -125,4 +156,25 @@ export const getClip = (clipId: number) => {
   });
 };
 
-export const getIncident = (incidentId: number) => api.get(`/incidents/${incidentId}`);
\ No newline at end of file
+export const getIncident = (incidentId: number) => api.get(`/incidents/${incidentId}`);
+
+export const getJob = (jobId: number) => api.get(`/jobs/${jobId}`);
+
+export const cancelJob = (jobId: number) => api.post(`/jobs/${jobId}/cancel`);
+
+export type IncidentStreamEvent = 'incident.created' | 'incident.updated' | 'analysis.progress' | 'job.updated' | 'reset';
+
+/**
+ * Opens the server-push stream of incident events. EventSource reconnects on its own and
+ * sends Last-Event-ID, so missed events are replayed. Call .close() on unmount.
+ */
+export const openIncidentStream = (
+  handlers: Partial<Record<IncidentStreamEvent, (data: any) => void>>
+): EventSource => {
+  const token = localStorage.getItem('access_token') || '';
+  const source = new EventSource(`/stream/incidents?token=${encodeURIComponent(token)}`);
+  (Object.keys(handlers) as IncidentStreamEvent[]).forEach((type) => {
+    source.addEventListener(type, (e) => handlers[type]?.(JSON.parse((e as MessageEvent).data)));
+  });
+  return source;
+};
\ No newline at end of file
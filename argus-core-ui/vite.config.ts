@@ -19,7 +19,8 @@ export default defineConfig({
       '/token': { target: 'http://127.0.0.1:8080', changeOrigin: true },
       '/api': { target: 'http://127.0.0.1:8080', changeOrigin: true },
       '/clips': { target: 'http://127.0.0.1:8080', changeOrigin: true },
-      '/incidents': { target: 'http://127.0.0.1:8080', changeOrigin: true }
+      '/incidents': { target: 'http://127.0.0.1:8080', changeOrigin: true },
+      '/stream': { target: 'http://127.0.0.1:8080', changeOrigin: true }
     }
   }
 })
\ No newline at end of file
@@ -1,84 +1,337 @@
 import os
+import atexit
+import collections
+import queue
+import shutil
 import smtplib
+import tempfile
+import threading
+import time
+import uuid
 from email.message import EmailMessage
 from pathlib import Path
 from dotenv import load_dotenv
 import datetime
 load_dotenv()
 
-def send_alert(
-    video_file_path: str, 
-    location: str = "Unknown", 
-    anomaly_type: str = "Anomaly",
-    additional_recipient: str | None = None  # <-- ADDED this parameter
-):
+# --- Dispatcher settings ---
+ALERT_COOLDOWN_SECONDS = float(os.getenv("ALERT_COOLDOWN_SECONDS", 60))        # Per camera + anomaly type
+ALERT_RATE_LIMIT = int(os.getenv("ALERT_RATE_LIMIT", 10))                       # Alerts per camera per window
+ALERT_RATE_WINDOW_SECONDS = float(os.getenv("ALERT_RATE_WINDOW_SECONDS", 3600))
+ALERT_DIGEST_WINDOW_SECONDS = float(os.getenv("ALERT_DIGEST_WINDOW_SECONDS", 5))  # Bursts within this become one e-mail
+ALERT_MAX_ATTACHMENT_BYTES = int(os.getenv("ALERT_MAX_ATTACHMENT_BYTES", 10 * 1024 * 1024))  # Per e-mail
+ALERT_SMTP_IDLE_SECONDS = float(os.getenv("ALERT_SMTP_IDLE_SECONDS", 60))        # Close the pooled connection after this
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", 1000))
+ALERT_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("ALERT_SHUTDOWN_TIMEOUT_SECONDS", 30))
+
+
+def _smtp_settings():
+    user = os.getenv("SMTP_USER")
+    return {
+        "server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", 587)),
+        "user": user,
+        "password": os.getenv("SMTP_PASS"),
+        "to": os.getenv("ALERT_TO"),
+        "from": user,
+        # Local relays and test servers often speak plain SMTP without auth
+        "starttls": os.getenv("SMTP_STARTTLS", "1") == "1",
+    }
+
+
+class Alert:
+    __slots__ = ("video_file_path", "evidence_path", "location", "anomaly_type", "recipients", "camera_key",
+                 "created_at", "suppressed")
+
+    def __init__(self, video_file_path, location, anomaly_type, recipients, camera_key):
+        self.video_file_path = video_file_path
+        self.evidence_path = None  # Dispatcher-owned link/copy of the clip, removed once the e-mail is built
+        self.location = location
+        self.anomaly_type = anomaly_type
+        self.recipients = recipients
+        self.camera_key = camera_key
+        self.created_at = datetime.datetime.now()
+        self.suppressed = 0  # Alerts of the same kind dropped by the cooldown since the last one sent
+
+
+class AlertDispatcher:
     """
-    Sends an email alert with an attached video clip.
-    Can now send to the main ALERT_TO address and an additional recipient (e.g., the logged-in user).
+    Sends alert e-mails from a single background thread so detection never waits on SMTP.
+
+    * One SMTP connection is kept open and reused; it is re-established when the server drops
+      it and closed after ALERT_SMTP_IDLE_SECONDS without mail.
+    * Alerts for the same camera and anomaly type within ALERT_COOLDOWN_SECONDS are dropped
+      (and counted in the next e-mail); each camera may send at most ALERT_RATE_LIMIT alerts per
+      ALERT_RATE_WINDOW_SECONDS.
+    * Alerts queued within ALERT_DIGEST_WINDOW_SECONDS of each other go out as one digest per
+      recipient list.
+    * Clips are attached only while an e-mail stays under ALERT_MAX_ATTACHMENT_BYTES; larger
+      ones are referenced by link (see `set_clip_link_builder`).
+    * A clip small enough to attach is hard-linked (or copied) into a dispatcher-owned
+      directory by `submit()`, so callers may delete or move their file right away (the edge
+      outbox removes clips once uploaded).
+
+    Cooldowns and rate limits are per process.
     """
-    SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    SMTP_PORT   = int(os.getenv("SMTP_PORT", 587))
-    SMTP_USER   = os.getenv("SMTP_USER")
-    SMTP_PASS   = os.getenv("SMTP_PASS")
-    ALERT_TO    = os.getenv("ALERT_TO")
-    ALERT_FROM  = SMTP_USER
-
-    if not all([SMTP_USER, SMTP_PASS, ALERT_TO]):
-        print("[ERROR] Missing SMTP credentials or main recipient in environment variables. Please check your .env file.")
-        return
-
-    recipients = [ALERT_TO]
-    if additional_recipient and additional_recipient.lower() != ALERT_TO.lower(): # Check case-insensitively
-        print(f"[INFO] Adding logged-in user to alert: {additional_recipient}")
-        recipients.append(additional_recipient)
-    now = datetime.datetime.now()
-    formatted_datetime = now.strftime("%A, %B %d, %Y at %I:%M %p")
 
+    def __init__(self, settings=None, cooldown_seconds=ALERT_COOLDOWN_SECONDS, rate_limit=ALERT_RATE_LIMIT,
+                 rate_window_seconds=ALERT_RATE_WINDOW_SECONDS, digest_window_seconds=ALERT_DIGEST_WINDOW_SECONDS,
+                 max_attachment_bytes=ALERT_MAX_ATTACHMENT_BYTES, smtp_idle_seconds=ALERT_SMTP_IDLE_SECONDS):
+        self.settings = settings
+        self.cooldown_seconds = cooldown_seconds
+        self.rate_limit = rate_limit
+        self.rate_window_seconds = rate_window_seconds
+        self.digest_window_seconds = digest_window_seconds
+        self.max_attachment_bytes = max_attachment_bytes
+        self.smtp_idle_seconds = smtp_idle_seconds
+        self.link_builder = None
+        self.queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+        self._last_sent = {}         # (camera_key, anomaly_type) -> monotonic time
+        self._suppressed = collections.Counter()
+        self._recent = collections.defaultdict(collections.deque)  # camera_key -> monotonic times
+        self._lock = threading.Lock()
+        self._smtp = None
+        self._thread = None
+        self._evidence_dir = None
+
+    # --- Producer side ---
+    def submit(self, video_file_path, location="Unknown", anomaly_type="Anomaly", additional_recipient=None,
+               camera_id=None):
+        """Queues an alert; returns False when it was dropped by the cooldown, rate limit or a full queue."""
+        settings = self.settings or _smtp_settings()
+        needs_login = settings["starttls"] and not (settings["user"] and settings["password"])
+        if not settings["to"] or needs_login:
+            print("[ERROR] Missing SMTP credentials or main recipient in environment variables. Please check your .env file.")
+            return False
+        recipients = [settings["to"]]
+        if additional_recipient and additional_recipient.lower() != settings["to"].lower():
+            recipients.append(additional_recipient)
+        # Without a camera id, cooldowns apply per location and recipient list (e.g. per live user)
+        camera_key = camera_id if camera_id is not None else (location, tuple(recipients))
+        alert = Alert(video_file_path, location, anomaly_type, tuple(recipients), camera_key)
+        if not self._admit(alert):
+            return False
+        self._own_evidence(alert)
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            print(f"[ALERT] Queue full; dropping {anomaly_type} alert for {location}.")
+            self._release_evidence([alert])
+            return False
+        self._ensure_worker()
+        return True
+
+    def _admit(self, alert):
+        now = time.monotonic()
+        key = (alert.camera_key, alert.anomaly_type)
+        with self._lock:
+            last = self._last_sent.get(key)
+            if last is not None and now - last < self.cooldown_seconds:
+                self._suppressed[key] += 1
+                print(f"[ALERT] {alert.anomaly_type} at {alert.location} within cooldown; suppressed.")
+                return False
+            recent = self._recent[alert.camera_key]
+            while recent and now - recent[0] >= self.rate_window_seconds:
+                recent.popleft()
+            if len(recent) >= self.rate_limit:
+                self._suppressed[key] += 1
+                print(f"[ALERT] Rate limit reached for {alert.location}; suppressed {alert.anomaly_type}.")
+                return False
+            recent.append(now)
+            self._last_sent[key] = now
+            alert.suppressed = self._suppressed.pop(key, 0)
+        return True
+
+    def _own_evidence(self, alert):
+        """Takes a private link (or copy) of a clip that may be attached; larger clips are only linked to."""
+        try:
+            if os.path.getsize(alert.video_file_path) > self.max_attachment_bytes:
+                return
+            with self._lock:
+                if self._evidence_dir is None:
+                    self._evidence_dir = tempfile.mkdtemp(prefix="argus-alerts-")
+            path = os.path.join(self._evidence_dir, uuid.uuid4().hex + Path(alert.video_file_path).suffix)
+            try:
+                os.link(alert.video_file_path, path)
+            except OSError:  # Other filesystem, or no hard links
+                shutil.copyfile(alert.video_file_path, path)
+            alert.evidence_path = path
+        except OSError as e:
+            print(f"[ALERT] Could not keep a copy of {alert.video_file_path}: {e}")
+
+    @staticmethod
+    def _release_evidence(alerts):
+        for alert in alerts:
+            if alert.evidence_path is not None:
+                try:
+                    os.remove(alert.evidence_path)
+                except OSError:
+                    pass
+                alert.evidence_path = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=ALERT_SHUTDOWN_TIMEOUT_SECONDS):
+        """Waits (bounded) until every queued alert has been handled."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    # --- Worker side ---
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.smtp_idle_seconds)
+            except queue.Empty:
+                self._close_smtp()
+                continue
+            batch = [first]
+            # Collect the rest of the burst into a digest
+            deadline = time.monotonic() + self.digest_window_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                by_recipients = collections.OrderedDict()
+                for alert in batch:
+                    by_recipients.setdefault(alert.recipients, []).append(alert)
+                for recipients, alerts in by_recipients.items():
+                    self._deliver(build_alert_message(alerts, recipients, self.settings or _smtp_settings(),
+                                                      self.max_attachment_bytes, self.link_builder), recipients)
+            except Exception as e:
+                print(f"[ERROR] Alert dispatch failed: {e}")
+            finally:
+                self._release_evidence(batch)
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _connect(self):
+        settings = self.settings or _smtp_settings()
+        smtp = smtplib.SMTP(settings["server"], settings["port"], timeout=30)
+        if settings["starttls"]:
+            smtp.starttls()
+        if settings["user"] and settings["password"]:
+            smtp.login(settings["user"], settings["password"])
+        return smtp
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _deliver(self, msg, recipients):
+        print(f"Sending alert e-mail to {', '.join(recipients)} ...")
+        for attempt in (1, 2):
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                self._smtp.send_message(msg)
+                print(f"✅ Alert e-mail sent to {', '.join(recipients)}: {msg['Subject']}")
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+                # The pooled connection went stale; reconnect once
+                self._close_smtp()
+                if attempt == 2:
+                    print(f"[ERROR] Failed to send alert e-mail: {e}")
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"[ERROR] Failed to send alert e-mail: {e}")
+                print("Please check your email credentials (App password if 2FA is on), SMTP server settings, and internet connection.")
+                self._close_smtp()
+                return
+
+
+def build_alert_message(alerts, recipients, settings, max_attachment_bytes, link_builder=None):
+    """One e-mail for one alert, or a digest for several; clips attached while under the size cap."""
+    first = alerts[0]
+    formatted_datetime = first.created_at.strftime("%A, %B %d, %Y at %I:%M %p")
     msg = EmailMessage()
-    msg['Subject'] = f"Argus Core ALERT: {anomaly_type} Detected at {location} on {formatted_datetime}"
-    msg['From'] = ALERT_FROM
+    if len(alerts) == 1:
+        msg['Subject'] = f"Argus Core ALERT: {first.anomaly_type} Detected at {first.location} on {formatted_datetime}"
+    else:
+        msg['Subject'] = f"Argus Core ALERT: {len(alerts)} anomalies detected since {formatted_datetime}"
+    msg['From'] = settings["from"] or settings["to"]
     msg['To'] = ", ".join(recipients)
-    
-    email_body = (
-        f"Automatic alert from your Argus Core smart-CCTV system.\n\n"
-        f"• Anomaly Type(s): {anomaly_type}\n"
-        f"• Location         : {location}\n"
-        f"• Clip             : {Path(video_file_path).name}\n"
-        f"• Time             : {formatted_datetime}\n\n"
-        f"Please review the attached footage and take action if necessary."
-    )
-    msg.set_content(email_body)
-
-    # Attach the video file
-    try:
-        file_path_obj = Path(video_file_path)
-        if not file_path_obj.exists():
-            print(f"[ERROR] Video file not found: {video_file_path}")
-            msg.set_content(f"An anomaly was detected at {location} on {formatted_datetime}. Video footage could not be attached (file not found).")
+
+    attachments, attached_bytes, lines = [], 0, []
+    for alert in alerts:
+        file_path_obj = Path(alert.video_file_path)
+        source = Path(alert.evidence_path or alert.video_file_path)
+        size = source.stat().st_size if source.exists() else None
+        if size is None:
+            print(f"[ERROR] Video file not found: {alert.video_file_path}")
+            footage = "not available (file not found)"
+        elif attached_bytes + size <= max_attachment_bytes:
+            attachments.append((source, file_path_obj.name))
+            attached_bytes += size
+            footage = f"{file_path_obj.name} (attached)"
         else:
-            with open(file_path_obj, "rb") as fp:
-                msg.add_attachment(
-                    fp.read(),
-                    maintype="video",
-                    subtype="mp4",
-                    filename=file_path_obj.name,
-                )
-    except Exception as e:
-        print(f"[ERROR] Error attaching video file: {e}")
-        msg.set_content(f"An anomaly was detected at {location} on {formatted_datetime}. Video footage could not be attached due to an error.")
-
-    print(f"Sending alert e-mail to {', '.join(recipients)} ...")
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as smtp:
-            smtp.starttls()
-            smtp.login(SMTP_USER, SMTP_PASS)
-            # Use send_message which handles the recipient list correctly
-            smtp.send_message(msg) 
-        print(f"✅ Alert e-mail sent to {', '.join(recipients)} for {anomaly_type} at {location} ({formatted_datetime}).")
-    # --- END OF CHANGE ---
-    except Exception as e:
-        print(f"[ERROR] Failed to send alert e-mail: {e}")
-        print("Please check your email credentials (App password if 2FA is on), SMTP server settings, and internet connection.")
+            link = link_builder(alert.video_file_path) if link_builder else None
+            footage = f"{file_path_obj.name}: {link}" if link else f"{file_path_obj.name} (too large to attach; see the dashboard)"
+        lines.append(
+            f"• Anomaly Type(s): {alert.anomaly_type}\n"
+            f"• Location         : {alert.location}\n"
+            f"• Clip             : {footage}\n"
+            f"• Time             : {alert.created_at.strftime('%A, %B %d, %Y at %I:%M %p')}\n"
+            + (f"• Suppressed       : {alert.suppressed} similar alert(s) during the cooldown\n" if alert.suppressed else "")
+        )
+    msg.set_content(
+        "Automatic alert from your Argus Core smart-CCTV system.\n\n"
+        + "\n".join(lines)
+        + "\nPlease review the footage and take action if necessary."
+    )
+    for source, filename in attachments:
+        try:
+            with open(source, "rb") as fp:
+                msg.add_attachment(fp.read(), maintype="video", subtype="mp4", filename=filename)
+        except Exception as e:
+            print(f"[ERROR] Error attaching video file: {e}")
+    return msg
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+            # Short-lived processes (edge client, CLI) must not exit with alerts still queued
+            atexit.register(_dispatcher.flush)
+        return _dispatcher
+
+def set_clip_link_builder(builder):
+    """`builder(video_file_path) -> url or None`, used for clips above the attachment cap."""
+    get_dispatcher().link_builder = builder
+
+def send_alert(
+    video_file_path: str,
+    location: str = "Unknown",
+    anomaly_type: str = "Anomaly",
+    additional_recipient: str | None = None,
+    camera_id: int | str | None = None  # Camera (or other source key) for cooldowns and rate limits
+):
+    """
+    Queues an email alert for `video_file_path` on the shared AlertDispatcher and returns at once.
+    Sent to the main ALERT_TO address and an additional recipient (e.g., the logged-in user).
+    Returns False if the alert was suppressed (cooldown / rate limit) or could not be queued.
+    """
+    if additional_recipient:
+        print(f"[INFO] Adding logged-in user to alert: {additional_recipient}")
+    return get_dispatcher().submit(video_file_path, location=location, anomaly_type=anomaly_type,
+                                   additional_recipient=additional_recipient, camera_id=camera_id)
 
 if __name__ == "__main__":
     import sys
@@ -117,4 +370,5 @@ if __name__ == "__main__":
             location="Default-Test-Location", 
             anomaly_type="DefaultAnomaly",
             additional_recipient="testuser@example.com" 
-        )
\ No newline at end of file
+        )
+    get_dispatcher().flush()
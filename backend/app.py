@@ -8,7 +8,7 @@ Version: 0.2.8 (Send alerts to logged-in user)
 import os
 import shutil
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 import sys
 import cv2
 import base64
@@ -18,34 +18,101 @@ import random
 import traceback
 import json
 import re 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Header, BackgroundTasks
-from fastapi import WebSocket, WebSocketDisconnect, Query, status
+import struct
+import hashlib
+import uuid
+import asyncio
+import collections
+import time
+import weakref
+from urllib.parse import urlencode
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Header
+from fastapi import WebSocket, WebSocketDisconnect, Query, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field, EmailStr
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, SmallInteger, String, DateTime, Float, ForeignKey, Text, BigInteger, update, Index, tuple_
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, Session
 from sqlalchemy.exc import IntegrityError
 from dotenv import load_dotenv
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import joinedload 
-from src.utils import AnomalyConfidenceQueue 
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import event, select, insert, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from src.utils import AnomalyConfidenceQueue, ClipRingBuffer
+from src.anomaly_config import CLASS_TO_IDX, IDX_TO_CLASS
+from backend.auth_cache import TokenUserCache
+from backend.incident_stats import IncidentRollup, hour_bucket
+from backend.clip_links import ClipLinkSigner
+from backend.clip_postprocess import ClipPostProcessor, clip_assets_dir
+from backend.event_broadcaster import IncidentEventBroadcaster, format_sse, INCIDENT_FIELDS
+from backend.jobs import (JobContext, JobCancelled, JobWorkerPool, job_handler, new_job, JOB_WORKERS,
+                          STATUS_QUEUED, STATUS_RUNNING, STATUS_CANCELLED, TERMINAL_STATUSES)
+from backend.range_response import FileRangeResponse
+from backend.transcode import WebTranscoder
+from backend.content_store import ContentStore, model_version
+from backend.upload_stream import receive_multipart_file
+from backend.alert_service import set_clip_link_builder
+from backend.score_series import ScoreSeriesWriter, series_path, load_series, minmax_reduce
+from backend.live_store import LiveSessionStore, create_live_store, KIND_BYTES, KIND_JSON, KIND_ALERT
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 API_KEY = os.getenv("ARGUS_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL")
 STORAGE_DIR = os.getenv("STORAGE_DIR", "./storage")
+SCORES_DIR = osp.join(STORAGE_DIR, "scores")  # Per-incident score series (backend/score_series.py)
+OBJECTS_DIR = osp.join(STORAGE_DIR, "objects")  # Content-addressed uploads (backend/content_store.py)
+PENDING_EVENT_TYPE = "Analyzing..."  # Upload placeholders; left out of the hourly rollups until analysed
+MODEL_WEIGHTS_PATH = osp.abspath(osp.join(osp.dirname(__file__), '..', 'models', 'anomaly_classifier.pth'))
 
 if not API_KEY: raise RuntimeError("ARGUS_API_KEY not found.")
 if not DATABASE_URL: raise RuntimeError("DATABASE_URL not found.")
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
-engine = create_engine(DATABASE_URL)
+# --- Database engines ---
+# Async routes use the asyncio engine so they never block the loop that also serves /ws/live;
+# plain `def` routes, background tasks and worker threads keep the synchronous engine.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+
+def _async_database_url(url: str) -> str:
+    """Maps DATABASE_URL onto its asyncio driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+def _pool_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}  # SQLite picks its own pool class; sizing options do not apply
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+    }
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+_async_connect_args = {}
+if make_url(ASYNC_DATABASE_URL).drivername == "postgresql+asyncpg":
+    _async_connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=_async_connect_args,
+                                   **_pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
 Base = declarative_base()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_in_your_env_file")
@@ -53,8 +120,24 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 if SECRET_KEY == "a_very_secret_key_that_should_be_in_your_env_file":
     print("WARNING: Using default SECRET_KEY.")
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 1024))
+token_user_cache = TokenUserCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+CLIP_LINK_TTL_SECONDS = int(os.getenv("CLIP_LINK_TTL_SECONDS", 300))
+clip_link_signer = ClipLinkSigner(SECRET_KEY, ttl=CLIP_LINK_TTL_SECONDS)
+
+def clip_link_query(clip_id: int, user_id: int) -> str:
+    """Signed query string; valid for the clip and all of its post-processed assets."""
+    return urlencode(clip_link_signer.sign(clip_id, user_id))
+
+# Alert e-mails link clips too large to attach; those links must outlive the e-mail's delivery
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+ALERT_LINK_TTL_SECONDS = int(os.getenv("ALERT_LINK_TTL_SECONDS", 7 * 24 * 3600))
+ALERT_LINK_USER_ID = 0  # Links in alert e-mails are not issued to a particular user
+alert_link_signer = ClipLinkSigner(SECRET_KEY, ttl=ALERT_LINK_TTL_SECONDS, purpose="alert-link")
 
 class User(Base):
     __tablename__ = "users"
@@ -63,6 +146,13 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Integer, default=1)
 
+# Drop cached tokens as soon as a user is deactivated or changes password in this process
+@event.listens_for(User.is_active, "set")
+@event.listens_for(User.hashed_password, "set")
+def _invalidate_cached_user(target, value, oldvalue, initiator):
+    if value != oldvalue and target.id is not None:
+        token_user_cache.invalidate_user(user_id=target.id)
+
 class Camera(Base):
     __tablename__ = "cameras"
     id = Column(Integer, primary_key=True, index=True)
@@ -83,6 +173,14 @@ class Incident(Base):
     note = Column(Text, nullable=True)
     camera = relationship("Camera", back_populates="incidents")
     clips = relationship("Clip", back_populates="incident", cascade="all, delete-orphan")
+    events = relationship("IncidentEvent", back_populates="incident", cascade="all, delete-orphan", passive_deletes=True)
+    # Keyset pagination walks (started_at, id) newest-first, optionally within one filter value
+    __table_args__ = (
+        Index("ix_incidents_started_at_id", "started_at", "id"),
+        Index("ix_incidents_camera_started_at_id", "camera_id", "started_at", "id"),
+        Index("ix_incidents_event_type_started_at_id", "event_type", "started_at", "id"),
+        Index("ix_incidents_status_started_at_id", "status", "started_at", "id"),
+    )
 class Clip(Base):
     __tablename__ = "clips"
     id = Column(Integer, primary_key=True, index=True)
@@ -90,7 +188,107 @@ class Clip(Base):
     file_path = Column(Text, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     duration_seconds = Column(Float, nullable=True)
+    # Filled in by clip post-processing (backend/clip_postprocess.py)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    fps = Column(Float, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    # SHA-256 of the uploaded bytes; with model_version, lets a re-upload reuse an earlier analysis
+    content_hash = Column(String(64), nullable=True, index=True)
+    model_version = Column(String(64), nullable=True)
     incident = relationship("Incident", back_populates="clips")
+class IncidentEvent(Base):
+    """
+    One detection inside an incident, with typed columns so detections can be filtered in the
+    database. `camera_id` is copied from the incident so per-camera queries need no join.
+    """
+    __tablename__ = "incident_events"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="CASCADE"), nullable=False, index=True)
+    camera_id = Column(Integer, nullable=False)
+    class_idx = Column(SmallInteger, nullable=False)
+    confidence = Column(Float, nullable=False)
+    frame_offset = Column(Integer, nullable=True)
+    detected_at = Column(DateTime(timezone=True), nullable=False)
+    incident = relationship("Incident", back_populates="events")
+    __table_args__ = (
+        Index("ix_incident_events_class_detected_id", "class_idx", "detected_at", "id"),
+        Index("ix_incident_events_camera_class_detected_id", "camera_id", "class_idx", "detected_at", "id"),
+    )
+class IncidentStatsHourly(Base):
+    """Incidents per UTC hour, camera and event type; maintained by `incident_rollup` (backend/incident_stats.py)."""
+    __tablename__ = "incident_stats_hourly"
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    camera_id = Column(Integer, primary_key=True)
+    event_type = Column(String(255), primary_key=True)
+    incident_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    __table_args__ = (
+        Index("ix_incident_stats_hourly_camera_bucket", "camera_id", "bucket_start"),
+        Index("ix_incident_stats_hourly_event_type_bucket", "event_type", "bucket_start"),
+    )
+incident_rollup = IncidentRollup(Incident, IncidentStatsHourly, pending_event_types={PENDING_EVENT_TYPE})
+incident_rollup.install()
+clip_postprocessor = ClipPostProcessor(SessionLocal, Clip, STORAGE_DIR)
+clip_postprocessor.install()
+SSE_REPLAY_EVENTS = int(os.getenv("SSE_REPLAY_EVENTS", 500))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+ANALYSIS_PROGRESS_INTERVAL_SECONDS = float(os.getenv("ANALYSIS_PROGRESS_INTERVAL_SECONDS", 1.0))
+incident_broadcaster = IncidentEventBroadcaster(replay_size=SSE_REPLAY_EVENTS)
+incident_broadcaster.install(Incident)
+content_store = ContentStore(OBJECTS_DIR)
+
+def alert_clip_link(video_file_path: str) -> Optional[str]:
+    """Signed absolute URL to the newest clip stored at `video_file_path`, for alert e-mails."""
+    with SessionLocal() as db:
+        clip_id = db.execute(select(Clip.id).where(Clip.file_path == video_file_path)
+                             .order_by(Clip.id.desc()).limit(1)).scalar()
+    if clip_id is None:
+        return None
+    return f"{PUBLIC_BASE_URL}/clips/{clip_id}?{urlencode(alert_link_signer.sign(clip_id, ALERT_LINK_USER_ID))}"
+set_clip_link_builder(alert_clip_link)
+class Upload(Base):
+    """A resumable clip upload; bytes land directly in `file_path`, committed up to `received_bytes`."""
+    __tablename__ = "uploads"
+    id = Column(String(32), primary_key=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    file_path = Column(Text, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received_bytes = Column(BigInteger, nullable=False, default=0)
+    sha256 = Column(String(64), nullable=True)
+    status = Column(String(20), nullable=False, default="uploading")
+    clip_id = Column(Integer, ForeignKey("clips.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+class Job(Base):
+    """Queued heavy work (detection, upload analysis) run by the worker pool in backend/jobs.py."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(String(20), nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Integer, nullable=False, default=0)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="SET NULL"), nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    available_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Workers claim the oldest queued job; the SSE relay follows recently updated ones
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+        Index("ix_jobs_updated_at", "updated_at"),
+    )
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -112,6 +310,12 @@ class ClipOut(BaseModel):
     file_path: str
     uploaded_at: datetime
     duration_seconds: Optional[float]
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    processed_at: Optional[datetime] = None
+    content_hash: Optional[str] = None
+    poster_url: Optional[str] = None  # Signed, set by attach_clip_links once post-processing is done
     class Config:
         from_attributes = True 
 class IncidentOut(BaseModel):
@@ -126,12 +330,60 @@ class IncidentOut(BaseModel):
     clips: List[ClipOut] = []
     class Config:
         from_attributes = True 
+class TimelineSeries(BaseModel):
+    min: List[float]
+    max: List[float]
+class TimelineOut(BaseModel):
+    incident_id: int
+    samples: int
+    frame_start: List[int]
+    frame_end: List[int]
+    series: Dict[str, TimelineSeries]
+class IncidentEventOut(BaseModel):
+    id: int
+    incident_id: int
+    camera_id: int
+    event_type: str
+    confidence: float
+    frame_offset: Optional[int]
+    detected_at: datetime
+class IncidentEventPage(BaseModel):
+    items: List[IncidentEventOut]
+    next_cursor: Optional[str] = None
+class StatsBucket(BaseModel):
+    key: str
+    incidents: int
+    avg_score: Optional[float] = None
+class StatsOut(BaseModel):
+    since: datetime
+    until: datetime
+    group_by: str
+    total: StatsBucket
+    groups: List[StatsBucket]
+class IncidentPage(BaseModel):
+    items: List[IncidentOut]
+    next_cursor: Optional[str] = None
 class IncidentCreate(BaseModel):
     camera_id: int
     event_type: str = Field(..., examples=["fight"])
     score: Optional[float] = Field(None, ge=0.0, le=1.0)
     started_at: datetime
     ended_at: Optional[datetime] = None
+class ClipMeta(BaseModel):
+    file_path: str  # Must be an existing file under STORAGE_DIR (see resolve_storage_file)
+    duration_seconds: Optional[float] = None
+class DetectionEventIn(BaseModel):
+    event: str
+    confidence: float = Field(..., ge=0.0, le=1.0)
+    time: datetime
+    frame: Optional[int] = None
+class IncidentBatchItem(IncidentCreate):
+    status: Optional[str] = None
+    note: Optional[str] = None
+    clips: List[ClipMeta] = []
+    events: List[DetectionEventIn] = []
+class IncidentBatch(BaseModel):
+    incidents: List[IncidentBatchItem] = Field(..., min_length=1, max_length=1000)
 class CameraCreate(BaseModel):
     name: str
     rtsp_url: Optional[str] = None
@@ -144,8 +396,34 @@ class CameraOut(BaseModel):
     is_active: int
     class Config:
         from_attributes = True 
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    attempts: int
+    max_attempts: int
+    incident_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 class DetectRequest(BaseModel):
     video_url: str
+class UploadCreate(BaseModel):
+    incident_id: int
+    filename: str
+    total_size: int = Field(..., ge=1)
+    sha256: Optional[str] = Field(None, min_length=64, max_length=64)
+class UploadOut(BaseModel):
+    id: str
+    incident_id: int
+    total_size: int
+    offset: int
+    status: str
+    clip_id: Optional[int] = None
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -166,8 +444,94 @@ def get_db():
         yield db
     finally:
         db.close()
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 def get_user(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
+async def get_user_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+def new_evidence_path(filename: str) -> str:
+    """
+    Storage path for an evidence clip written *before* its incident exists, so the incident
+    and clip rows can be inserted together. Unique per call; grouped by day.
+    """
+    safe_filename = re.sub(r'[^a-zA-Z0-9_.-]', '_', filename)
+    day_dir = osp.join(STORAGE_DIR, "evidence", datetime.now().strftime("%Y%m%d"))
+    os.makedirs(day_dir, exist_ok=True)
+    return osp.join(day_dir, f"{uuid.uuid4().hex[:12]}_{safe_filename}")
+
+def discard_evidence(path: Optional[str]):
+    """Removes an evidence clip whose incident was never written (no-op if it does not exist)."""
+    if path and osp.exists(path):
+        os.remove(path)
+
+def resolve_storage_file(path: str) -> Optional[str]:
+    """
+    Canonical path of an existing file inside STORAGE_DIR, or None. Clip paths supplied by
+    API clients go through this so a clip row can never point at an arbitrary server file
+    (symlinks and '..' are resolved before the check).
+    """
+    storage_root = osp.realpath(STORAGE_DIR)
+    resolved = osp.realpath(path)
+    if osp.commonpath([storage_root, resolved]) != storage_root or not osp.isfile(resolved):
+        return None
+    return resolved
+
+def incident_event_rows(incident_id: int, camera_id: int, detections) -> list:
+    """
+    Turns detection dicts ({"event", "confidence", "time", optional "frame"}, the format kept in
+    Incident.note) into incident_events rows. Unknown class names are skipped.
+    """
+    rows = []
+    for d in detections:
+        class_idx = CLASS_TO_IDX.get(d.get("event"))
+        if class_idx is None:
+            continue
+        detected_at = d.get("time")
+        if isinstance(detected_at, str):
+            detected_at = datetime.fromisoformat(detected_at)
+        rows.append({
+            "incident_id": incident_id,
+            "camera_id": camera_id,
+            "class_idx": class_idx,
+            "confidence": float(d.get("confidence") or 0.0),
+            "frame_offset": d.get("frame"),
+            "detected_at": detected_at or datetime.now(timezone.utc),
+        })
+    return rows
+
+def add_incident_events(db, rows: list):
+    """Bulk-inserts incident_events rows in the caller's transaction (one executemany)."""
+    if rows:
+        db.execute(insert(IncidentEvent), rows)
+
+def create_incident_with_clip(db: Session, clip_path: Optional[str] = None, events=None, **incident_fields):
+    """
+    Inserts an incident, (optionally) its clip and its detection `events` in one transaction.
+    Returns (incident_id, clip_id); clip_id is None without a clip. If the rows cannot be
+    written the transaction is rolled back and the clip file removed, so nothing is orphaned.
+    """
+    inc = Incident(**incident_fields)
+    clip = None
+    if clip_path:
+        clip = Clip(file_path=clip_path)
+        inc.clips.append(clip)
+    try:
+        db.add(inc)
+        db.flush()
+        # Read the ids before commit() expires the instances (avoids a refresh round trip)
+        ids = (inc.id, clip.id if clip is not None else None)
+        add_incident_events(db, incident_event_rows(inc.id, inc.camera_id, events or ()))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        if clip_path:
+            discard_evidence(clip_path)
+        raise
+    return ids
 def require_api_key(x_api_key: Optional[str] = Header(None)):
     if API_KEY and x_api_key == API_KEY:
         return True
@@ -177,13 +541,16 @@ def require_api_key(x_api_key: Optional[str] = Header(None)):
     )
 
 async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
 ) -> User: # <-- Set return type to User model
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = token_user_cache.get(token)
+    if cached is not None:
+        return cached
     try: 
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -193,9 +560,10 @@ async def get_current_user(
     except JWTError: 
         raise credentials_exception
         
-    user = get_user(db, email=token_data.email)
-    if user is None:
+    user = await get_user_async(db, email=token_data.email)
+    if user is None or not user.is_active:
         raise credentials_exception
+    token_user_cache.set(token, user, token_expires_at=payload.get("exp"))
     return user # <-- Return the full user object
 
 app = FastAPI(title="Argus-Core Backend", version="0.2.8") # Version bump
@@ -242,9 +610,10 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     return new_user
 @app.post("/token", response_model=Token)
-async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = get_user(db, email=form_data.username) 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await get_user_async(db, email=form_data.username)
+    # pbkdf2 is deliberately slow; keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -278,34 +647,332 @@ def create_incident(payload: IncidentCreate, db: Session = Depends(get_db)):
     db.add(inc); db.commit(); db.refresh(inc)
     db.refresh(inc, attribute_names=['clips'])
     return inc
+@app.post("/events/batch", status_code=201, dependencies=[Depends(require_api_key)])
+def create_incidents_batch(payload: IncidentBatch, db: Session = Depends(get_db)):
+    """
+    Creates many incidents (and optional clip rows) in a single transaction. Ids come back in
+    request order. Inserts go out as one executemany-style statement per table.
+    """
+    camera_ids = {item.camera_id for item in payload.incidents}
+    known = set(db.execute(select(Camera.id).where(Camera.id.in_(camera_ids))).scalars())
+    missing = sorted(camera_ids - known)
+    if missing:
+        raise HTTPException(404, detail=f"camera(s) not found: {missing}")
+    clip_paths = {clip.file_path: resolve_storage_file(clip.file_path)
+                  for item in payload.incidents for clip in item.clips}
+    rejected = sorted(path for path, resolved in clip_paths.items() if resolved is None)
+    if rejected:
+        raise HTTPException(422, detail={"message": "clip file_path must be an existing file under the storage directory",
+                                         "file_paths": rejected})
+
+    incident_rows = [
+        {
+            "camera_id": item.camera_id,
+            "event_type": item.event_type,
+            "score": item.score,
+            "started_at": item.started_at,
+            "ended_at": item.ended_at,
+            "status": item.status or "detected",
+            "note": item.note,
+        }
+        for item in payload.incidents
+    ]
+    try:
+        incident_ids = list(db.execute(
+            insert(Incident).returning(Incident.id, sort_by_parameter_order=True), incident_rows
+        ).scalars())
+        clip_rows = [
+            {"incident_id": incident_id, "file_path": clip_paths[clip.file_path], "duration_seconds": clip.duration_seconds}
+            for incident_id, item in zip(incident_ids, payload.incidents)
+            for clip in item.clips
+        ]
+        clip_ids = []
+        if clip_rows:
+            clip_ids = list(db.execute(insert(Clip).returning(Clip.id), clip_rows).scalars())
+        # Core inserts skip the ORM flush hook, so feed the rollups explicitly
+        incident_rollup.record_inserted(db.connection(), incident_rows)
+        add_incident_events(db, [
+            row
+            for incident_id, item in zip(incident_ids, payload.incidents)
+            for row in incident_event_rows(incident_id, item.camera_id, [e.model_dump() for e in item.events])
+        ])
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(409, detail=f"batch rejected: {e.orig}")
+    # Core inserts skip the ORM commit hooks, so queue post-processing and notify explicitly
+    clip_postprocessor.submit(clip_ids)
+    for incident_id, row in zip(incident_ids, incident_rows):
+        incident_broadcaster.publish("incident.created", {
+            "id": incident_id, "camera_id": row["camera_id"], "event_type": row["event_type"], "score": row["score"],
+            "started_at": row["started_at"], "ended_at": row["ended_at"], "status": row["status"],
+        })
+    return {"status": "success", "created": len(incident_ids), "incident_ids": incident_ids}
+
 @app.post("/clips/upload", dependencies=[Depends(require_api_key)])
 def upload_clip(incident_id: int = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
     inc = db.query(Incident).get(incident_id)
     if not inc:
         raise HTTPException(404, detail="incident not found")
-    incident_dir = osp.join(STORAGE_DIR, f"incident_{incident_id}")
-    os.makedirs(incident_dir, exist_ok=True)
-    safe_filename = "".join(c for c in file.filename if c.isalnum() or c in ('-', '_', '.'))
-    dest_path = osp.join(incident_dir, safe_filename)
     try:
-        with open(dest_path, "wb") as out:
-            shutil.copyfileobj(file.file, out)
+        content_hash, dest_path = content_store.put_stream(file.file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-    clip = Clip(incident_id=incident_id, file_path=dest_path)
+    clip = Clip(incident_id=incident_id, file_path=dest_path, content_hash=content_hash)
     db.add(clip); db.commit(); db.refresh(clip)
     return {"status": "success", "clip_id": clip.id}
 
+# --- Resumable chunked uploads (API Key) ---
+# POST /uploads creates an upload, PUT /uploads/{id} appends a byte range at `Upload-Offset`
+# (optionally verified with `Upload-Checksum: sha256 <hex>`), GET /uploads/{id} reports the
+# committed offset to resume from, and POST /uploads/{id}/complete turns it into a Clip.
+# Request bodies are streamed straight into the clip's final path; nothing is spooled.
+UPLOAD_MAX_CHUNK_BYTES = int(os.getenv("UPLOAD_MAX_CHUNK_BYTES", 64 * 1024 * 1024))
+# Request body pieces are coalesced up to this size before each (threadpool) disk write
+UPLOAD_WRITE_BUFFER_BYTES = 1024 * 1024
+# Serialises PUTs to the same upload within this worker; entries vanish once no request holds them
+upload_locks = weakref.WeakValueDictionary()
+
+def _upload_out(upload: Upload) -> UploadOut:
+    return UploadOut(id=upload.id, incident_id=upload.incident_id, total_size=upload.total_size,
+                     offset=upload.received_bytes, status=upload.status, clip_id=upload.clip_id)
+
+def _get_upload(db: Session, upload_id: str) -> Upload:
+    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    if not upload:
+        raise HTTPException(404, detail="upload not found")
+    return upload
+
+@app.post("/uploads", response_model=UploadOut, status_code=201, dependencies=[Depends(require_api_key)])
+def create_upload(payload: UploadCreate, db: Session = Depends(get_db)):
+    inc = db.query(Incident).get(payload.incident_id)
+    if not inc:
+        raise HTTPException(404, detail="incident not found")
+    upload_id = uuid.uuid4().hex
+    incident_dir = osp.join(STORAGE_DIR, f"incident_{payload.incident_id}")
+    os.makedirs(incident_dir, exist_ok=True)
+    safe_filename = "".join(c for c in payload.filename if c.isalnum() or c in ('-', '_', '.')) or "clip.mp4"
+    dest_path = osp.join(incident_dir, safe_filename)
+    if osp.exists(dest_path):
+        dest_path = osp.join(incident_dir, f"{upload_id[:8]}_{safe_filename}")
+    # Create the file up front so chunks can be written in place at their offsets
+    open(dest_path, "wb").close()
+    upload = Upload(id=upload_id, incident_id=payload.incident_id, filename=safe_filename, file_path=dest_path,
+                    total_size=payload.total_size, received_bytes=0,
+                    sha256=payload.sha256.lower() if payload.sha256 else None)
+    db.add(upload); db.commit(); db.refresh(upload)
+    return _upload_out(upload)
+
+@app.get("/uploads/{upload_id}", response_model=UploadOut, dependencies=[Depends(require_api_key)])
+def get_upload(upload_id: str, db: Session = Depends(get_db)):
+    return _upload_out(_get_upload(db, upload_id))
+
+def _open_upload_at(path, offset):
+    out = open(path, "r+b")
+    out.seek(offset)
+    return out
+
+def _write_upload_piece(out, digest, data):
+    digest.update(data)
+    out.write(data)
+
+def _sync_upload(out):
+    out.flush()
+    os.fsync(out.fileno())
+
+@app.put("/uploads/{upload_id}", response_model=UploadOut, dependencies=[Depends(require_api_key)])
+async def put_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    upload_checksum: Optional[str] = Header(None, alias="Upload-Checksum"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    expected_digest = None
+    if upload_checksum:
+        algorithm, _, expected_digest = upload_checksum.partition(" ")
+        if algorithm.lower() != "sha256" or not expected_digest:
+            raise HTTPException(400, detail="Upload-Checksum must be 'sha256 <hex>'")
+        expected_digest = expected_digest.strip().lower()
+
+    lock = upload_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        upload = await db.get(Upload, upload_id)
+        if not upload:
+            raise HTTPException(404, detail="upload not found")
+        if upload.status != "uploading":
+            raise HTTPException(409, detail=f"upload is {upload.status}")
+        if upload_offset != upload.received_bytes:
+            raise HTTPException(409, detail={"message": "offset mismatch", "offset": upload.received_bytes})
+
+        digest = hashlib.sha256()
+        written = 0
+        limit = min(UPLOAD_MAX_CHUNK_BYTES, upload.total_size - upload_offset)
+        # File I/O (and hashing, which releases the GIL) happens in the threadpool, never on the loop
+        out = await run_in_threadpool(_open_upload_at, upload.file_path, upload_offset)
+        try:
+            pending = bytearray()
+            try:
+                async for piece in request.stream():
+                    written += len(piece)
+                    if written > limit:
+                        raise HTTPException(413, detail="chunk exceeds upload size or UPLOAD_MAX_CHUNK_BYTES")
+                    pending += piece
+                    if len(pending) >= UPLOAD_WRITE_BUFFER_BYTES:
+                        await run_in_threadpool(_write_upload_piece, out, digest, pending)
+                        pending.clear()
+                await run_in_threadpool(_write_upload_piece, out, digest, pending)
+                if expected_digest and digest.hexdigest() != expected_digest:
+                    raise HTTPException(422, detail={"message": "checksum mismatch", "offset": upload_offset})
+            except BaseException:
+                # Drop the unverified bytes; the client resends from the committed offset
+                await run_in_threadpool(out.truncate, upload_offset)
+                raise
+            await run_in_threadpool(_sync_upload, out)
+        finally:
+            await run_in_threadpool(out.close)
+
+        # Only advance if nobody else committed this range in the meantime (other workers)
+        result = await db.execute(
+            update(Upload)
+            .where(Upload.id == upload_id, Upload.received_bytes == upload_offset)
+            .values(received_bytes=upload_offset + written, updated_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+        await db.refresh(upload)
+        if result.rowcount != 1:
+            raise HTTPException(409, detail={"message": "offset mismatch", "offset": upload.received_bytes})
+        return _upload_out(upload)
+
+@app.post("/uploads/{upload_id}/complete", dependencies=[Depends(require_api_key)])
+def complete_upload(upload_id: str, db: Session = Depends(get_db)):
+    upload = _get_upload(db, upload_id)
+    if upload.status == "complete":
+        return {"status": "success", "clip_id": upload.clip_id}
+    if upload.received_bytes != upload.total_size:
+        raise HTTPException(409, detail={"message": "upload incomplete", "offset": upload.received_bytes})
+    # Chunks can arrive over many requests and workers, so the whole-file hash is taken here
+    digest = hashlib.sha256()
+    with open(upload.file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    if upload.sha256 and digest.hexdigest() != upload.sha256:
+        raise HTTPException(422, detail="file checksum mismatch")
+    content_hash, upload.file_path = content_store.put_file(upload.file_path, content_hash=digest.hexdigest())
+    clip = Clip(incident_id=upload.incident_id, file_path=upload.file_path, content_hash=content_hash)
+    db.add(clip); db.flush()
+    upload.clip_id = clip.id
+    upload.status = "complete"
+    upload.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    return {"status": "success", "clip_id": clip.id}
+
 # --- Web App Data Routes (User Login) ---
 # --- MODIFIED: All protected routes now inject current_user ---
-@app.get("/incidents", response_model=List[IncidentOut])
+def attach_clip_links(incidents, user_id: int):
+    """Sets a signed `poster_url` on each post-processed clip so list views can use plain <img src>."""
+    for inc in incidents:
+        for clip in inc.clips:
+            if clip.processed_at is not None:
+                clip.poster_url = f"/clips/{clip.id}/poster.jpg?{clip_link_query(clip.id, user_id)}"
+
+def encode_keyset_cursor(at: datetime, row_id: int) -> str:
+    raw = json.dumps({"s": at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def encode_incident_cursor(inc: Incident) -> str:
+    return encode_keyset_cursor(inc.started_at, inc.id)
+
+def decode_incident_cursor(cursor: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw["s"]), int(raw["i"])
+    except Exception:
+        raise HTTPException(400, detail="invalid cursor")
+
+@app.get("/stream/incidents")
+async def stream_incidents(
+    request: Request,
+    token: Optional[str] = Query(None, description="Bearer token; EventSource cannot send headers"),
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    Server-Sent Events: incident.created, incident.updated and analysis.progress. Reconnects
+    send Last-Event-ID and get the missed events replayed (or a 'reset' event if too old).
+    """
+    token = header_token or token
+    if not token:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # Authenticate with a short-lived session so the stream does not pin a pooled connection
+    async with AsyncSessionLocal() as db:
+        await get_current_user(db=db, token=token)
+
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    queue, backlog = incident_broadcaster.subscribe(last_event_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            for message in backlog:
+                yield format_sse(message)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield format_sse(message)
+        finally:
+            incident_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/incidents", response_model=IncidentPage)
 def list_incidents(
     db: Session = Depends(get_db), 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: User = Depends(get_current_user)
 ): 
-    incidents = db.query(Incident).options(joinedload(Incident.clips)).order_by(Incident.id.desc()).limit(limit).all()
-    return incidents
+    """
+    Newest-first incidents, paged by keyset on (started_at, id). Pass the returned
+    `next_cursor` back as `cursor` for the next page; it is null on the last page.
+    """
+    query = db.query(Incident)
+    if camera_id is not None:
+        query = query.filter(Incident.camera_id == camera_id)
+    if event_type:
+        query = query.filter(Incident.event_type == event_type)
+    if status_filter:
+        query = query.filter(Incident.status == status_filter)
+    if since:
+        query = query.filter(Incident.started_at >= since)
+    if until:
+        query = query.filter(Incident.started_at < until)
+    if cursor:
+        query = query.filter(tuple_(Incident.started_at, Incident.id) < tuple_(*decode_incident_cursor(cursor)))
+
+    # One extra row tells us whether another page exists; clips come in a single IN query
+    rows = (query.options(selectinload(Incident.clips))
+            .order_by(Incident.started_at.desc(), Incident.id.desc())
+            .limit(limit + 1).all())
+    items = rows[:limit]
+    next_cursor = encode_incident_cursor(items[-1]) if len(rows) > limit else None
+    attach_clip_links(items, current_user.id)
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.get("/incidents/{incident_id}", response_model=IncidentOut)
 def get_incident(
@@ -316,8 +983,153 @@ def get_incident(
     inc = db.query(Incident).options(joinedload(Incident.clips)).filter(Incident.id == incident_id).first()
     if not inc:
         raise HTTPException(404, detail="incident not found")
+    attach_clip_links([inc], current_user.id)
     return inc
 
+@app.get("/incidents/{incident_id}/timeline", response_model=TimelineOut)
+def get_incident_timeline(
+    incident_id: int,
+    points: int = Query(400, ge=2, le=5000),
+    classes: Optional[str] = Query(None, description="Comma-separated class names to include besides 'anomaly'"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Per-clip score curve of an incident, reduced to at most `points` min/max buckets.
+    'anomaly' is 1 - P(Normal_Videos); any `classes` are added as their own series.
+    """
+    if not db.query(Incident.id).filter(Incident.id == incident_id).first():
+        raise HTTPException(404, detail="incident not found")
+    requested = [c.strip() for c in (classes or "").split(",") if c.strip()]
+    unknown = [c for c in requested if c not in CLASS_TO_IDX]
+    if unknown:
+        raise HTTPException(400, detail=f"unknown class(es): {unknown}")
+    path = series_path(SCORES_DIR, incident_id)
+    if not osp.exists(path):
+        raise HTTPException(404, detail="no score series recorded for this incident")
+
+    data = load_series(path)
+    frames, probs = data["frame"], data["probs"]
+    curves = {"anomaly": 1.0 - probs[:, CLASS_TO_IDX["Normal_Videos"]].astype(np.float32)}
+    for name in requested:
+        curves[name] = probs[:, CLASS_TO_IDX[name]]
+
+    series = {}
+    frame_start = frame_end = None
+    for name, values in curves.items():
+        frame_start, frame_end, mins, maxs = minmax_reduce(frames, values, points)
+        series[name] = TimelineSeries(min=np.round(mins, 4).tolist(), max=np.round(maxs, 4).tolist())
+    return TimelineOut(
+        incident_id=incident_id,
+        samples=len(frames),
+        frame_start=frame_start.tolist(),
+        frame_end=frame_end.tolist(),
+        series=series,
+    )
+
+@app.get("/incident-events", response_model=IncidentEventPage)
+def list_incident_events(
+    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    incident_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Individual detections, newest first, e.g. all Fighting above 0.8 on camera 3 last week:
+    ?event_type=Fighting&camera_id=3&min_confidence=0.8&since=... Paged like /incidents.
+    """
+    query = db.query(IncidentEvent)
+    if event_type:
+        if event_type not in CLASS_TO_IDX:
+            raise HTTPException(400, detail=f"unknown event_type '{event_type}'")
+        query = query.filter(IncidentEvent.class_idx == CLASS_TO_IDX[event_type])
+    if camera_id is not None:
+        query = query.filter(IncidentEvent.camera_id == camera_id)
+    if incident_id is not None:
+        query = query.filter(IncidentEvent.incident_id == incident_id)
+    if min_confidence is not None:
+        query = query.filter(IncidentEvent.confidence >= min_confidence)
+    if since:
+        query = query.filter(IncidentEvent.detected_at >= since)
+    if until:
+        query = query.filter(IncidentEvent.detected_at < until)
+    if cursor:
+        cursor_at, cursor_id = decode_incident_cursor(cursor)
+        query = query.filter(tuple_(IncidentEvent.detected_at, IncidentEvent.id) < tuple_(cursor_at, cursor_id))
+
+    rows = query.order_by(IncidentEvent.detected_at.desc(), IncidentEvent.id.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = encode_keyset_cursor(items[-1].detected_at, items[-1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            IncidentEventOut(id=e.id, incident_id=e.incident_id, camera_id=e.camera_id,
+                             event_type=IDX_TO_CLASS.get(e.class_idx, str(e.class_idx)), confidence=e.confidence,
+                             frame_offset=e.frame_offset, detected_at=e.detected_at)
+            for e in items
+        ],
+        "next_cursor": next_cursor,
+    }
+
+@app.get("/stats", response_model=StatsOut)
+def incident_stats(
+    db: Session = Depends(get_db),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    group_by: str = Query("hour", pattern="^(hour|day|camera|event_type)$"),
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Incident counts and average score over [since, until) (default: last 24 hours), grouped
+    by hour, day, camera or event type. Served from incident_stats_hourly, so the range is
+    effectively widened to whole hours.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(400, detail="'since' must be before 'until'")
+    stats = IncidentStatsHourly
+    filters = [stats.bucket_start >= hour_bucket(since), stats.bucket_start < until]
+    if camera_id is not None:
+        filters.append(stats.camera_id == camera_id)
+    if event_type:
+        filters.append(stats.event_type == event_type)
+
+    dimension = {"camera": stats.camera_id, "event_type": stats.event_type}.get(group_by, stats.bucket_start)
+    rows = db.execute(
+        select(dimension, func.sum(stats.incident_count), func.sum(stats.score_sum))
+        .where(*filters).group_by(dimension).order_by(dimension)
+    ).all()
+
+    groups = collections.OrderedDict()
+    for key, count, score_sum in rows:
+        if group_by == "day":
+            key = hour_bucket(key).date().isoformat()
+        elif group_by == "hour":
+            key = hour_bucket(key).isoformat()
+        else:
+            key = str(key)
+        totals = groups.setdefault(key, [0, 0.0])
+        totals[0] += count or 0
+        totals[1] += score_sum or 0.0
+
+    def bucket(key, count, score_sum):
+        return StatsBucket(key=key, incidents=count, avg_score=(score_sum / count) if count else None)
+    total_count = sum(count for count, _ in groups.values())
+    total_score = sum(score_sum for _, score_sum in groups.values())
+    return StatsOut(
+        since=since, until=until, group_by=group_by,
+        total=bucket("total", total_count, total_score),
+        groups=[bucket(key, count, score_sum) for key, (count, score_sum) in groups.items()],
+    )
+
 @app.get("/cameras", response_model=List[CameraOut])
 def list_cameras(
     db: Session = Depends(get_db), 
@@ -325,18 +1137,114 @@ def list_cameras(
 ): 
     return db.query(Camera).all()
 
-@app.get("/clips/{clip_id}")
+async def get_clip_viewer(
+    clip_id: int,
+    exp: Optional[int] = None,
+    uid: Optional[int] = None,
+    sig: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    Authorizes a clip request by signed link (?exp=&uid=&sig=, for <video src>) or bearer token.
+    A user's link stops working as soon as that user is deleted or deactivated; alert e-mail
+    links carry ALERT_LINK_USER_ID and are only checked against the alert signer.
+    """
+    if sig is not None:
+        if exp is None or uid is None:
+            raise HTTPException(403, detail="invalid or expired clip link")
+        if uid == ALERT_LINK_USER_ID:
+            if not alert_link_signer.verify(clip_id, uid, exp, sig):
+                raise HTTPException(403, detail="invalid or expired clip link")
+            return uid
+        if not clip_link_signer.verify(clip_id, uid, exp, sig):
+            raise HTTPException(403, detail="invalid or expired clip link")
+        user = await db.get(User, uid)
+        if user is None or not user.is_active:
+            raise HTTPException(403, detail="invalid or expired clip link")
+        return uid
+    if not token:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    user = await get_current_user(db=db, token=token)
+    return user.id
+
+@app.post("/clips/{clip_id}/link")
+def create_clip_link(
+    clip_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Short-lived URL for streaming a clip without an Authorization header."""
+    if not db.query(Clip.id).filter(Clip.id == clip_id).first():
+        raise HTTPException(404, detail="clip not found")
+    query = clip_link_query(clip_id, current_user.id)
+    return {
+        "url": f"/clips/{clip_id}?{query}",
+        "poster_url": f"/clips/{clip_id}/poster.jpg?{query}",
+        "sprite_url": f"/clips/{clip_id}/sprite.jpg?{query}",
+        "hls_url": f"/clips/{clip_id}/hls/master.m3u8?{query}",
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=CLIP_LINK_TTL_SECONDS),
+    }
+
+@app.api_route("/clips/{clip_id}", methods=["GET", "HEAD"])
 def download_clip(
     clip_id: int, 
+    request: Request,
+    download: bool = False,
     db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    viewer_id: int = Depends(get_clip_viewer)
 ): 
+    """Serves a clip with Range/If-Range/ETag support so players can seek and downloads can resume."""
     clip = db.query(Clip).get(clip_id)
     if not clip:
         raise HTTPException(404, detail="clip not found")
     if not osp.exists(clip.file_path):
         raise HTTPException(410, detail="clip file missing")
-    return FileResponse(path=clip.file_path, filename=osp.basename(clip.file_path))
+    return FileRangeResponse(request, clip.file_path, filename=osp.basename(clip.file_path),
+                             disposition="attachment" if download else "inline")
+
+CLIP_ASSET_TYPES = {"poster.jpg": "image/jpeg", "sprite.jpg": "image/jpeg", "sprite.json": "application/json"}
+HLS_ASSET_RE = re.compile(r"^[A-Za-z0-9_]+\.(m3u8|ts)$")
+
+@app.get("/clips/{clip_id}/{asset}")
+def get_clip_asset(
+    clip_id: int,
+    asset: str,
+    request: Request,
+    viewer_id: int = Depends(get_clip_viewer)
+):
+    """Poster, scrub sprite and sprite layout produced by clip post-processing."""
+    if asset not in CLIP_ASSET_TYPES:
+        raise HTTPException(404, detail="unknown clip asset")
+    path = osp.join(clip_assets_dir(STORAGE_DIR, clip_id), asset)
+    if not osp.exists(path):
+        raise HTTPException(404, detail="clip asset not available (yet)")
+    return FileRangeResponse(request, path, media_type=CLIP_ASSET_TYPES[asset])
+
+@app.get("/clips/{clip_id}/hls/{name}")
+def get_clip_hls(
+    clip_id: int,
+    name: str,
+    request: Request,
+    viewer_id: int = Depends(get_clip_viewer)
+):
+    """
+    HLS playlists and segments. Playlists are rewritten so every segment/variant URI carries
+    the caller's signed query string, which players do not propagate to relative URIs.
+    """
+    if not HLS_ASSET_RE.match(name):
+        raise HTTPException(404, detail="unknown HLS asset")
+    path = osp.join(clip_assets_dir(STORAGE_DIR, clip_id), "hls", name)
+    if not osp.exists(path):
+        raise HTTPException(404, detail="HLS rendition not available")
+    if name.endswith(".ts"):
+        return FileRangeResponse(request, path, media_type="video/mp2t")
+    query = request.url.query
+    with open(path) as f:
+        lines = [line if not query or not line.strip() or line.startswith("#") else f"{line}?{query}"
+                 for line in f.read().splitlines()]
+    return Response("\n".join(lines) + "\n", media_type="application/vnd.apple.mpegurl")
 
 # --- Video Serving Route ---
 # ... (_pick_random_video, get_random_video routes are unchanged) ...
@@ -360,37 +1268,56 @@ def get_random_video():
     return {"video_url": video_url}
 
 # --- Main Detection Route ---
-# --- MODIFIED: Inject current_user ---
-@app.post("/api/detect") 
-def run_detection_on_video(
+def resolve_dataset_video(video_url: str) -> str:
+    """Maps a /datasets/... URL to an existing file inside the datasets directory."""
+    if not video_url.startswith("/datasets/"): raise HTTPException(400, detail="Invalid video URL.")
+    base_datasets_dir = osp.abspath(osp.join(osp.dirname(__file__), '..', 'datasets'))
+    relative_path = video_url.partition('/datasets/')[-1]
+    if not relative_path: raise HTTPException(400, detail="Invalid video URL path.")
+    absolute_video_path = osp.normpath(osp.join(base_datasets_dir, relative_path.replace('/', os.sep)))
+    if not absolute_video_path.startswith(base_datasets_dir): raise HTTPException(400, detail="Invalid video path.")
+    if not osp.exists(absolute_video_path): raise HTTPException(404, detail=f"Video file not found: {absolute_video_path}")
+    return absolute_video_path
+
+@app.post("/api/detect", status_code=202)
+async def enqueue_detection(
     request: DetectRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- Injected user
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
 ):
+    """Queues detection on a dataset video; follow it with GET /jobs/{job_id}."""
+    absolute_video_path = resolve_dataset_video(request.video_url)
+    job = new_job(Job, "detect_video", {"video_path": absolute_video_path, "user_email": current_user.email},
+                  user_id=current_user.id)
+    db.add(job)
+    await db.commit()
+    return {"job_id": job.id, "status": job.status}
+
+@job_handler("detect_video")
+def detect_video_job(ctx: JobContext, payload: dict):
+    db = SessionLocal()
     try:
-        from src.anomaly_detection import predict_anomaly
-        from src.anomaly_config import ALERT_ANOMALY_CLASSES
-        from backend.alert_service import send_alert
-    except ImportError as e: raise HTTPException(500, detail=f"Detection components missing: {e}")
-    except Exception as e: raise HTTPException(500, detail=f"Import error: {e}")
+        return run_detection_on_video(ctx, payload["video_path"], payload.get("user_email"), db)
+    finally:
+        db.close()
+
+def run_detection_on_video(ctx: JobContext, absolute_video_path: str, user_email: Optional[str], db: Session):
+    from src.anomaly_detection import predict_anomaly_probs
+    from src.anomaly_config import ALERT_ANOMALY_CLASSES
+    from backend.alert_service import send_alert
 
-    # ... (Config, Video Validation, Init... are unchanged) ...
     ALERT_CONFIDENCE_THRESHOLD = 0.5 
     MIN_HITS_FOR_ALERT = 3         
     FRAMES_PER_CLIP = 16           
     LOCATION = "CCTV Camera 1 / Main Entrance"
     WEB_UI_CAMERA_ID = 1
-    if not request.video_url.startswith("/datasets/"): raise HTTPException(400, detail="Invalid video URL.")
-    base_datasets_dir = osp.abspath(osp.join(osp.dirname(__file__), '..', 'datasets'))
-    relative_path = request.video_url.partition('/datasets/')[-1]
-    if not relative_path: raise HTTPException(400, detail="Invalid video URL path.")
-    absolute_video_path = osp.normpath(osp.join(base_datasets_dir, relative_path.replace('/', os.sep)))
-    if not absolute_video_path.startswith(base_datasets_dir): raise HTTPException(400, detail="Invalid video path.")
-    if not osp.exists(absolute_video_path): raise HTTPException(404, detail=f"Video file not found: {absolute_video_path}")
-    try: cap = cv2.VideoCapture(absolute_video_path); assert cap.isOpened()
-    except Exception as e: raise HTTPException(500, detail=f"Error opening video: {e}")
+    cap = cv2.VideoCapture(absolute_video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Error opening video: {absolute_video_path}")
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
-    frames_buffer = []
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    incident_id = None
+    clip_buffer = ClipRingBuffer(FRAMES_PER_CLIP, 224, 224)
     full_video_frames_buffer = [] 
     anomaly_events = [] 
     processed_clips = 0
@@ -402,172 +1329,235 @@ def run_detection_on_video(
     alert_triggered_status = {atype: False for atype in ALERT_ANOMALY_CLASSES}
     unique_anomalies_detected = set() 
     highest_anomaly_score = 0.0
-
-    print(f"\n--- Starting SUSTAINED detection for: {osp.basename(absolute_video_path)} ---")
-
-    # --- Video Processing Loop (Unchanged) ---
+    scores = ScoreSeriesWriter(SCORES_DIR)
     try:
-        while True:
-            # ... (loop content is unchanged) ...
-            ret, frame = cap.read()
-            if not ret: break
-            full_video_frames_buffer.append(frame.copy()) 
-            processed_frames_total += 1
-            resized = cv2.resize(frame, (224, 224))
-            frames_buffer.append(resized)
-            if len(frames_buffer) == FRAMES_PER_CLIP:
-                processed_clips += 1
-                pred_cls, prob = predict_anomaly(frames_buffer)
-                prob_float = float(prob or 0.0) 
-                print(f"  Clip {processed_clips}: Predicted='{pred_cls}', Prob={prob_float:.4f}", end="") 
-                if pred_cls in anomaly_conf_queues:
-                    anomaly_conf_queues[pred_cls].update(prob_float)
-                    if prob_float > highest_anomaly_score:
-                        highest_anomaly_score = prob_float
-                elif pred_cls == "Normal_Videos": 
-                     for q in anomaly_conf_queues.values(): q.clear()
-                for anomaly_type in ALERT_ANOMALY_CLASSES:
-                    current_queue = anomaly_conf_queues[anomaly_type]
-                    should_trigger = current_queue.should_alert(
-                        threshold=ALERT_CONFIDENCE_THRESHOLD,
-                        min_hits=MIN_HITS_FOR_ALERT
-                    )
-                    if should_trigger:
-                        if not alert_triggered_status[anomaly_type]:
-                            print(f" -> SUSTAINED DETECTED: {anomaly_type}!") 
-                            anomaly_events.append({
-                                "event": anomaly_type,
-                                "confidence": prob_float if pred_cls == anomaly_type else current_queue.average(),
-                                "time": datetime.now(timezone.utc).isoformat()
-                            })
-                            alert_triggered_status[anomaly_type] = True 
-                            unique_anomalies_detected.add(anomaly_type) 
-                    else:
-                        if alert_triggered_status[anomaly_type]:
-                            print(f" -> CLEARED: {anomaly_type}") 
-                            alert_triggered_status[anomaly_type] = False
-                print("") 
-                frames_buffer.clear()
-    except Exception as e:
-        print(f"\n[DETECT ERROR] Inference failed after {processed_clips} clips: {e}")
-        traceback.print_exc()
-    finally:
-        cap.release()
+        print(f"\n--- Starting SUSTAINED detection for: {osp.basename(absolute_video_path)} ---")
+
+        # --- Video Processing Loop (Unchanged) ---
+        try:
+            while True:
+                # ... (loop content is unchanged) ...
+                ret, frame = cap.read()
+                if not ret: break
+                full_video_frames_buffer.append(frame.copy()) 
+                processed_frames_total += 1
+                clip_buffer.append(frame)
+                if len(clip_buffer) == FRAMES_PER_CLIP:
+                    processed_clips += 1
+                    pred_cls, prob, probs = predict_anomaly_probs(clip_buffer.latest())
+                    scores.append(processed_frames_total, probs)
+                    if total_frames:
+                        ctx.progress(min(95.0, processed_frames_total * 95.0 / total_frames), f"{processed_clips} clips analyzed")
+                    prob_float = float(prob or 0.0) 
+                    print(f"  Clip {processed_clips}: Predicted='{pred_cls}', Prob={prob_float:.4f}", end="") 
+                    if pred_cls in anomaly_conf_queues:
+                        anomaly_conf_queues[pred_cls].update(prob_float)
+                        if prob_float > highest_anomaly_score:
+                            highest_anomaly_score = prob_float
+                    elif pred_cls == "Normal_Videos": 
+                         for q in anomaly_conf_queues.values(): q.clear()
+                    for anomaly_type in ALERT_ANOMALY_CLASSES:
+                        current_queue = anomaly_conf_queues[anomaly_type]
+                        should_trigger = current_queue.should_alert(
+                            threshold=ALERT_CONFIDENCE_THRESHOLD,
+                            min_hits=MIN_HITS_FOR_ALERT
+                        )
+                        if should_trigger:
+                            if not alert_triggered_status[anomaly_type]:
+                                print(f" -> SUSTAINED DETECTED: {anomaly_type}!") 
+                                anomaly_events.append({
+                                    "event": anomaly_type,
+                                    "confidence": prob_float if pred_cls == anomaly_type else current_queue.average(),
+                                    "time": datetime.now(timezone.utc).isoformat(),
+                                    "frame": processed_frames_total
+                                })
+                                alert_triggered_status[anomaly_type] = True 
+                                unique_anomalies_detected.add(anomaly_type) 
+                        else:
+                            if alert_triggered_status[anomaly_type]:
+                                print(f" -> CLEARED: {anomaly_type}") 
+                                alert_triggered_status[anomaly_type] = False
+                    print("") 
+                    clip_buffer.clear()
+        except Exception as e:
+            print(f"\n[DETECT ERROR] Inference failed after {processed_clips} clips: {e}")
+            traceback.print_exc()
+        finally:
+            cap.release()
 
-    if not processed_frames_total:
-        print(f"--- ERROR: Could not read any frames from {osp.basename(absolute_video_path)} ---")
-        raise HTTPException(500, detail="Could not read frames.")
+        if not processed_frames_total:
+            print(f"--- ERROR: Could not read any frames from {osp.basename(absolute_video_path)} ---")
+            raise RuntimeError("Could not read frames.")
+        ctx.progress(95.0, "Saving evidence", force=True)
 
-    print(f"--- Detection complete for {osp.basename(absolute_video_path)}. Found {len(unique_anomalies_detected)} unique anomaly types. ---")
+        print(f"--- Detection complete for {osp.basename(absolute_video_path)}. Found {len(unique_anomalies_detected)} unique anomaly types. ---")
     
-    # --- Post-Processing (Alerts & DB Save) ---
-    if unique_anomalies_detected:
-        print("\n--- Consolidated Alert Triggered ---")
-        # ... (filename/path logic is unchanged) ...
-        detected_anomalies_list = sorted(list(unique_anomalies_detected))
-        summary_anomaly_type = ", ".join(detected_anomalies_list)
-        sanitized_summary_anomaly_type = re.sub(r'[^a-zA-Z0-9_-]', '_', summary_anomaly_type)
-        location_safe = re.sub(r'[^a-zA-Z0-9_-]', '_', LOCATION)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"consolidated_evidence_{sanitized_summary_anomaly_type.lower()}_{location_safe}_{timestamp}.mp4"
-        saved_path = osp.join(STORAGE_DIR, filename)
-        print(f"Overall: Anomaly(s) '{summary_anomaly_type}' detected.")
+        # --- Post-Processing (Alerts & DB Save) ---
+        if unique_anomalies_detected:
+            print("\n--- Consolidated Alert Triggered ---")
+            # ... (filename/path logic is unchanged) ...
+            detected_anomalies_list = sorted(list(unique_anomalies_detected))
+            summary_anomaly_type = ", ".join(detected_anomalies_list)
+            sanitized_summary_anomaly_type = re.sub(r'[^a-zA-Z0-9_-]', '_', summary_anomaly_type)
+            location_safe = re.sub(r'[^a-zA-Z0-9_-]', '_', LOCATION)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"consolidated_evidence_{sanitized_summary_anomaly_type.lower()}_{location_safe}_{timestamp}.mp4"
+            saved_path = new_evidence_path(filename)
+            print(f"Overall: Anomaly(s) '{summary_anomaly_type}' detected.")
 
-        if not full_video_frames_buffer:
-            print("[ERROR] No frames in buffer, cannot save clip.")
-        else:
-            try:
-                # 1. Save video clip
-                # ... (video saving logic is unchanged) ...
-                h, w, _ = full_video_frames_buffer[0].shape
-                out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-                for f in full_video_frames_buffer:
-                    out.write(f)
-                out.release()
-                print(f"Consolidated evidence video saved to: {saved_path}")
-                
-                # 2. --- MODIFIED: Send email alert ---
-                send_alert(
-                    saved_path, 
-                    location=LOCATION, 
-                    anomaly_type=summary_anomaly_type,
-                    additional_recipient=current_user.email # <-- Pass user's email
-                )
-                
-                # 3. Save Incident and Clip to Database
-                # ... (db save logic is unchanged) ...
+            if not full_video_frames_buffer:
+                print("[ERROR] No frames in buffer, cannot save clip.")
+            else:
+                # No cancel points from here on: the clip, the incident and the alert either all
+                # happen or the clip is removed again, and the alert only names a committed incident
                 try:
+                    # 1. Save video clip
+                    h, w, _ = full_video_frames_buffer[0].shape
+                    out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                    try:
+                        for f in full_video_frames_buffer:
+                            out.write(f)
+                    finally:
+                        out.release()
+                    print(f"Consolidated evidence video saved to: {saved_path}")
+
+                    # 2. Save Incident and Clip to Database
                     cam = db.query(Camera).filter(Camera.id == WEB_UI_CAMERA_ID).first()
                     if not cam:
                         print(f"[ERROR] Camera ID {WEB_UI_CAMERA_ID} not found. Cannot save incident to DB.")
                         print("Please add a camera with this ID to your 'cameras' table.")
                     else:
                         print(f"Saving incident to database for Camera ID: {WEB_UI_CAMERA_ID}...")
-                        inc = Incident(
+                        incident_id, clip_id = create_incident_with_clip(
+                            db,
+                            clip_path=saved_path,
                             camera_id=WEB_UI_CAMERA_ID, 
                             event_type=summary_anomaly_type, 
                             score=highest_anomaly_score, 
                             started_at=datetime.now(timezone.utc), 
                             status="detected_by_web_ui", 
-                            note=json.dumps(anomaly_events)
+                            note=json.dumps(anomaly_events),
+                            events=anomaly_events
                         )
-                        db.add(inc); db.commit(); db.refresh(inc);
-                        
-                        clip = Clip(incident_id=inc.id, file_path=saved_path)
-                        db.add(clip); db.commit(); db.refresh(clip);
-                        print(f"✅ Successfully saved Incident ID: {inc.id} and Clip ID: {clip.id} to database.")
-                
+                        print(f"✅ Successfully saved Incident ID: {incident_id} and Clip ID: {clip_id} to database.")
+                        scores.save(incident_id)
                 except Exception as e:
                     db.rollback()
-                    print(f"[ERROR] Failed to save incident/clip to database: {e}")
+                    print(f"[ERROR] Failed to save clip or incident: {e}")
                     traceback.print_exc()
+                finally:
+                    if incident_id is None:
+                        discard_evidence(saved_path)
 
-            except Exception as e:
-                print(f"[ERROR] Failed to save clip or send email: {e}")
-                traceback.print_exc()
-    else:
-        print("No alert-worthy anomalies detected in this video stream.")
+                # 3. Send email alert
+                if incident_id is not None:
+                    try:
+                        # Keyed per incident: each analyzed video gets its e-mail regardless of cooldowns
+                        send_alert(
+                            saved_path, 
+                            location=LOCATION, 
+                            anomaly_type=summary_anomaly_type,
+                            additional_recipient=user_email,
+                            camera_id=f"detect:{incident_id}"
+                        )
+                    except Exception as e:
+                        print(f"[ERROR] Failed to send email alert: {e}")
+                        traceback.print_exc()
+        else:
+            print("No alert-worthy anomalies detected in this video stream.")
     
-    # --- 5. Return anomaly events AND email status to frontend ---
-    return {
-    "events": anomaly_events,
-    "email_sent_attempted": bool(unique_anomalies_detected) # True if anomalies were found and email was tried
-} 
+        # --- 5. Job result: anomaly events AND email status ---
+        return {
+            "events": anomaly_events,
+            "incident_id": incident_id,
+            "email_sent_attempted": bool(unique_anomalies_detected) # True if anomalies were found and email was tried
+        }
+    finally:
+        scores.discard()  # No-op once saved with an incident
 
 # --- THE HEAVY AI WORKER ---
-def run_ml_background(web_video_path: str, incident_id: int, current_user_email: str, safe_filename: str):
-    db = SessionLocal() # Open a fresh database session for the background task
+@job_handler("analyze_upload")
+def analyze_upload_job(ctx: JobContext, payload: dict):
+    """Decodes an uploaded video once, feeding both detection and the web-safe transcode."""
+    incident_id = payload["incident_id"]
     try:
-        from src.anomaly_detection import predict_anomaly
+        ctx.progress(0, "Analyzing", force=True)
+        run_ml_background(ctx, payload["raw_video_path"], incident_id, payload.get("user_email"), payload["filename"],
+                          web_video_path=payload["web_video_path"], clip_id=payload["clip_id"])
+    except JobCancelled:
+        _set_incident_status(incident_id, STATUS_CANCELLED)
+        raise
+    except Exception:
+        # Leave "analyzing" while a retry is still coming so the UI keeps waiting
+        if ctx.is_final_attempt:
+            _set_incident_status(incident_id, "analysis_failed")
+        raise
+    return {"incident_id": incident_id}
+
+def _set_incident_status(incident_id: int, new_status: str):
+    with SessionLocal() as db:
+        inc = db.get(Incident, incident_id)
+        if inc is not None and inc.status == "analyzing":
+            inc.status = new_status
+            db.commit()
+
+def run_ml_background(ctx: JobContext, video_path: str, incident_id: int, current_user_email: str, safe_filename: str,
+                      web_video_path: Optional[str] = None, clip_id: Optional[int] = None):
+    """
+    Runs detection over `video_path`. With `web_video_path`, the same decoded frames are also
+    encoded to web-safe H.264 there, and clip `clip_id` is switched to it once it is complete.
+    """
+    db = SessionLocal() # Open a fresh database session for the job
+    scores = ScoreSeriesWriter(SCORES_DIR)
+    cap = None
+    encoder = None
+    try:
+        from src.anomaly_detection import predict_anomaly_probs
         from src.anomaly_config import ALERT_ANOMALY_CLASSES
         from backend.alert_service import send_alert
         
         print(f"\n--- [BACKGROUND THREAD] Analyzing: {safe_filename} ---")
         
-        cap = cv2.VideoCapture(web_video_path)
+        cap = cv2.VideoCapture(video_path)
         fps = cap.get(cv2.CAP_PROP_FPS) or 25
-        frames_buffer = []
         anomaly_events = []
+        if web_video_path:
+            encoder = WebTranscoder(web_video_path, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                    int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), fps, audio_source=video_path)
+            if not encoder.start():
+                print("[TRANSCODE] Encoder unavailable; keeping the original upload for playback.")
+                encoder = None
         
         ALERT_CONFIDENCE_THRESHOLD = 0.5 
         MIN_HITS_FOR_ALERT = 3         
         FRAMES_PER_CLIP = 16
+        clip_buffer = ClipRingBuffer(FRAMES_PER_CLIP, 224, 224)
         
         anomaly_conf_queues = {atype: AnomalyConfidenceQueue(max_len=FRAMES_PER_CLIP) for atype in ALERT_ANOMALY_CLASSES}
         alert_triggered_status = {atype: False for atype in ALERT_ANOMALY_CLASSES}
         unique_anomalies_detected = set() 
         highest_anomaly_score = 0.0
 
+        frame_index = 0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        clips_done = 0
+
         # Run Inference
         while True:
             ret, frame = cap.read()
             if not ret: break
+            frame_index += 1
+            if encoder is not None and not encoder.write(frame):
+                encoder = None
             
-            resized = cv2.resize(frame, (224, 224))
-            frames_buffer.append(resized)
+            clip_buffer.append(frame)
             
-            if len(frames_buffer) == FRAMES_PER_CLIP:
-                pred_cls, prob = predict_anomaly(frames_buffer)
+            if len(clip_buffer) == FRAMES_PER_CLIP:
+                pred_cls, prob, probs = predict_anomaly_probs(clip_buffer.latest())
+                scores.append(frame_index, probs)
+                clips_done += 1
+                if total_frames:
+                    ctx.progress(min(99, frame_index * 100 // total_frames), f"{clips_done} clips analyzed")
                 prob_float = float(prob or 0.0) 
                 
                 if pred_cls in anomaly_conf_queues:
@@ -584,102 +1574,217 @@ def run_ml_background(web_video_path: str, incident_id: int, current_user_email:
                             anomaly_events.append({
                                 "event": anomaly_type,
                                 "confidence": prob_float if pred_cls == anomaly_type else current_queue.average(),
-                                "time": datetime.now(timezone.utc).isoformat()
+                                "time": datetime.now(timezone.utc).isoformat(),
+                                "frame": frame_index
                             })
                             alert_triggered_status[anomaly_type] = True 
                             unique_anomalies_detected.add(anomaly_type) 
                     else:
                         alert_triggered_status[anomaly_type] = False
-                frames_buffer.clear()
+                clip_buffer.clear()
         cap.release()
 
-        # Handle Alerts & Database Update
+        # Swap the clip over to the web-safe encode (the alert attaches it too)
+        alert_video_path = video_path
+        if encoder is not None:
+            ctx.progress(99, "Finishing transcode", force=True)
+            encoder_done, encoder = encoder.finish(), None
+            if encoder_done and clip_id is not None:
+                db.execute(update(Clip).where(Clip.id == clip_id).values(file_path=web_video_path))
+                db.commit()
+                clip_postprocessor.submit([clip_id])
+                alert_video_path = web_video_path
+            elif not encoder_done:
+                print(f"[TRANSCODE] Falling back to the original upload for {safe_filename}.")
+
+        # Database Update, then Alerts (no cancel points from here on, so an e-mail always
+        # describes a finished incident)
         summary_anomaly_type = "Normal_Videos"
         final_status = "clean_upload"
-
         if unique_anomalies_detected:
             summary_anomaly_type = ", ".join(sorted(list(unique_anomalies_detected)))
             final_status = "detected_from_upload"
-            try:
-                send_alert(web_video_path, location="User Uploaded Video", anomaly_type=summary_anomaly_type, additional_recipient=current_user_email)
-            except Exception as e:
-                print(f"[ERROR] Background email failed: {e}")
 
         # Update the Incident in the database to mark it as finished
         inc = db.query(Incident).filter(Incident.id == incident_id).first()
         if inc:
+            scores.save(incident_id)
             inc.event_type = summary_anomaly_type
             inc.status = final_status
             inc.score = highest_anomaly_score
             inc.note = json.dumps(anomaly_events)
+            add_incident_events(db, incident_event_rows(inc.id, inc.camera_id, anomaly_events))
             db.commit()
             print(f"✅ [BACKGROUND] Incident {incident_id} analysis complete. DB Updated.")
 
+            if unique_anomalies_detected:
+                try:
+                    # Keyed per upload: each analyzed upload gets its e-mail regardless of cooldowns
+                    send_alert(alert_video_path, location="User Uploaded Video", anomaly_type=summary_anomaly_type, additional_recipient=current_user_email,
+                               camera_id=f"upload:{incident_id}")
+                except Exception as e:
+                    print(f"[ERROR] Background email failed: {e}")
+
     except Exception as e:
         print(f"[ERROR] Background task crashed: {e}")
+        raise
     finally:
+        if encoder is not None:
+            encoder.abort()
+        if cap is not None:
+            cap.release()
+        scores.discard()
         db.close()
 
 
 # --- THE FAST UPLOAD ROUTE ---
-@app.post("/api/analyze/upload")
+# The body is parsed by hand (backend/upload_stream.py), so describe the form for the docs
+UPLOAD_FORM_OPENAPI = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}}}}}}}
+
+@app.post("/api/analyze/upload", status_code=202, openapi_extra=UPLOAD_FORM_OPENAPI)
 async def analyze_uploaded_video(
-    background_tasks: BackgroundTasks, # FastAPI injects the background worker here
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    import subprocess
-    temp_dir = os.path.join(STORAGE_DIR, "temp_uploads")
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    safe_filename = "".join(c for c in file.filename if c.isalnum() or c in ('-', '_', '.'))
-    raw_video_path = os.path.join(temp_dir, f"raw_{current_user.id}_{safe_filename}")
-    web_video_path = os.path.join(temp_dir, f"web_{current_user.id}_{safe_filename.rsplit('.', 1)[0]}.mp4")
+    # 1. Save into the content store, hashing while the body is received (transcoding happens in the job)
+    filename, content_hash, raw_video_path = await receive_multipart_file(request, content_store)
+    safe_filename = "".join(c for c in filename if c.isalnum() or c in ('-', '_', '.'))
+    web_video_path = content_store.derived_path(content_hash, ".web.mp4")
+    current_model = await run_in_threadpool(model_version, MODEL_WEIGHTS_PATH)
 
-    # 1. Save and Transcode (Fast)
-    with open(raw_video_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    print(f"Transcoding {safe_filename} to web-safe format...")
-    try:
-        subprocess.run(['ffmpeg', '-y', '-i', raw_video_path, '-vcodec', 'libx264', '-preset', 'fast', '-acodec', 'aac', web_video_path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
-        print(f"FFmpeg failed: {e}. Falling back to raw file.")
-        web_video_path = raw_video_path
+    # Same bytes already analyzed by this model: link the new incident to that result
+    previous = (await db.execute(
+        select(Clip, Incident).join(Incident, Clip.incident_id == Incident.id)
+        .where(Clip.content_hash == content_hash, Clip.model_version == current_model,
+               Incident.status.in_(("clean_upload", "detected_from_upload")))
+        .order_by(Clip.id.desc()).limit(1)
+    )).first()
+    if previous is not None:
+        return await reuse_upload_analysis(db, previous.Clip, previous.Incident, safe_filename, current_user)
 
     # 2. Create placeholder Incident in DB immediately (Status = "analyzing")
-    from backend.app import Incident, Clip, Camera 
     WEB_UI_CAMERA_ID = 1
-    cam = db.query(Camera).filter(Camera.id == WEB_UI_CAMERA_ID).first()
+    cam = await db.get(Camera, WEB_UI_CAMERA_ID)
     if not cam:
         cam = Camera(id=WEB_UI_CAMERA_ID, name="Web Uploads", location="System")
-        db.add(cam); db.commit()
+        db.add(cam); await db.commit()
 
     inc = Incident(
         camera_id=WEB_UI_CAMERA_ID, 
-        event_type="Analyzing...", 
+        event_type=PENDING_EVENT_TYPE, 
         started_at=datetime.now(timezone.utc), 
         status="analyzing"
     )
-    db.add(inc); db.commit(); db.refresh(inc)
+    db.add(inc); await db.commit(); await db.refresh(inc)
     
-    clip = Clip(incident_id=inc.id, file_path=web_video_path)
-    db.add(clip); db.commit(); db.refresh(clip)
+    # The raw file plays until the job swaps in the transcoded one; an existing transcode is used as is
+    transcoded = osp.exists(web_video_path)
+    clip = Clip(incident_id=inc.id, file_path=web_video_path if transcoded else raw_video_path,
+                content_hash=content_hash, model_version=current_model)
+    db.add(clip); await db.flush()
 
-    # 3. Hand off the heavy ML work to the background thread
-    background_tasks.add_task(run_ml_background, web_video_path, inc.id, current_user.email, safe_filename)
+    # 3. Queue the heavy work; a burst of uploads waits for a free worker
+    job = new_job(Job, "analyze_upload", {
+        "incident_id": inc.id, "clip_id": clip.id, "raw_video_path": raw_video_path,
+        "web_video_path": None if transcoded else web_video_path, "filename": safe_filename,
+        "user_email": current_user.email,
+    }, user_id=current_user.id, incident_id=inc.id)
+    db.add(job); await db.commit()
 
     # 4. Return instantly so the frontend can start playing the video!
     return {
         "clip_id": clip.id,
         "incident_id": inc.id,
-        "filename": safe_filename
+        "filename": safe_filename,
+        "job_id": job.id
     }
 
-import asyncio
+async def reuse_upload_analysis(db: AsyncSession, prev_clip: Clip, prev_inc: Incident, safe_filename: str, current_user):
+    """Creates an incident + clip that share an earlier upload's transcode, result and score series."""
+    inc = Incident(camera_id=prev_inc.camera_id, event_type=prev_inc.event_type, started_at=datetime.now(timezone.utc),
+                   status=prev_inc.status, score=prev_inc.score, note=prev_inc.note)
+    db.add(inc); await db.flush()
+    clip = Clip(incident_id=inc.id, file_path=prev_clip.file_path, duration_seconds=prev_clip.duration_seconds,
+                content_hash=prev_clip.content_hash, model_version=prev_clip.model_version)
+    db.add(clip)
+    await db.run_sync(lambda sync_db: add_incident_events(
+        sync_db, incident_event_rows(inc.id, inc.camera_id, json.loads(prev_inc.note or "[]"))))
+    job = None
+    if inc.status == "detected_from_upload":
+        # Analysis is reused, the alert is not: this user still gets their email
+        job = new_job(Job, "upload_alert", {"video_path": prev_clip.file_path, "anomaly_type": inc.event_type,
+                                            "user_email": current_user.email, "incident_id": inc.id}, user_id=current_user.id, incident_id=inc.id)
+        db.add(job)
+    await db.commit()
+
+    def link_scores():
+        src, dst = series_path(SCORES_DIR, prev_inc.id), series_path(SCORES_DIR, inc.id)
+        if osp.exists(src) and not osp.exists(dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copyfile(src, dst)
+    await run_in_threadpool(link_scores)
+    print(f"[UPLOAD] {safe_filename} matches clip {prev_clip.id}; reused analysis of incident {prev_inc.id}.")
+    return {
+        "clip_id": clip.id,
+        "incident_id": inc.id,
+        "filename": safe_filename,
+        "job_id": job.id if job is not None else None,
+        "reused_incident_id": prev_inc.id
+    }
+
+@job_handler("upload_alert")
+def upload_alert_job(ctx: JobContext, payload: dict):
+    from backend.alert_service import send_alert
+    send_alert(payload["video_path"], location="User Uploaded Video", anomaly_type=payload["anomaly_type"],
+               additional_recipient=payload.get("user_email"), camera_id=f"upload:{payload['incident_id']}")
 
-def save_live_evidence(frames_to_save, anomaly_type, score, user_email):
+# --- Jobs ---
+def _job_out(job: Job) -> JobOut:
+    fields = {name: getattr(job, name) for name in JobOut.model_fields if name != "result"}
+    return JobOut(**fields, result=json.loads(job.result) if job.result else None)
+
+async def _get_owned_job(db: AsyncSession, job_id: int, user) -> Job:
+    job = await db.get(Job, job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs", response_model=List[JobOut])
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    rows = await db.scalars(select(Job).where(Job.user_id == current_user.id).order_by(Job.id.desc()).limit(limit))
+    return [_job_out(job) for job in rows]
+
+@app.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    return _job_out(await _get_owned_job(db, job_id, current_user))
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobOut)
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Queued jobs are cancelled at once; running ones stop at their next progress report."""
+    job = await _get_owned_job(db, job_id, current_user)
+    now = datetime.now(timezone.utc)
+    await db.execute(update(Job).where(Job.id == job_id, Job.status == STATUS_QUEUED)
+                     .values(status=STATUS_CANCELLED, cancel_requested=1, finished_at=now, updated_at=now))
+    await db.execute(update(Job).where(Job.id == job_id, Job.status == STATUS_RUNNING)
+                     .values(cancel_requested=1, updated_at=now))
+    if job.incident_id is not None and job.status == STATUS_QUEUED:
+        await db.execute(update(Incident).where(Incident.id == job.incident_id, Incident.status == "analyzing")
+                         .values(status=STATUS_CANCELLED))
+    await db.commit()
+    await db.refresh(job)
+    return _job_out(job)
+
+from concurrent.futures import ThreadPoolExecutor
+
+def save_live_evidence(frames_to_save, anomaly_type, score, user_email, fps=7.0):
     """Runs in a background thread to save video and send emails."""
     if not frames_to_save: return
     
@@ -691,10 +1796,9 @@ def save_live_evidence(frames_to_save, anomaly_type, score, user_email):
     from datetime import datetime, timezone
     
     # Use absolute import path
-    from backend.app import SessionLocal, Incident, Clip, Camera
+    from backend.app import SessionLocal, Camera, create_incident_with_clip, new_evidence_path
     from backend.alert_service import send_alert
     
-    STORAGE_DIR = os.getenv("STORAGE_DIR", "./storage")
     db = SessionLocal()
     
     try:
@@ -706,46 +1810,43 @@ def save_live_evidence(frames_to_save, anomaly_type, score, user_email):
             db.add(cam)
             db.commit()
 
-        inc = Incident(
-            camera_id=WEB_UI_CAMERA_ID,
-            event_type=anomaly_type,
-            score=score,
-            started_at=datetime.now(timezone.utc),
-            status="detected_from_live",
-            note="[]"
-        )
-        db.add(inc)
-        db.commit()
-        db.refresh(inc)
-
-        # 3. Save Video
+        # 3. Save Video first, so incident + clip go in together
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_anomaly = re.sub(r'[^a-zA-Z0-9_-]', '_', anomaly_type)
-        filename = f"live_evidence_{safe_anomaly}_{timestamp}.mp4"
-        incident_dir = osp.join(STORAGE_DIR, f"incident_{inc.id}")
-        os.makedirs(incident_dir, exist_ok=True)
-        saved_path = osp.join(incident_dir, filename)
+        saved_path = new_evidence_path(f"live_evidence_{safe_anomaly}_{timestamp}.mp4")
 
         h, w, _ = frames_to_save[0].shape
-        out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), 7.0, (w, h))
+        out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
         for f in frames_to_save:
             out.write(f)
         out.release()
 
-        clip = Clip(incident_id=inc.id, file_path=saved_path)
-        db.add(clip)
-        db.commit()
+        detected_at = datetime.now(timezone.utc)
+        events = [{"event": anomaly_type, "confidence": score, "time": detected_at.isoformat()}]
+        create_incident_with_clip(
+            db,
+            clip_path=saved_path,
+            camera_id=WEB_UI_CAMERA_ID,
+            event_type=anomaly_type,
+            score=score,
+            started_at=detected_at,
+            status="detected_from_live",
+            note=json.dumps(events),
+            events=events
+        )
         
         # 4. Email Alert - Using the explicitly imported function
         try:
-            print(f"DEBUG: Attempting to call send_alert with email: {user_email}")
-            send_alert(
+            queued = send_alert(
                 saved_path,
                 location="Argus Edge Node (Mobile)",
                 anomaly_type=anomaly_type,
                 additional_recipient=user_email
             )
-            print("✅ [LIVE ALERT] Email sent successfully.")
+            if queued:
+                print("✅ [LIVE ALERT] E-mail queued for delivery.")
+            else:
+                print("[LIVE ALERT] E-mail not queued (cooldown, rate limit or missing SMTP settings).")
         except Exception as email_err:
             print(f"⚠️ [LIVE ALERT EMAIL ERROR]: {email_err}")
         
@@ -754,54 +1855,584 @@ def save_live_evidence(frames_to_save, anomaly_type, score, user_email):
     finally:
         db.close()
 
-class LiveStreamManager:
+# The mobile camera starts at ~7 FPS; the server then steers it (see LiveCaptureController)
+# and pre-roll/post-roll lengths follow the frame rate actually measured.
+LIVE_FPS = 7
+LIVE_MIN_CAPTURE_FPS = float(os.getenv("LIVE_MIN_CAPTURE_FPS", 2))
+LIVE_MAX_CAPTURE_FPS = float(os.getenv("LIVE_MAX_CAPTURE_FPS", 15))
+LIVE_FRAMES_PER_CLIP = 16
+PRE_ROLL_SECONDS = 8
+POST_ROLL_SECONDS = 8
+# Ring buffer capacity: enough pre-roll for the fastest capture rate we will ask for
+PRE_ROLL_CAPACITY = int(PRE_ROLL_SECONDS * LIVE_MAX_CAPTURE_FPS)
+# How often (seconds) the capture controller re-evaluates a mobile stream
+LIVE_CONTROL_INTERVAL = float(os.getenv("LIVE_CONTROL_INTERVAL", 2.0))
+
+# Decode + inference run on this pool so the event loop only relays frames.
+LIVE_INFERENCE_WORKERS = int(os.getenv("LIVE_INFERENCE_WORKERS", 2))
+# Per-session backlog of undecoded frames; the oldest is dropped when inference falls behind.
+LIVE_MAX_PENDING_FRAMES = int(os.getenv("LIVE_MAX_PENDING_FRAMES", 8))
+live_inference_executor = ThreadPoolExecutor(max_workers=LIVE_INFERENCE_WORKERS, thread_name_prefix="live-inference")
+# Upper bound on the frame rate a desktop viewer may request (0 = unlimited).
+LIVE_VIEWER_MAX_FPS = float(os.getenv("LIVE_VIEWER_MAX_FPS", 15))
+
+# Binary /ws/live frames: little-endian header (uint32 sequence number, float64 capture
+# timestamp in ms since the epoch) followed by the raw JPEG bytes.
+LIVE_FRAME_HEADER = struct.Struct("<Id")
+
+def parse_live_frame(message: dict):
+    """
+    Unpacks a mobile /ws/live message into (sequence, capture_ts_ms, payload).
+    Binary frames carry LIVE_FRAME_HEADER and yield the JPEG bytes; legacy text frames are
+    base64 data URLs with no header and are returned as-is, to be decoded by decode_live_payload
+    on the inference pool rather than on the event loop.
+    """
+    raw = message.get("bytes")
+    if raw is not None:
+        if len(raw) <= LIVE_FRAME_HEADER.size:
+            return None, None, None
+        sequence, capture_ts = LIVE_FRAME_HEADER.unpack_from(raw)
+        return sequence, capture_ts, memoryview(raw)[LIVE_FRAME_HEADER.size:]
+    return None, None, message.get("text")
+
+def decode_live_payload(payload):
+    """JPEG bytes for a parse_live_frame payload; legacy data URLs are base64-decoded here."""
+    if not isinstance(payload, str):
+        return payload
+    _, _, encoded = payload.rpartition(",")
+    try:
+        return base64.b64decode(encoded)
+    except ValueError:
+        return None
+
+class PendingFrame:
+    """An undecoded frame (JPEG bytes, or a legacy base64 data URL) waiting for the session's inference worker."""
+    __slots__ = ("sequence", "capture_ts", "received_at", "jpeg")
+
+    def __init__(self, sequence, capture_ts, received_at, jpeg):
+        self.sequence = sequence
+        self.capture_ts = capture_ts
+        self.received_at = received_at
+        self.jpeg = jpeg
+
+class PostRollState:
+    """Post-roll recording state for one live session (armed when an alert fires)."""
+    __slots__ = ("active", "frames_left", "event_type", "score", "buffer", "user_email")
+
     def __init__(self):
-        self.active_sessions = {}
+        self.active = False
+        self.frames_left = 0
+        self.event_type = None
+        self.score = 0.0
+        self.buffer = []
+        self.user_email = None
 
-    async def connect(self, websocket: WebSocket, session_id: str, client_type: str):
+class LiveMetrics:
+    """Counters for one live session, exposed through /live/metrics."""
+    __slots__ = ("frames_received", "frames_processed", "frames_dropped", "alerts_sent",
+                 "last_alert_latency_ms", "max_alert_latency_ms", "last_capture_to_alert_ms")
+
+    def __init__(self):
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.alerts_sent = 0
+        self.last_alert_latency_ms = None
+        self.max_alert_latency_ms = None
+        self.last_capture_to_alert_ms = None
+
+    def record_alert(self, frame: PendingFrame):
+        """Records receive->alert latency (server clock) and capture->alert latency (client clock, if known)."""
+        latency_ms = (time.monotonic() - frame.received_at) * 1000.0
+        self.alerts_sent += 1
+        self.last_alert_latency_ms = latency_ms
+        self.max_alert_latency_ms = max(self.max_alert_latency_ms or 0.0, latency_ms)
+        if frame.capture_ts is not None:
+            self.last_capture_to_alert_ms = time.time() * 1000.0 - frame.capture_ts
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class LiveViewer:
+    """
+    One desktop viewer of a live session with its own sender task.
+    Frames are latest-wins: a frame not yet sent is replaced by the next one. Alerts are
+    queued and always sent, ahead of any pending frame. Nothing here ever blocks ingest.
+    """
+    __slots__ = ("websocket", "max_fps", "latest_frame", "alerts", "wake", "next_frame_at",
+                 "frames_sent", "frames_skipped", "sender_task")
+
+    def __init__(self, websocket: WebSocket, max_fps: Optional[float] = None):
+        self.websocket = websocket
+        self.wake = asyncio.Event()
+        self.max_fps = None
+        self.set_max_fps(max_fps)
+        self.latest_frame = None   # (kind, payload) where kind is "bytes" or "json"
+        self.alerts = collections.deque()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.sender_task = None
+
+    def set_max_fps(self, max_fps: Optional[float]):
+        try:
+            max_fps = float(max_fps) if max_fps is not None else None
+        except (TypeError, ValueError):
+            max_fps = None
+        if max_fps is not None and max_fps <= 0:
+            max_fps = None
+        if LIVE_VIEWER_MAX_FPS:
+            max_fps = min(max_fps or LIVE_VIEWER_MAX_FPS, LIVE_VIEWER_MAX_FPS)
+        self.max_fps = max_fps
+        self.next_frame_at = 0.0
+        self.wake.set()
+
+    def offer_frame(self, kind: str, payload):
+        if self.latest_frame is not None:
+            self.frames_skipped += 1
+        self.latest_frame = (kind, payload)
+        self.wake.set()
+
+    def offer_alert(self, alert: dict):
+        self.alerts.append(alert)
+        self.wake.set()
+
+    async def run(self):
+        """Sender loop: drains alerts, then sends the newest frame once the viewer's frame interval allows."""
+        try:
+            await self._send_loop()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WS ERROR] Viewer sender stopped: {e}")
+
+    async def _send_loop(self):
+        while True:
+            while self.alerts:
+                await self.websocket.send_json(self.alerts.popleft())
+
+            timeout = None
+            if self.latest_frame is not None:
+                now = time.monotonic()
+                if now >= self.next_frame_at:
+                    kind, payload = self.latest_frame
+                    self.latest_frame = None
+                    if self.max_fps:
+                        self.next_frame_at = now + 1.0 / self.max_fps
+                    if kind == "bytes":
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_json(payload)
+                    self.frames_sent += 1
+                    continue
+                timeout = self.next_frame_at - now
+
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def as_dict(self):
+        return {"max_fps": self.max_fps, "frames_sent": self.frames_sent, "frames_skipped": self.frames_skipped,
+                "alerts_pending": len(self.alerts)}
+
+class RateMeter:
+    """Exponential moving average of an event rate (events/sec) or of a duration."""
+    __slots__ = ("alpha", "last", "avg_interval")
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.last = None
+        self.avg_interval = None
+
+    def tick(self, now: float):
+        """Records an event at `now` (monotonic seconds)."""
+        if self.last is not None:
+            self.observe(now - self.last)
+        self.last = now
+
+    def observe(self, interval: float):
+        """Feeds a measured interval/duration directly."""
+        if interval <= 0:
+            return
+        if self.avg_interval is None:
+            self.avg_interval = interval
+        else:
+            self.avg_interval += self.alpha * (interval - self.avg_interval)
+
+    @property
+    def rate(self):
+        return 1.0 / self.avg_interval if self.avg_interval else None
+
+class LiveCaptureController:
+    """
+    Picks the capture settings sent to a mobile publisher on the /ws/live control channel.
+    The frame rate tracks what the session's inference worker can sustain; when the backlog
+    still grows at the minimum rate, resolution and JPEG quality step down the ladder.
+    """
+    # (width, height, JPEG quality), best first
+    LADDER = [(320, 320, 0.7), (224, 224, 0.6), (224, 224, 0.45), (160, 160, 0.4)]
+    HEADROOM = 0.8
+
+    __slots__ = ("fps", "level", "last_sent", "next_eval_at", "dropped_seen")
+
+    def __init__(self):
+        self.fps = float(LIVE_FPS)
+        self.level = 1
+        self.last_sent = None
+        self.next_eval_at = 0.0
+        self.dropped_seen = 0
+
+    def evaluate(self, session: "LiveSession", now: float) -> Optional[dict]:
+        """Returns a control message when the settings change, otherwise None."""
+        if now < self.next_eval_at:
+            return None
+        self.next_eval_at = now + LIVE_CONTROL_INTERVAL
+
+        depth = len(session.pending)
+        dropped = session.metrics.frames_dropped - self.dropped_seen
+        self.dropped_seen = session.metrics.frames_dropped
+        sustainable = session.service_time.rate
+        target = sustainable * self.HEADROOM if sustainable else self.fps
+
+        if dropped or depth > session.pending.maxlen // 2:
+            # Falling behind: back off quickly, then shrink frames once fps bottoms out
+            target = min(target, self.fps * 0.75)
+            if self.fps <= LIVE_MIN_CAPTURE_FPS:
+                self.level = min(self.level + 1, len(self.LADDER) - 1)
+        elif depth <= 1:
+            # Keeping up (only the frame just received is waiting): creep back towards the sustainable rate, then restore quality
+            target = min(target, self.fps + 1.0)
+            if self.fps >= min(LIVE_MAX_CAPTURE_FPS, target):
+                self.level = max(self.level - 1, 0)
+        else:
+            target = min(target, self.fps)
+
+        self.fps = round(min(max(target, LIVE_MIN_CAPTURE_FPS), LIVE_MAX_CAPTURE_FPS), 1)
+        width, height, quality = self.LADDER[self.level]
+        control = {"type": "control", "fps": self.fps, "width": width, "height": height, "quality": quality}
+        if control == self.last_sent:
+            return None
+        self.last_sent = control
+        return control
+
+class LiveSession:
+    """
+    Per-session state for /ws/live. A single preallocated ring buffer holds the
+    pre-roll history, and its newest LIVE_FRAMES_PER_CLIP frames double as the inference clip.
+
+    A LiveSession only exists on the worker that owns the session (the one its mobile
+    publisher is connected to). Only the session's inference task touches
+    history/queues/alerts/post_roll; the WebSocket handler only appends to `pending`.
+    """
+    __slots__ = ("mobile", "history", "frames_since_inference", "queues", "alerts", "post_roll",
+                 "last_sequence", "pending", "pending_event", "inference_task", "user_email", "metrics",
+                 "frame_rate", "service_time", "capture_controller")
+
+    def __init__(self):
+        from src.anomaly_config import ALERT_ANOMALY_CLASSES
+
+        self.mobile = None
+        # Allocated on the first frame; only the inference window needs to be a zero-copy view
+        self.history = ClipRingBuffer(max(PRE_ROLL_CAPACITY, LIVE_FRAMES_PER_CLIP), 224, 224, max_view=LIVE_FRAMES_PER_CLIP)
+        self.frames_since_inference = 0
+        self.queues = {atype: AnomalyConfidenceQueue(max_len=LIVE_FRAMES_PER_CLIP) for atype in ALERT_ANOMALY_CLASSES}
+        self.alerts = {atype: False for atype in ALERT_ANOMALY_CLASSES}
+        self.post_roll = PostRollState()
+        self.last_sequence = None
+        self.pending = collections.deque(maxlen=LIVE_MAX_PENDING_FRAMES)
+        self.pending_event = asyncio.Event()
+        self.inference_task = None
+        self.user_email = None
+        self.metrics = LiveMetrics()
+        self.frame_rate = RateMeter()     # rate of frames entering history (after drops)
+        self.service_time = RateMeter()   # per-frame decode+inference time on the worker pool
+        self.capture_controller = LiveCaptureController()
+
+    @property
+    def measured_fps(self):
+        """Frame rate of the buffered stream, clamped to the range the controller can request."""
+        fps = self.frame_rate.rate or LIVE_FPS
+        return min(max(fps, LIVE_MIN_CAPTURE_FPS), LIVE_MAX_CAPTURE_FPS)
+
+    def roll_frames(self, seconds: float):
+        return max(1, int(round(seconds * self.measured_fps)))
+
+    def submit_frame(self, frame: PendingFrame):
+        """Queues a frame for inference, dropping the oldest unprocessed one if the queue is full."""
+        if len(self.pending) == self.pending.maxlen:
+            self.metrics.frames_dropped += 1
+        self.pending.append(frame)
+        self.metrics.frames_received += 1
+        self.pending_event.set()
+
+class LiveStreamManager:
+    """
+    Tracks the sessions this worker owns (mobile publisher + inference) and the desktop
+    viewers connected to this worker. Frames and alerts travel through the LiveSessionStore,
+    so a viewer may be on a different worker than the publisher.
+    """
+    def __init__(self, store: LiveSessionStore):
+        self.store = store
+        self.active_sessions = {}   # session_id -> LiveSession (owned here)
+        self.viewers = {}           # session_id -> {websocket: LiveViewer} (connected here)
+        self._deliverers = {}       # session_id -> store subscription callback
+        store.on_ownership_lost = self._ownership_lost
+
+    async def connect(self, websocket: WebSocket, session_id: str, client_type: str, max_fps: Optional[float] = None) -> bool:
+        if client_type == "mobile" and not await self.store.claim_session(session_id):
+            # Another worker already runs inference for this session
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            print(f"[WS] Mobile rejected for session {session_id}: owned by another worker")
+            return False
         await websocket.accept()
-        if session_id not in self.active_sessions:
-            from src.anomaly_config import ALERT_ANOMALY_CLASSES
-            from src.utils import AnomalyConfidenceQueue
+
+        if client_type == "desktop":
+            viewer = LiveViewer(websocket, max_fps)
+            viewer.sender_task = asyncio.create_task(viewer.run())
+            local_viewers = self.viewers.setdefault(session_id, {})
+            local_viewers[websocket] = viewer
+            if session_id not in self._deliverers:
+                deliver = self._make_deliverer(session_id)
+                self._deliverers[session_id] = deliver
+                await self.store.subscribe(session_id, deliver)
+            print(f"[WS] Desktop connected to session {session_id} ({len(local_viewers)} local viewer(s))")
+        else:
+            if session_id not in self.active_sessions:
+                self.active_sessions[session_id] = LiveSession()
+            self.active_sessions[session_id].mobile = websocket
+            print(f"[WS] Mobile connected to session {session_id}")
+        return True
+
+    def _make_deliverer(self, session_id: str):
+        def deliver(kind, payload):
+            for viewer in self.viewers.get(session_id, {}).values():
+                if kind == KIND_ALERT:
+                    viewer.offer_alert(payload)
+                else:
+                    viewer.offer_frame(kind, payload)
+        return deliver
+
+    def _ownership_lost(self, session_id: str):
+        """Another worker owns the session now: stop inference here and drop the publisher so it reconnects."""
+        session = self.active_sessions.pop(session_id, None)
+        if session is None:
+            return
+        if session.inference_task:
+            session.inference_task.cancel()
+        if session.mobile is not None:
+            asyncio.create_task(session.mobile.close(code=status.WS_1013_TRY_AGAIN_LATER))
+        print(f"[WS] Session {session_id} is owned by another worker now; mobile disconnected.")
+
+    async def disconnect(self, websocket: WebSocket, session_id: str, client_type: str):
+        if client_type == "desktop":
+            local_viewers = self.viewers.get(session_id, {})
+            viewer = local_viewers.pop(websocket, None)
+            if viewer and viewer.sender_task:
+                viewer.sender_task.cancel()
+            if not local_viewers:
+                self.viewers.pop(session_id, None)
+                deliver = self._deliverers.pop(session_id, None)
+                if deliver:
+                    await self.store.unsubscribe(session_id, deliver)
+            print(f"[WS] Desktop disconnected from session {session_id}")
+            return
+
+        session = self.active_sessions.get(session_id)
+        if session and session.mobile is websocket:
+            session.mobile = None
+            if session.inference_task:
+                session.inference_task.cancel()
+            del self.active_sessions[session_id]
+            await self.store.release_session(session_id)
+            print(f"[WS] Mobile disconnected; session {session_id} released.")
+
+stream_manager = LiveStreamManager(create_live_store())
+
+@app.on_event("startup")
+async def start_live_store():
+    await stream_manager.store.start()
+
+@app.on_event("startup")
+async def bind_incident_broadcaster():
+    incident_broadcaster.bind(asyncio.get_running_loop())
+
+# --- Job workers ---
+# Each API process starts its own pool; with several uvicorn workers (or --reload) set
+# JOB_WORKERS=0 and run `python -m backend.jobs` once instead.
+job_worker_pool = JobWorkerPool(JOB_WORKERS) if JOB_WORKERS > 0 else None
+job_relay_task = None
+
+async def relay_job_events():
+    """
+    Jobs run in other processes, whose ORM hooks cannot reach this process's broadcaster;
+    follow the jobs table instead and republish job, progress and incident changes over SSE.
+    """
+    def as_utc(at):
+        return at if at.tzinfo is not None else at.replace(tzinfo=timezone.utc)
+
+    last_seen = datetime.now(timezone.utc)
+    while True:
+        await asyncio.sleep(ANALYSIS_PROGRESS_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                jobs = (await db.scalars(select(Job).where(Job.updated_at > last_seen).order_by(Job.updated_at))).all()
+                for job in jobs:
+                    last_seen = max(last_seen, as_utc(job.updated_at))
+                    incident_broadcaster.publish("job.updated", {
+                        "id": job.id, "kind": job.kind, "status": job.status, "progress": job.progress,
+                        "message": job.message, "incident_id": job.incident_id,
+                    })
+                    if job.status == STATUS_RUNNING and job.incident_id is not None:
+                        incident_broadcaster.publish("analysis.progress", {
+                            "incident_id": job.incident_id, "percent": int(job.progress),
+                        })
+                    elif job.status in TERMINAL_STATUSES:
+                        # detect_video creates its incident in the worker; upload jobs update theirs
+                        incident_id = job.incident_id or json.loads(job.result or "{}").get("incident_id")
+                        inc = await db.get(Incident, incident_id) if incident_id else None
+                        if inc is not None:
+                            kind = "incident.updated" if job.incident_id else "incident.created"
+                            incident_broadcaster.publish(kind, {field: getattr(inc, field) for field in INCIDENT_FIELDS})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[JOBS] Event relay error: {e}")
+
+@app.on_event("startup")
+async def start_job_workers():
+    global job_relay_task
+    if job_worker_pool is not None:
+        job_worker_pool.start()
+    job_relay_task = asyncio.create_task(relay_job_events())
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_relay_task is not None:
+        job_relay_task.cancel()
+    if job_worker_pool is not None:
+        await run_in_threadpool(job_worker_pool.stop)
+
+@app.on_event("shutdown")
+async def stop_live_store():
+    await stream_manager.store.close()
+
+@app.on_event("shutdown")
+def stop_clip_postprocessor():
+    clip_postprocessor.shutdown(wait=False)
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
+
+def process_live_frame(session: LiveSession, pending: PendingFrame):
+    """
+    Decodes one frame and runs the pre-roll/post-roll/inference state machine.
+    Runs on live_inference_executor; never called concurrently for the same session.
+    Returns (new_alerts, evidence) where evidence is a finished post-roll to save, or None.
+    """
+    from src.anomaly_detection import predict_anomaly
+    from src.anomaly_config import ALERT_ANOMALY_CLASSES
+
+    new_alerts = []
+    evidence = None
+    jpeg = decode_live_payload(pending.jpeg)
+    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR) if jpeg else None
+    if frame is None:
+        return new_alerts, evidence
+    session.frame_rate.tick(pending.received_at)
+
+    # 1. Resize straight into the preallocated pre-roll ring buffer
+    history = session.history
+    history.append(frame)
+    session.frames_since_inference += 1
+    post_roll = session.post_roll
+        
+    # 2. Handle the Post-roll recording if an alert was triggered
+    if post_roll.active:
+        post_roll.buffer.append(history.latest(1)[0].copy())
+        post_roll.frames_left -= 1
+        
+        # Once we capture the final 8 seconds of evidence, hand it back to be saved
+        if post_roll.frames_left <= 0:
+            evidence = (post_roll.buffer, post_roll.event_type, post_roll.score, post_roll.user_email, session.measured_fps)
+            # Reset the recording state so it can catch the next anomaly
+            post_roll.active = False
+            post_roll.buffer = []
+    
+    # 3. Run ML Inference on 16-frame batches (zero-copy view of the ring buffer)
+    if session.frames_since_inference == LIVE_FRAMES_PER_CLIP:
+        pred_cls, prob = predict_anomaly(history.latest(LIVE_FRAMES_PER_CLIP))
+        prob_float = float(prob or 0.0)
+        
+        queues = session.queues
+        alerts = session.alerts
+        
+        if pred_cls in queues:
+            queues[pred_cls].update(prob_float)
+        elif pred_cls == "Normal_Videos":
+            for q in queues.values(): q.clear()
             
-            self.active_sessions[session_id] = {
-                "desktop": None, 
-                "mobile": None, 
-                "frames": [],      # 16-frame AI inference buffer
-                "history": [],     # 8-second Pre-roll buffer (approx 56 frames at 7 FPS)
-                "queues": {atype: AnomalyConfidenceQueue(max_len=16) for atype in ALERT_ANOMALY_CLASSES},
-                "alerts": {atype: False for atype in ALERT_ANOMALY_CLASSES},
+        # Check alerts
+        for anomaly_type in ALERT_ANOMALY_CLASSES:
+            if queues[anomaly_type].should_alert(threshold=0.5, min_hits=3):
+                if not alerts[anomaly_type]:
+                    alerts[anomaly_type] = True
+                    new_alerts.append({"type": "alert", "event": anomaly_type, "confidence": prob_float})
+                        
+                    # --- START THE POST-ROLL RECORDING ---
+                    # If we aren't already recording an event, lock it in
+                    if not post_roll.active:
+                        post_roll.active = True
+                        post_roll.frames_left = session.roll_frames(POST_ROLL_SECONDS)
+                        post_roll.event_type = anomaly_type
+                        post_roll.score = prob_float
+                        post_roll.user_email = session.user_email
+                        
+                        # Seed the final buffer with the pre-roll history we already have
+                        pre_roll = history.latest(min(len(history), session.roll_frames(PRE_ROLL_SECONDS)))
+                        post_roll.buffer = list(pre_roll.copy())
+            else:
+                alerts[anomaly_type] = False
                 
-                # NEW: State machine to handle the Post-roll recording phase
-                "post_roll": {
-                    "active": False,
-                    "frames_left": 0,
-                    "event_type": None,
-                    "score": 0.0,
-                    "buffer": [],
-                    "user_email": None
-                }
-            }
-            
-        self.active_sessions[session_id][client_type] = websocket
-        print(f"[WS] {client_type.capitalize()} connected to session {session_id}")
+        session.frames_since_inference = 0
 
-    def disconnect(self, websocket: WebSocket, session_id: str, client_type: str):
-        if session_id in self.active_sessions:
-            self.active_sessions[session_id][client_type] = None
-            print(f"[WS] {client_type.capitalize()} disconnected from session {session_id}")
-            if not self.active_sessions[session_id]["desktop"] and not self.active_sessions[session_id]["mobile"]:
-                del self.active_sessions[session_id]
-                print(f"[WS] Session {session_id} destroyed.")
+    return new_alerts, evidence
 
-stream_manager = LiveStreamManager()
+async def run_live_inference(session: LiveSession, session_id: str):
+    """Per-session consumer: drains `pending` through the worker pool, one frame at a time."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await session.pending_event.wait()
+        session.pending_event.clear()
+        while session.pending:
+            pending = session.pending.popleft()
+            started = time.monotonic()
+            try:
+                new_alerts, evidence = await loop.run_in_executor(live_inference_executor, process_live_frame, session, pending)
+            except Exception as e:
+                print(f"[WS INFERENCE ERROR] Session {session_id}: {e}")
+                continue
+            session.service_time.observe(time.monotonic() - started)
+            session.metrics.frames_processed += 1
+
+            for alert in new_alerts:
+                session.metrics.record_alert(pending)
+                try:
+                    await stream_manager.store.publish_alert(session_id, alert)
+                except Exception as e:
+                    print(f"[WS ERROR] Could not publish alert for session {session_id}: {e}")
+            if evidence:
+                loop.run_in_executor(None, save_live_evidence, *evidence)
 
 @app.websocket("/ws/live/{session_id}/{client_type}")
 async def live_stream_endpoint(
     websocket: WebSocket, 
     session_id: str, 
     client_type: str,
-    token: str = Query(None) 
+    token: str = Query(None),
+    max_fps: Optional[float] = Query(None)
 ):
     # 1. STRICT AUTHENTICATION LAYER
     if not token:
@@ -817,113 +2448,87 @@ async def live_stream_endpoint(
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
+    if client_type not in ("mobile", "desktop"):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
     # 2. ACCEPT CONNECTION
-    await stream_manager.connect(websocket, session_id, client_type)
+    if not await stream_manager.connect(websocket, session_id, client_type, max_fps=max_fps):
+        return
     
     try:
-        from src.anomaly_detection import predict_anomaly
-        from src.anomaly_config import ALERT_ANOMALY_CLASSES
-        
-        # We assume the mobile camera captures at ~7 FPS
-        FPS = 7
-        PRE_ROLL_FRAMES = 8 * FPS   # 56 frames before alert
-        POST_ROLL_FRAMES = 8 * FPS  # 56 frames after alert
-        
+        if client_type == "mobile":
+            session = stream_manager.active_sessions[session_id]
+            session.user_email = user_email
+            if session.inference_task is None or session.inference_task.done():
+                session.inference_task = asyncio.create_task(run_live_inference(session, session_id))
+
         while True:
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             
             if client_type == "mobile":
                 session = stream_manager.active_sessions.get(session_id)
                 if not session: continue 
-                    
-                desktop_ws = session.get("desktop")
+                received_at = time.monotonic()
                 
-                # Forward frame to desktop instantly
-                if desktop_ws:
-                    await desktop_ws.send_json({"type": "frame", "image": data})
-
-                # Process Image
-                header, encoded = data.split(",", 1) if "," in data else ("", data)
-                img_bytes = base64.b64decode(encoded)
-                np_arr = np.frombuffer(img_bytes, np.uint8)
-                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-                
-                if frame is not None:
-                    resized = cv2.resize(frame, (224, 224))
-                    
-                    session["frames"].append(resized)
-                    session["history"].append(resized)
-                    
-                    # 1. Maintain the 8-second Pre-roll buffer continuously
-                    if len(session["history"]) > PRE_ROLL_FRAMES:
-                        session["history"].pop(0)
-                        
-                    # 2. Handle the Post-roll recording if an alert was triggered
-                    if session["post_roll"]["active"]:
-                        session["post_roll"]["buffer"].append(resized)
-                        session["post_roll"]["frames_left"] -= 1
-                        
-                        # Once we capture the final 8 seconds of evidence, save it!
-                        if session["post_roll"]["frames_left"] <= 0:
-                            loop = asyncio.get_running_loop()
-                            loop.run_in_executor(
-                                None, 
-                                save_live_evidence, 
-                                session["post_roll"]["buffer"].copy(), 
-                                session["post_roll"]["event_type"], 
-                                session["post_roll"]["score"], 
-                                session["post_roll"]["user_email"]
-                            )
-                            # Reset the recording state so it can catch the next anomaly
-                            session["post_roll"]["active"] = False
-                            session["post_roll"]["buffer"].clear()
-                    
-                    # 3. Run ML Inference on 16-frame batches
-                    if len(session["frames"]) == 16:
-                        pred_cls, prob = predict_anomaly(session["frames"])
-                        prob_float = float(prob or 0.0)
-                        
-                        queues = session["queues"]
-                        alerts = session["alerts"]
-                        
-                        if pred_cls in queues:
-                            queues[pred_cls].update(prob_float)
-                        elif pred_cls == "Normal_Videos":
-                            for q in queues.values(): q.clear()
-                            
-                        # Check alerts
-                        for anomaly_type in ALERT_ANOMALY_CLASSES:
-                            if queues[anomaly_type].should_alert(threshold=0.5, min_hits=3):
-                                if not alerts[anomaly_type]:
-                                    alerts[anomaly_type] = True
-                                    if desktop_ws:
-                                        await desktop_ws.send_json({
-                                            "type": "alert", 
-                                            "event": anomaly_type, 
-                                            "confidence": prob_float
-                                        })
-                                        
-                                    # --- START THE POST-ROLL RECORDING ---
-                                    # If we aren't already recording an event, lock it in
-                                    if not session["post_roll"]["active"]:
-                                        session["post_roll"]["active"] = True
-                                        session["post_roll"]["frames_left"] = POST_ROLL_FRAMES
-                                        session["post_roll"]["event_type"] = anomaly_type
-                                        session["post_roll"]["score"] = prob_float
-                                        session["post_roll"]["user_email"] = user_email
-                                        
-                                        # Seed the final buffer with the 8 seconds of history we already have
-                                        session["post_roll"]["buffer"] = session["history"].copy()
-                            else:
-                                alerts[anomaly_type] = False
-                                
-                        session["frames"].clear()
+                # Fan the frame out to every viewer's send slot: binary frames are relayed
+                # byte-for-byte, legacy text frames keep the old JSON envelope.
+                if message.get("bytes") is not None:
+                    await stream_manager.store.publish_frame(session_id, KIND_BYTES, message["bytes"])
+                elif message.get("text") is not None:
+                    await stream_manager.store.publish_frame(session_id, KIND_JSON, {"type": "frame", "image": message["text"]})
+
+                # Hand the undecoded frame to the inference worker; never wait on it here
+                sequence, capture_ts, img_bytes = parse_live_frame(message)
+                if img_bytes is None: continue
+                if sequence is not None:
+                    session.last_sequence = sequence
+                session.submit_frame(PendingFrame(sequence, capture_ts, received_at, img_bytes))
+
+                # Steer the publisher's capture rate/size/quality from queue depth and processing rate
+                control = session.capture_controller.evaluate(session, received_at)
+                if control:
+                    await websocket.send_json(control)
+
+            elif message.get("text"):
+                # Viewers may change their frame-rate cap at runtime: {"type": "config", "max_fps": 5}
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                viewer = stream_manager.viewers.get(session_id, {}).get(websocket)
+                if viewer and isinstance(control, dict) and control.get("type") == "config" and "max_fps" in control:
+                    viewer.set_max_fps(control["max_fps"])
 
     except WebSocketDisconnect:
-        stream_manager.disconnect(websocket, session_id, client_type)
+        await stream_manager.disconnect(websocket, session_id, client_type)
     except Exception as e:
         print(f"[WS ERROR] {e}")
-        stream_manager.disconnect(websocket, session_id, client_type)
+        await stream_manager.disconnect(websocket, session_id, client_type)
+
+@app.get("/live/metrics")
+def live_metrics(current_user: User = Depends(get_current_user)):
+    sessions = {
+        session_id: {
+            **session.metrics.as_dict(),
+            "pending_frames": len(session.pending),
+            "measured_fps": session.frame_rate.rate,
+            "capture": session.capture_controller.last_sent,
+        }
+        for session_id, session in stream_manager.active_sessions.items()
+    }
+    viewers = {
+        session_id: [viewer.as_dict() for viewer in local_viewers.values()]
+        for session_id, local_viewers in stream_manager.viewers.items()
+    }
+    return {
+        "sessions": sessions,
+        "viewers": viewers,
+        "frames_dropped_total": sum(s["frames_dropped"] for s in sessions.values()),
+        "inference_workers": LIVE_INFERENCE_WORKERS,
+    }
         
 @app.post("/api/simulate/cameras/{camera_id}") 
 def simulate_camera_run(
@@ -933,7 +2538,7 @@ def simulate_camera_run(
     current_user: User = Depends(get_current_user) # <-- Injected user
 ):
     try:
-        from src.anomaly_detection import predict_anomaly
+        from src.anomaly_detection import predict_anomaly_probs
         from src.anomaly_config import ALERT_ANOMALY_CLASSES
         from backend.alert_service import send_alert as send_email_alert 
     except ImportError as e: raise HTTPException(500, detail=f"Sim components missing: {e}")
@@ -946,47 +2551,51 @@ def simulate_camera_run(
     if not video_path: raise HTTPException(404, detail="No test videos found.")
     try: cap = cv2.VideoCapture(video_path); assert cap.isOpened()
     except Exception as e: raise HTTPException(500, detail=f"Error opening video: {e}")
-    frames_per_clip = 16; frames_buffer = []; alert_types = set(); prob_seen = 0.0; first_pred = None; anomaly_events = []; full_frames = []; fps = cap.get(cv2.CAP_PROP_FPS) or 25; processed = 0
+    frames_per_clip = 16; clip_buffer = ClipRingBuffer(frames_per_clip, 224, 224); alert_types = set(); prob_seen = 0.0; first_pred = None; anomaly_events = []; full_frames = []; fps = cap.get(cv2.CAP_PROP_FPS) or 25; processed = 0
+    scores = ScoreSeriesWriter(SCORES_DIR)
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret: break
-            processed += 1 
-            full_frames.append(frame.copy())
-            resized = cv2.resize(frame, (224, 224))
-            frames_buffer.append(resized)
-            if len(frames_buffer) == frames_per_clip:
-                pred_cls, prob = predict_anomaly(frames_buffer);
-                if first_pred is None: first_pred = pred_cls; prob_seen = float(prob or 0.0)
-                if pred_cls and pred_cls in ALERT_ANOMALY_CLASSES and (prob or 0.0) >= 0.5:
-                    alert_types.add(pred_cls); anomaly_events.append({"event": pred_cls, "confidence": float(prob or 0.0), "time": datetime.now(timezone.utc).isoformat()})
-                frames_buffer.clear()
-    except Exception as e: print(f"[SIMULATE INFER ERROR] {e}"); traceback.print_exc()
-    finally: cap.release()
-    if not processed: raise HTTPException(500, detail="Could not read frames.")
-    incident_id = None; clip_id = None; saved_path = None
-    if alert_types:
         try:
-            inc = Incident(camera_id=camera_id, event_type=", ".join(sorted(alert_types)), score=prob_seen, started_at=datetime.now(timezone.utc), status="detected", note=json.dumps(anomaly_events))
-            db.add(inc); db.commit(); db.refresh(inc); incident_id = inc.id
-        except Exception as e: db.rollback(); print(f"[ERROR] DB error creating incident: {e}"); traceback.print_exc(); raise HTTPException(500, detail=f"DB error: {e}")
-        try:
-            incident_dir = osp.join(STORAGE_DIR, f"incident_{incident_id}"); os.makedirs(incident_dir, exist_ok=True); timestamp = datetime.now().strftime("%Y%m%d_%H%M%S"); filename = f"sim_clip_{incident_id}_{timestamp}.mp4"; saved_path = osp.join(incident_dir, filename)
-            if not full_frames: raise ValueError("No frames captured to save.")
-            h, w, _ = full_frames[0].shape; out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h));
-            for f in full_frames: out.write(f); out.release()
-        except Exception as e: print(f"[ERROR] Failed save sim clip: {e}"); traceback.print_exc(); saved_path = None
-        if saved_path:
-            clip = Clip(incident_id=incident_id, file_path=saved_path); db.add(clip); db.commit(); db.refresh(clip); clip_id = clip.id
-            if send_email:
+            while True:
+                ret, frame = cap.read()
+                if not ret: break
+                processed += 1 
+                full_frames.append(frame.copy())
+                clip_buffer.append(frame)
+                if len(clip_buffer) == frames_per_clip:
+                    pred_cls, prob, probs = predict_anomaly_probs(clip_buffer.latest()); scores.append(processed, probs)
+                    if first_pred is None: first_pred = pred_cls; prob_seen = float(prob or 0.0)
+                    if pred_cls and pred_cls in ALERT_ANOMALY_CLASSES and (prob or 0.0) >= 0.5:
+                        alert_types.add(pred_cls); anomaly_events.append({"event": pred_cls, "confidence": float(prob or 0.0), "time": datetime.now(timezone.utc).isoformat(), "frame": processed})
+                    clip_buffer.clear()
+        except Exception as e: print(f"[SIMULATE INFER ERROR] {e}"); traceback.print_exc()
+        finally: cap.release()
+        if not processed: raise HTTPException(500, detail="Could not read frames.")
+        incident_id = None; clip_id = None; saved_path = None
+        if alert_types:
+            try:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S"); saved_path = new_evidence_path(f"sim_clip_{camera_id}_{timestamp}.mp4")
+                if not full_frames: raise ValueError("No frames captured to save.")
+                h, w, _ = full_frames[0].shape; out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h));
+                try:
+                    for f in full_frames: out.write(f)
+                finally: out.release()
+            except Exception as e: print(f"[ERROR] Failed save sim clip: {e}"); traceback.print_exc(); discard_evidence(saved_path); saved_path = None
+            event_type = ", ".join(sorted(alert_types))
+            try:
+                incident_id, clip_id = create_incident_with_clip(db, clip_path=saved_path, camera_id=camera_id, event_type=event_type, score=prob_seen, started_at=datetime.now(timezone.utc), status="detected", note=json.dumps(anomaly_events), events=anomaly_events)
+            except Exception as e: print(f"[ERROR] DB error creating incident: {e}"); traceback.print_exc(); raise HTTPException(500, detail=f"DB error: {e}")
+            scores.save(incident_id)
+            if saved_path and send_email:
                 try: 
                     # --- MODIFIED: Send email alert ---
                     send_email_alert(
                         saved_path, 
                         location=cam.location or f"Camera {camera_id}", 
-                        anomaly_type=inc.event_type,
+                        anomaly_type=event_type,
                         additional_recipient=current_user.email # <-- Pass user's email
                     )
                 except Exception as e: print(f"[ERROR] Failed send email: {e}")
                 
-    return {"video": video_path, "first_prediction": first_pred, "probability": prob_seen, "alert_types": sorted(list(alert_types)), "incident_id": incident_id, "clip_id": clip_id, "saved_clip_path": saved_path, "anomaly_events_log": anomaly_events }
\ No newline at end of file
+        return {"video": video_path, "first_prediction": first_pred, "probability": prob_seen, "alert_types": sorted(list(alert_types)), "incident_id": incident_id, "clip_id": clip_id, "saved_clip_path": saved_path, "anomaly_events_log": anomaly_events }
+    finally:
+        scores.discard()  # No-op once saved with an incident
\ No newline at end of file
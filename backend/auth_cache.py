@@ -0,0 +1,69 @@
+# backend/auth_cache.py
+"""
+In-process cache of validated bearer tokens -> user snapshot.
+
+`get_current_user` runs on every protected request; with the cache a hit costs one dict
+lookup instead of a JWT decode plus a `users` query. Entries expire after `ttl` seconds
+(never later than the token itself), the least recently used entry is evicted beyond
+`maxsize`, and `invalidate_user` drops every token of a user whose account changed.
+
+The cache is per process: with several workers, a deactivation made elsewhere is seen
+here within `ttl` seconds at the latest.
+"""
+import collections
+import threading
+import time
+from types import SimpleNamespace
+
+
+class TokenUserCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()  # token -> (expires_at, user snapshot)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, token: str, user, token_expires_at: float = None):
+        """Caches a snapshot of `user`; `token_expires_at` is the JWT `exp` (epoch seconds)."""
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        # Detached copy so routes never touch a closed Session's instance
+        snapshot = SimpleNamespace(id=user.id, email=user.email, hashed_password=user.hashed_password,
+                                   is_active=user.is_active)
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int = None, email: str = None):
+        with self._lock:
+            stale = [token for token, (_, user) in self._entries.items()
+                     if (user_id is not None and user.id == user_id) or (email is not None and user.email == email)]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
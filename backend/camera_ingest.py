@@ -0,0 +1,390 @@
+# backend/camera_ingest.py
+"""
+Long-running ingest service for the cameras stored in the database.
+
+    python -m backend.camera_ingest
+
+Every active camera with an `rtsp_url` gets its own reader thread. Readers grab every
+frame from the stream (cheap, no decode) so nothing piles up in the capture buffer, and
+only retrieve/decode frames at INGEST_SAMPLE_FPS. Each camera cuts 16-frame clips that
+compete for a shared inference budget (worker pool + clips/sec cap); clips that do not
+fit the budget are skipped rather than queued. A camera has at most one clip in flight,
+so its results update the alert queues in capture order. The camera table is re-read every
+INGEST_POLL_SECONDS so cameras can be added, removed or edited without a restart: a new
+URL restarts the camera's reader, a new name or location is applied to the running one.
+
+`rtsp_url` may also be a local video file path (looped in real time), which makes the
+service testable without a camera or with a local RTSP stand-in server.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import cv2
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.anomaly_config import ALERT_ANOMALY_CLASSES
+from src.utils import AnomalyConfidenceQueue, ClipRingBuffer
+
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", 15))
+INGEST_SAMPLE_FPS = float(os.getenv("INGEST_SAMPLE_FPS", 8))
+INGEST_INFERENCE_WORKERS = int(os.getenv("INGEST_INFERENCE_WORKERS", 2))
+# Shared CPU budget across all cameras
+INGEST_MAX_INFLIGHT_CLIPS = int(os.getenv("INGEST_MAX_INFLIGHT_CLIPS", INGEST_INFERENCE_WORKERS * 2))
+INGEST_MAX_CLIPS_PER_SEC = float(os.getenv("INGEST_MAX_CLIPS_PER_SEC", 4))
+INGEST_RECONNECT_MIN_SECONDS = 1.0
+INGEST_RECONNECT_MAX_SECONDS = 60.0
+INGEST_EVIDENCE_WIDTH = int(os.getenv("INGEST_EVIDENCE_WIDTH", 480))
+INGEST_EVIDENCE_HEIGHT = int(os.getenv("INGEST_EVIDENCE_HEIGHT", 270))
+
+ALERT_CONFIDENCE_THRESHOLD = 0.5
+MIN_HITS_FOR_ALERT = 3
+FRAMES_PER_CLIP = 16
+PRE_ROLL_SECONDS = 8
+POST_ROLL_SECONDS = 8
+
+
+class InferenceBudget:
+    """
+    Shared inference capacity for every camera: a worker pool, a cap on in-flight clips
+    and a token bucket limiting clips/sec. `try_submit` never blocks the caller.
+    """
+    def __init__(self, workers=INGEST_INFERENCE_WORKERS, max_inflight=INGEST_MAX_INFLIGHT_CLIPS,
+                 max_clips_per_sec=INGEST_MAX_CLIPS_PER_SEC):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-inference")
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._rate = max_clips_per_sec
+        self._tokens = max_clips_per_sec
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take_token(self):
+        if not self._rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._rate, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def try_submit(self, fn, *args):
+        """Runs fn(*args) on the pool if the budget allows; returns False if the clip was skipped."""
+        if not self._inflight.acquire(blocking=False):
+            return False
+        if not self._take_token():
+            self._inflight.release()
+            return False
+
+        def run():
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[INGEST] Inference job failed: {e}")
+                traceback.print_exc()
+            finally:
+                self._inflight.release()
+
+        self.executor.submit(run)
+        return True
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class CameraReader(threading.Thread):
+    """Reads one camera stream, cuts inference clips and records pre/post-roll evidence."""
+
+    def __init__(self, camera_id, name, url, location, budget, evidence_executor):
+        super().__init__(name=f"camera-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.camera_name = name
+        self.url = url
+        self.location = location
+        self.budget = budget
+        self.evidence_executor = evidence_executor
+        self.stop_event = threading.Event()
+        self.is_file = os.path.exists(url)
+
+        pre_roll_frames = int(PRE_ROLL_SECONDS * INGEST_SAMPLE_FPS)
+        self.clip_buffer = ClipRingBuffer(FRAMES_PER_CLIP, 224, 224)
+        self.evidence_buffer = ClipRingBuffer(pre_roll_frames, INGEST_EVIDENCE_HEIGHT, INGEST_EVIDENCE_WIDTH)
+        self.queues = {atype: AnomalyConfidenceQueue(max_len=FRAMES_PER_CLIP) for atype in ALERT_ANOMALY_CLASSES}
+        self.alerts = {atype: False for atype in ALERT_ANOMALY_CLASSES}
+        self.lock = threading.Lock()
+        self.post_roll = None  # dict while recording: frames, frames_left, event_type, score
+        self._inferring = threading.Event()  # Set while this camera's clip is in flight
+
+        self.frames_sampled = 0
+        self.clips_submitted = 0
+        self.clips_skipped = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def update_metadata(self, name, location):
+        """Applies a renamed/relocated camera without reconnecting; returns True if anything changed."""
+        with self.lock:
+            if (name, location) == (self.camera_name, self.location):
+                return False
+            self.camera_name, self.location = name, location
+            return True
+
+    # --- Capture ---
+    def _open(self):
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG) if not self.is_file else cv2.VideoCapture(self.url)
+        if cap.isOpened():
+            # Keep the driver-side buffer minimal so we always see the newest frame
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def run(self):
+        backoff = INGEST_RECONNECT_MIN_SECONDS
+        while not self.stop_event.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                print(f"[INGEST] Camera {self.camera_id}: could not open {self.url}; retrying in {backoff:.0f}s")
+                cap.release()
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, INGEST_RECONNECT_MAX_SECONDS)
+                continue
+
+            print(f"[INGEST] Camera {self.camera_id} ({self.camera_name}) streaming from {self.url}")
+            grabbed = 0
+            try:
+                grabbed = self._read_stream(cap)
+            except Exception as e:
+                print(f"[INGEST] Camera {self.camera_id}: stream error: {e}")
+            finally:
+                cap.release()
+
+            if grabbed:
+                backoff = INGEST_RECONNECT_MIN_SECONDS
+                if self.is_file:
+                    continue  # loop local files straight away
+            if not self.stop_event.is_set():
+                print(f"[INGEST] Camera {self.camera_id}: stream lost; reconnecting in {backoff:.0f}s")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, INGEST_RECONNECT_MAX_SECONDS)
+        print(f"[INGEST] Camera {self.camera_id} reader stopped.")
+
+    def _read_stream(self, cap):
+        """Reads until the stream ends or fails; returns the number of frames grabbed."""
+        grabbed = 0
+        sample_interval = 1.0 / INGEST_SAMPLE_FPS
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        next_sample_at = 0.0
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            # grab() only demuxes; frames we do not sample are never decoded
+            if not cap.grab():
+                return grabbed
+            grabbed += 1
+            if self.is_file:
+                # Play local files in real time (and loop them) to mimic a live camera
+                self.stop_event.wait(max(0.0, 1.0 / source_fps - (time.monotonic() - started)))
+            now = time.monotonic()
+            if now < next_sample_at:
+                continue
+            next_sample_at = now + sample_interval
+            ok, frame = cap.retrieve()
+            if ok and frame is not None:
+                self._on_frame(frame)
+        return grabbed
+
+    # --- Clips, alerts and evidence ---
+    def _on_frame(self, frame):
+        self.frames_sampled += 1
+        self.clip_buffer.append(frame)
+        with self.lock:
+            self.evidence_buffer.append(frame)
+            if self.post_roll is not None:
+                self.post_roll["frames"].append(self.evidence_buffer.latest(1)[0].copy())
+                self.post_roll["frames_left"] -= 1
+                if self.post_roll["frames_left"] <= 0:
+                    finished, self.post_roll = self.post_roll, None
+                    self.evidence_executor.submit(save_camera_evidence, self.camera_id, self.location,
+                                                  finished["frames"], finished["event_type"], finished["score"],
+                                                  INGEST_SAMPLE_FPS)
+
+        if len(self.clip_buffer) == FRAMES_PER_CLIP:
+            # The ring buffer is reused immediately, so the in-flight clip needs its own copy
+            clip = self.clip_buffer.latest().copy()
+            self.clip_buffer.clear()
+            # Clips of one camera must not overtake each other, or a late result would
+            # clear or trip the queues against the wrong window
+            if self._inferring.is_set():
+                self.clips_skipped += 1
+                return
+            self._inferring.set()
+            if self.budget.try_submit(self._infer, clip):
+                self.clips_submitted += 1
+            else:
+                self._inferring.clear()
+                self.clips_skipped += 1
+
+    def _infer(self, clip):
+        try:
+            self._apply_prediction(clip)
+        finally:
+            self._inferring.clear()
+
+    def _apply_prediction(self, clip):
+        from src.anomaly_detection import predict_anomaly
+
+        pred_cls, prob = predict_anomaly(clip)
+        prob_float = float(prob or 0.0)
+        with self.lock:
+            if pred_cls in self.queues:
+                self.queues[pred_cls].update(prob_float)
+            elif pred_cls == "Normal_Videos":
+                for q in self.queues.values(): q.clear()
+
+            for anomaly_type in ALERT_ANOMALY_CLASSES:
+                if self.queues[anomaly_type].should_alert(threshold=ALERT_CONFIDENCE_THRESHOLD, min_hits=MIN_HITS_FOR_ALERT):
+                    if not self.alerts[anomaly_type]:
+                        self.alerts[anomaly_type] = True
+                        print(f"[INGEST] Camera {self.camera_id}: {anomaly_type} detected (P={prob_float:.2f})")
+                        if self.post_roll is None:
+                            self.post_roll = {
+                                "frames": list(self.evidence_buffer.latest().copy()),
+                                "frames_left": int(POST_ROLL_SECONDS * INGEST_SAMPLE_FPS),
+                                "event_type": anomaly_type,
+                                "score": prob_float,
+                            }
+                else:
+                    self.alerts[anomaly_type] = False
+
+    def stats(self):
+        return {"frames_sampled": self.frames_sampled, "clips_submitted": self.clips_submitted,
+                "clips_skipped": self.clips_skipped}
+
+
+def save_camera_evidence(camera_id, location, frames, anomaly_type, score, fps):
+    """Writes the evidence clip and records the incident + clip for a database camera."""
+    from backend.app import SessionLocal, create_incident_with_clip, new_evidence_path
+    from backend.alert_service import send_alert
+
+    if not frames:
+        return
+    db = SessionLocal()
+    try:
+        # Clip first, then incident + clip rows in one transaction
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_anomaly = re.sub(r'[^a-zA-Z0-9_-]', '_', anomaly_type)
+        saved_path = new_evidence_path(f"camera_{camera_id}_{safe_anomaly}_{timestamp}.mp4")
+
+        h, w, _ = frames[0].shape
+        out = cv2.VideoWriter(saved_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+        for f in frames:
+            out.write(f)
+        out.release()
+
+        detected_at = datetime.now(timezone.utc)
+        events = [{"event": anomaly_type, "confidence": score, "time": detected_at.isoformat()}]
+        incident_id, _ = create_incident_with_clip(
+            db,
+            clip_path=saved_path,
+            camera_id=camera_id,
+            event_type=anomaly_type,
+            score=score,
+            started_at=detected_at,
+            status="detected_from_camera",
+            note=json.dumps(events),
+            events=events
+        )
+        print(f"✅ [INGEST] Camera {camera_id}: incident {incident_id} saved ({saved_path}).")
+
+        try:
+            send_alert(saved_path, location=location or f"Camera {camera_id}", anomaly_type=anomaly_type,
+                       camera_id=camera_id)
+        except Exception as e:
+            print(f"[INGEST] Camera {camera_id}: alert e-mail failed: {e}")
+    except Exception as e:
+        print(f"[INGEST] Camera {camera_id}: failed to save evidence: {e}")
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+class CameraIngestService:
+    """Keeps one CameraReader per active camera in sync with the `cameras` table."""
+
+    def __init__(self, poll_seconds=INGEST_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.budget = InferenceBudget()
+        self.evidence_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest-evidence")
+        self.readers = {}  # camera_id -> CameraReader
+        self.stop_event = threading.Event()
+
+    def load_cameras(self):
+        from backend.app import SessionLocal, Camera
+
+        db = SessionLocal()
+        try:
+            cameras = db.query(Camera).filter(Camera.is_active == 1, Camera.rtsp_url.isnot(None)).all()
+            return {cam.id: (cam.name, cam.rtsp_url.strip(), cam.location) for cam in cameras if cam.rtsp_url.strip()}
+        finally:
+            db.close()
+
+    def sync(self):
+        try:
+            wanted = self.load_cameras()
+        except Exception as e:
+            print(f"[INGEST] Could not load cameras: {e}")
+            return
+
+        for camera_id, reader in list(self.readers.items()):
+            config = wanted.get(camera_id)
+            if config is None or config[1] != reader.url or not reader.is_alive():
+                reason = "removed" if config is None else "changed" if config[1] != reader.url else "died"
+                print(f"[INGEST] Stopping camera {camera_id} ({reason}).")
+                reader.stop()
+                del self.readers[camera_id]
+            elif reader.update_metadata(config[0], config[2]):
+                print(f"[INGEST] Camera {camera_id}: now '{config[0]}' at {config[2] or 'no location'}.")
+
+        for camera_id, (name, url, location) in wanted.items():
+            if camera_id not in self.readers:
+                reader = CameraReader(camera_id, name, url, location, self.budget, self.evidence_executor)
+                self.readers[camera_id] = reader
+                reader.start()
+
+    def run(self):
+        print(f"[INGEST] Camera ingest service started (poll every {self.poll_seconds:.0f}s, "
+              f"{INGEST_SAMPLE_FPS:g} FPS sampling, {INGEST_MAX_CLIPS_PER_SEC:g} clips/s budget).")
+        try:
+            while not self.stop_event.is_set():
+                self.sync()
+                for camera_id, reader in self.readers.items():
+                    print(f"[INGEST] Camera {camera_id}: {reader.stats()}")
+                self.stop_event.wait(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("[INGEST] Interrupted.")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        for reader in self.readers.values():
+            reader.stop()
+        for reader in self.readers.values():
+            reader.join(timeout=5)
+        self.budget.shutdown()
+        self.evidence_executor.shutdown(wait=True)
+        print("[INGEST] Camera ingest service stopped.")
+
+
+if __name__ == "__main__":
+    CameraIngestService().run()
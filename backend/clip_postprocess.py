@@ -0,0 +1,234 @@
+# backend/clip_postprocess.py
+"""
+Background post-processing for evidence clips.
+
+Whenever a `Clip` row is committed, its id is queued on a small worker pool that
+  * probes duration / fps / resolution into the row,
+  * writes a poster JPEG (a few KB, for list views),
+  * writes a sprite sheet + sprite.json (tile grid for hover scrubbing),
+  * optionally (CLIP_HLS=1, needs ffmpeg) segments the clip into HLS renditions.
+
+Assets live in STORAGE_DIR/clip_assets/<clip_id>/ and are built in a temporary directory
+that is swapped in when complete, so readers never see half-written files. `processed_at`
+is set on the clip once its assets are in place.
+"""
+import json
+import os
+import shutil
+import subprocess
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CLIP_POSTPROCESS_WORKERS = int(os.getenv("CLIP_POSTPROCESS_WORKERS", 1))
+CLIP_POSTER_WIDTH = int(os.getenv("CLIP_POSTER_WIDTH", 320))
+CLIP_SPRITE_COLUMNS = int(os.getenv("CLIP_SPRITE_COLUMNS", 5))
+CLIP_SPRITE_ROWS = int(os.getenv("CLIP_SPRITE_ROWS", 5))
+CLIP_SPRITE_TILE_WIDTH = int(os.getenv("CLIP_SPRITE_TILE_WIDTH", 160))
+CLIP_HLS = os.getenv("CLIP_HLS", "0") == "1"
+# "<height>:<bitrate>" per rendition; renditions taller than the source are skipped
+CLIP_HLS_RENDITIONS = os.getenv("CLIP_HLS_RENDITIONS", "720:1500k,360:400k")
+CLIP_HLS_SEGMENT_SECONDS = int(os.getenv("CLIP_HLS_SEGMENT_SECONDS", 4))
+JPEG_QUALITY = 80
+
+FFMPEG_BIN = shutil.which("ffmpeg")
+FFPROBE_BIN = shutil.which("ffprobe")
+
+
+def clip_assets_dir(storage_dir, clip_id):
+    return os.path.join(storage_dir, "clip_assets", str(clip_id))
+
+
+def probe_video(path):
+    """Returns {duration_seconds, fps, width, height}; ffprobe when available, else OpenCV."""
+    if FFPROBE_BIN:
+        try:
+            out = subprocess.run(
+                [FFPROBE_BIN, "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=width,height,avg_frame_rate,nb_frames:format=duration",
+                 "-of", "json", path],
+                capture_output=True, check=True, timeout=60,
+            ).stdout
+            info = json.loads(out)
+            stream = info["streams"][0]
+            num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+            fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+            return {
+                "duration_seconds": float(info.get("format", {}).get("duration") or 0.0) or None,
+                "fps": fps or None,
+                "width": int(stream["width"]),
+                "height": int(stream["height"]),
+            }
+        except Exception as e:
+            print(f"[POSTPROCESS] ffprobe failed for {path}, falling back to OpenCV: {e}")
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"cannot open {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        return {
+            "duration_seconds": (frames / fps) if fps and frames else None,
+            "fps": fps or None,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def grab_frames(path, timestamps):
+    """Decodes one frame near each timestamp (seconds); missing frames repeat the previous one."""
+    cap = cv2.VideoCapture(path)
+    frames, last = [], None
+    try:
+        for ts in timestamps:
+            cap.set(cv2.CAP_PROP_POS_MSEC, ts * 1000.0)
+            ok, frame = cap.read()
+            if ok:
+                last = frame
+            if last is not None:
+                frames.append(last)
+    finally:
+        cap.release()
+    return frames
+
+
+def _resize_to_width(frame, width):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, max(2, int(h * width / w)) // 2 * 2), interpolation=cv2.INTER_AREA)
+
+
+def make_poster(path, out_path, duration):
+    # 10% in usually skips black lead-in frames
+    frames = grab_frames(path, [(duration or 0.0) * 0.1])
+    if not frames:
+        return False
+    cv2.imwrite(out_path, _resize_to_width(frames[0], CLIP_POSTER_WIDTH), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return True
+
+
+def make_sprite(path, out_path, meta_path, duration):
+    count = CLIP_SPRITE_COLUMNS * CLIP_SPRITE_ROWS
+    interval = (duration or 0.0) / count
+    frames = grab_frames(path, [i * interval for i in range(count)])
+    if not frames:
+        return False
+    tiles = [_resize_to_width(f, CLIP_SPRITE_TILE_WIDTH) for f in frames]
+    tile_h, tile_w = tiles[0].shape[:2]
+    tiles = [t if t.shape[:2] == (tile_h, tile_w) else cv2.resize(t, (tile_w, tile_h)) for t in tiles]
+    tiles += [np.zeros_like(tiles[0])] * (count - len(tiles))
+    rows = [np.hstack(tiles[r * CLIP_SPRITE_COLUMNS:(r + 1) * CLIP_SPRITE_COLUMNS]) for r in range(CLIP_SPRITE_ROWS)]
+    cv2.imwrite(out_path, np.vstack(rows), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    with open(meta_path, "w") as f:
+        json.dump({"columns": CLIP_SPRITE_COLUMNS, "rows": CLIP_SPRITE_ROWS, "tile_width": tile_w,
+                   "tile_height": tile_h, "count": len(frames), "interval_seconds": interval}, f)
+    return True
+
+
+def _bits_per_second(bitrate):
+    bitrate = bitrate.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(bitrate[-1:], 1)
+    return int(float(bitrate.rstrip("km")) * scale)
+
+
+def make_hls(path, out_dir, width, height):
+    """Writes <h>p.m3u8 + segments per rendition and a master.m3u8. Returns the rendition count."""
+    renditions = []
+    for spec in CLIP_HLS_RENDITIONS.split(","):
+        h, _, bitrate = spec.strip().partition(":")
+        if h and bitrate:
+            renditions.append((int(h), bitrate))
+    renditions = [r for r in renditions if r[0] <= height] or [(height - height % 2, renditions[-1][1])]
+    os.makedirs(out_dir, exist_ok=True)
+    variants = []
+    for h, bitrate in renditions:
+        name = f"{h}p"
+        subprocess.run(
+            [FFMPEG_BIN, "-y", "-loglevel", "error", "-i", path,
+             "-vf", f"scale=-2:{h}", "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+             "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate, "-an",
+             "-f", "hls", "-hls_time", str(CLIP_HLS_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+             "-hls_segment_filename", os.path.join(out_dir, f"{name}_%03d.ts"),
+             os.path.join(out_dir, f"{name}.m3u8")],
+            capture_output=True, check=True,
+        )
+        w = int(round(width * h / height / 2)) * 2
+        variants.append(f"#EXT-X-STREAM-INF:BANDWIDTH={_bits_per_second(bitrate)},RESOLUTION={w}x{h}\n{name}.m3u8")
+    with open(os.path.join(out_dir, "master.m3u8"), "w") as f:
+        f.write("#EXTM3U\n#EXT-X-VERSION:3\n" + "\n".join(variants) + "\n")
+    return len(variants)
+
+
+class ClipPostProcessor:
+    def __init__(self, session_factory, clip_model, storage_dir, workers=CLIP_POSTPROCESS_WORKERS):
+        self.session_factory = session_factory
+        self.clip_model = clip_model
+        self.storage_dir = storage_dir
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="clip-postprocess")
+
+    def install(self):
+        """Queues every Clip inserted through the ORM once its transaction commits."""
+        @event.listens_for(Session, "after_flush")
+        def _collect(session, flush_context):
+            new_ids = [obj.id for obj in session.new if isinstance(obj, self.clip_model)]
+            if new_ids:
+                session.info.setdefault("new_clip_ids", []).extend(new_ids)
+
+        @event.listens_for(Session, "after_commit")
+        def _submit(session):
+            self.submit(session.info.pop("new_clip_ids", ()))
+
+        @event.listens_for(Session, "after_soft_rollback")
+        def _discard(session, previous_transaction):
+            session.info.pop("new_clip_ids", None)
+
+    def submit(self, clip_ids):
+        for clip_id in clip_ids:
+            self.executor.submit(self.process, clip_id)
+
+    def process(self, clip_id):
+        db = self.session_factory()
+        try:
+            clip = db.get(self.clip_model, clip_id)
+            if clip is None or not os.path.exists(clip.file_path):
+                return
+            info = probe_video(clip.file_path)
+            final_dir = clip_assets_dir(self.storage_dir, clip_id)
+            work_dir = final_dir + ".tmp"
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            make_poster(clip.file_path, os.path.join(work_dir, "poster.jpg"), info["duration_seconds"])
+            make_sprite(clip.file_path, os.path.join(work_dir, "sprite.jpg"), os.path.join(work_dir, "sprite.json"),
+                        info["duration_seconds"])
+            if CLIP_HLS and FFMPEG_BIN:
+                try:
+                    make_hls(clip.file_path, os.path.join(work_dir, "hls"), info["width"], info["height"])
+                except subprocess.CalledProcessError as e:
+                    print(f"[POSTPROCESS] Clip {clip_id}: HLS segmenting failed: {e.stderr.decode(errors='ignore').strip()}")
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(work_dir, final_dir)
+
+            clip.width, clip.height, clip.fps = info["width"], info["height"], info["fps"]
+            if clip.duration_seconds is None:
+                clip.duration_seconds = info["duration_seconds"]
+            clip.processed_at = datetime.now(timezone.utc)
+            db.commit()
+            print(f"[POSTPROCESS] Clip {clip_id}: {info['width']}x{info['height']} "
+                  f"@ {info['fps'] or 0:.1f} FPS, {info['duration_seconds'] or 0:.1f}s; assets in {final_dir}")
+        except Exception as e:
+            db.rollback()
+            print(f"[POSTPROCESS] Clip {clip_id}: failed: {e}")
+            traceback.print_exc()
+        finally:
+            db.close()
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
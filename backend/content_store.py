@@ -0,0 +1,112 @@
+# backend/content_store.py
+"""
+Content-addressed storage for uploaded videos.
+
+Uploads are hashed (SHA-256) while they stream to a temporary file and then moved to
+`<root>/<h[:2]>/<h[2:4]>/<h>`. Objects are keyed on the digest alone (no extension), so
+the same bytes uploaded as `a.mp4` and `A.MP4` are stored once. A file whose hash is
+already stored is dropped instead. Derived files (the web-safe transcode) live next to
+it under the same hash (`derived_path`).
+
+Several clips may point at one object: never delete an object because one clip went away.
+"""
+import functools
+import hashlib
+import os
+import uuid
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@functools.lru_cache(maxsize=1)
+def model_version(model_path):
+    """
+    MODEL_VERSION from the environment, else a short hash of the weights file, so cached
+    analysis results are only reused with the model that produced them.
+    """
+    configured = os.getenv("MODEL_VERSION")
+    if configured:
+        return configured
+    digest = hashlib.sha256()
+    try:
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(block)
+    except OSError:
+        return "unknown"
+    return digest.hexdigest()[:16]
+
+
+class ContentStore:
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def object_path(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def derived_path(self, content_hash, suffix):
+        """Path for a file derived from an object, e.g. `derived_path(h, ".web.mp4")`."""
+        return self.object_path(content_hash) + suffix
+
+    def open_writer(self):
+        """A ContentWriter for bytes that arrive piecewise (e.g. straight off a request body)."""
+        return ContentWriter(self)
+
+    def put_stream(self, stream):
+        """Copies a binary stream into the store, hashing as it goes. Returns (hash, path)."""
+        writer = self.open_writer()
+        try:
+            for block in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                writer.write(block)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def put_file(self, path, content_hash=None):
+        """Moves an existing file into the store (hashing it unless `content_hash` is given)."""
+        if content_hash is None:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(block)
+            content_hash = digest.hexdigest()
+        return content_hash, self._commit(path, content_hash)
+
+    def _commit(self, tmp_path, content_hash):
+        final_path = self.object_path(content_hash)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return final_path
+
+
+class ContentWriter:
+    """Hashes and writes pieces to a temporary file; `commit()` moves it into the store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._path = os.path.join(store.tmp_dir, uuid.uuid4().hex)
+        self._file = open(self._path, "wb")
+
+    def write(self, data):
+        self._digest.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        """Returns (hash, path) of the stored object."""
+        self._file.close()
+        content_hash = self._digest.hexdigest()
+        return content_hash, self.store._commit(self._path, content_hash)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._path):
+            os.remove(self._path)
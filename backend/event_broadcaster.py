@@ -0,0 +1,126 @@
+# backend/event_broadcaster.py
+"""
+In-process fan-out of incident events to Server-Sent Event subscribers (/stream/incidents).
+
+Events are published from anywhere (request handlers, background tasks, worker threads);
+each gets a monotonically increasing id and is kept in a short replay buffer so a client
+reconnecting with `Last-Event-ID` receives what it missed. Every subscriber has its own
+bounded asyncio queue; a subscriber that falls too far behind is disconnected instead of
+slowing the publisher down, and its reconnect replays from the buffer.
+
+Incident inserts/updates made through the ORM are published automatically once their
+transaction commits (`install`). Events only reach subscribers of this process; with
+several uvicorn workers each worker streams its own events.
+"""
+import asyncio
+import collections
+import json
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+INCIDENT_FIELDS = ("id", "camera_id", "event_type", "score", "started_at", "ended_at", "status")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class IncidentEventBroadcaster:
+    def __init__(self, replay_size=500, queue_size=256):
+        self.replay = collections.deque(maxlen=replay_size)
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def bind(self, loop):
+        """Sets the event loop subscribers live on (call from startup)."""
+        self._loop = loop
+
+    # --- Publishing ---
+    def publish(self, event_type: str, data: dict):
+        """Thread-safe; returns the event id."""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            message = (event_id, event_type, json.dumps(data, default=_json_default, separators=(",", ":")))
+            self.replay.append(message)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, message)
+        return event_id
+
+    def _dispatch(self, message):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow: end its stream; the client reconnects and replays from Last-Event-ID
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    # --- Subscribing (event loop only) ---
+    def subscribe(self, last_event_id=None):
+        """
+        Returns (queue, backlog). `backlog` holds replayed events newer than `last_event_id`,
+        or a single 'reset' event when that id has already left the replay buffer.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(queue)
+            backlog = []
+            if last_event_id is not None:
+                oldest = self.replay[0][0] if self.replay else self._next_id
+                if last_event_id + 1 < oldest:
+                    backlog = [(self._next_id - 1, "reset", "{}")]
+                else:
+                    backlog = [m for m in self.replay if m[0] > last_event_id]
+        return queue, backlog
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # --- ORM integration ---
+    def install(self, incident_model):
+        """Publishes incident.created / incident.updated after the inserting/updating transaction commits."""
+        def snapshot(obj):
+            return {field: getattr(obj, field) for field in INCIDENT_FIELDS}
+
+        @event.listens_for(Session, "after_flush")
+        def _collect(session, flush_context):
+            pending = session.info.setdefault("incident_broadcasts", {})
+            for obj in session.new:
+                if isinstance(obj, incident_model):
+                    pending[obj.id] = ("incident.created", snapshot(obj))
+            for obj in session.dirty:
+                if isinstance(obj, incident_model) and session.is_modified(obj, include_collections=False):
+                    # An update after a create in the same transaction is still a create for listeners
+                    kind = pending.get(obj.id, ("incident.updated",))[0]
+                    pending[obj.id] = (kind, snapshot(obj))
+            if not pending:
+                session.info.pop("incident_broadcasts", None)
+
+        @event.listens_for(Session, "after_commit")
+        def _publish(session):
+            for kind, data in session.info.pop("incident_broadcasts", {}).values():
+                self.publish(kind, data)
+
+        @event.listens_for(Session, "after_soft_rollback")
+        def _discard(session, previous_transaction):
+            session.info.pop("incident_broadcasts", None)
+
+
+def format_sse(message) -> str:
+    event_id, event_type, data = message
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
@@ -0,0 +1,190 @@
+# backend/incident_stats.py
+"""
+Hourly incident rollups (`incident_stats_hourly`) kept up to date incrementally.
+
+Each row counts the incidents that started in one UTC hour for one (camera_id, event_type)
+pair, plus the sum of their scores so averages can be derived. An ORM `after_flush` hook
+turns inserted, updated and deleted incidents into +/- deltas and applies them with an
+upsert in the same transaction as the incident write, so the rollups commit or roll back
+together with it. Core bulk inserts bypass the ORM and must call `record_inserted`.
+Incidents whose event type is one of `pending_event_types` (the "Analyzing..." placeholder
+of an upload still being analysed) are not counted until their final type is set.
+
+    python -m backend.incident_stats rebuild
+
+recomputes the whole table from `incidents` (backfill, or after out-of-band edits). Run it
+while no incidents are being written; rows flushed during the rebuild may be lost.
+"""
+import argparse
+import collections
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, event, inspect, select, update
+from sqlalchemy.orm import Session
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+KEY_ATTRS = ("started_at", "camera_id", "event_type")
+
+
+def hour_bucket(dt: datetime) -> datetime:
+    """Start of the UTC hour containing `dt` (naive datetimes are taken as UTC)."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    else:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.obj(), attr)
+
+
+class IncidentRollup:
+    def __init__(self, incident_model, stats_model, pending_event_types=()):
+        self.incident_model = incident_model
+        self.table = stats_model.__table__
+        self.pending_event_types = frozenset(pending_event_types)
+
+    def install(self):
+        """Registers the flush hook for every Session (sync and async)."""
+        # Load the previous value on assignment even if the attribute was expired,
+        # otherwise an update could not subtract from the right bucket
+        for attr in KEY_ATTRS + ("score",):
+            event.listen(getattr(self.incident_model, attr), "set", lambda *args: None, active_history=True)
+        event.listen(Session, "after_flush", self._after_flush)
+
+    # --- Delta collection ---
+    def _key(self, started_at, camera_id, event_type):
+        return hour_bucket(started_at), camera_id, event_type
+
+    def _after_flush(self, session, flush_context):
+        deltas = collections.defaultdict(lambda: [0, 0.0])
+        model = self.incident_model
+        for obj in session.new:
+            if isinstance(obj, model):
+                self._add(deltas, self._key(obj.started_at, obj.camera_id, obj.event_type), 1, obj.score)
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                state = inspect(obj)
+                old = self._key(*(_old_value(state, attr) for attr in KEY_ATTRS))
+                self._add(deltas, old, -1, _old_value(state, "score"))
+        for obj in session.dirty:
+            if not isinstance(obj, model):
+                continue
+            state = inspect(obj)
+            if not any(state.attrs[attr].history.has_changes() for attr in KEY_ATTRS + ("score",)):
+                continue
+            old = self._key(*(_old_value(state, attr) for attr in KEY_ATTRS))
+            self._add(deltas, old, -1, _old_value(state, "score"))
+            self._add(deltas, self._key(obj.started_at, obj.camera_id, obj.event_type), 1, obj.score)
+        if deltas:
+            self._apply(session.connection(), deltas)
+
+    def _add(self, deltas, key, count, score):
+        if key[2] in self.pending_event_types:
+            return
+        delta = deltas[key]
+        delta[0] += count
+        delta[1] += count * float(score or 0.0)
+
+    def record_inserted(self, connection, incidents):
+        """Rollup deltas for incidents inserted with Core (dicts with started_at, camera_id, event_type, score)."""
+        deltas = collections.defaultdict(lambda: [0, 0.0])
+        for inc in incidents:
+            self._add(deltas, self._key(inc["started_at"], inc["camera_id"], inc["event_type"]), 1, inc.get("score"))
+        if deltas:
+            self._apply(connection, deltas)
+
+    # --- Writes ---
+    def _apply(self, connection, deltas):
+        t = self.table
+        rows = [
+            {"bucket_start": bucket, "camera_id": camera_id, "event_type": event_type,
+             "incident_count": count, "score_sum": score_sum}
+            for (bucket, camera_id, event_type), (count, score_sum) in deltas.items()
+            if count or score_sum
+        ]
+        if not rows:
+            return
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            stmt = dialect_insert(t)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[t.c.bucket_start, t.c.camera_id, t.c.event_type],
+                set_={
+                    "incident_count": t.c.incident_count + stmt.excluded.incident_count,
+                    "score_sum": t.c.score_sum + stmt.excluded.score_sum,
+                },
+            )
+            connection.execute(stmt, rows)
+        else:
+            for row in rows:
+                result = connection.execute(
+                    update(t)
+                    .where(t.c.bucket_start == row["bucket_start"], t.c.camera_id == row["camera_id"],
+                           t.c.event_type == row["event_type"])
+                    .values(incident_count=t.c.incident_count + row["incident_count"],
+                            score_sum=t.c.score_sum + row["score_sum"])
+                )
+                if result.rowcount == 0:
+                    connection.execute(t.insert(), row)
+        if any(row["incident_count"] < 0 for row in rows):
+            buckets = {row["bucket_start"] for row in rows if row["incident_count"] < 0}
+            connection.execute(delete(t).where(t.c.bucket_start.in_(buckets), t.c.incident_count <= 0))
+
+    def rebuild(self, db, batch_size=5000):
+        """Recomputes every rollup row from `incidents` in one transaction. Returns the row count."""
+        inc = self.incident_model
+        deltas = collections.defaultdict(lambda: [0, 0.0])
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(inc.id, inc.started_at, inc.camera_id, inc.event_type, inc.score)
+                .where(inc.id > last_id).order_by(inc.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                self._add(deltas, self._key(row.started_at, row.camera_id, row.event_type), 1, row.score)
+        connection = db.connection()
+        connection.execute(delete(self.table))
+        if deltas:
+            connection.execute(self.table.insert(), [
+                {"bucket_start": bucket, "camera_id": camera_id, "event_type": event_type,
+                 "incident_count": count, "score_sum": score_sum}
+                for (bucket, camera_id, event_type), (count, score_sum) in deltas.items()
+            ])
+        db.commit()
+        return len(deltas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain incident_stats_hourly")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    from backend.app import Base, SessionLocal, engine, incident_rollup
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        count = incident_rollup.rebuild(db, batch_size=args.batch_size)
+        print(f"[STATS] Rebuilt incident_stats_hourly: {count} rows.")
+    finally:
+        db.close()
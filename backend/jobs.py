@@ -0,0 +1,337 @@
+# backend/jobs.py
+"""
+Persistent job queue for heavy work (video detection, upload analysis).
+
+Jobs are rows in the `jobs` table. A pool of JOB_WORKERS worker *processes* claims queued
+jobs one at a time (FOR UPDATE SKIP LOCKED where supported, plus a conditional UPDATE so
+two workers can never run the same job), so a burst of requests queues up instead of
+starting unbounded concurrent inference.
+
+While a job runs, its worker refreshes `heartbeat_at`. Any worker that finds a `running`
+job whose heartbeat is older than JOB_STALE_SECONDS (its process crashed or was killed)
+puts it back in the queue, or marks it failed once `max_attempts` is used up. Exceptions
+are retried the same way with exponential backoff. Cancellation is cooperative: handlers
+report progress through `JobContext.progress()`, which raises `JobCancelled` once a
+cancel was requested.
+
+Handlers are registered with `@job_handler("<kind>")` in backend/app.py. Workers start
+with the API (JOB_WORKERS > 0) or standalone:
+
+    python -m backend.jobs [--workers N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 10))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", 5))
+JOB_PROGRESS_INTERVAL_SECONDS = 1.0
+# How long shutdown waits for busy workers before terminating them (their jobs are retried)
+JOB_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("JOB_SHUTDOWN_TIMEOUT_SECONDS", 30))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+_HANDLERS = {}
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a handler when its job was cancelled. A BaseException (like
+    asyncio.CancelledError) so the pipelines' broad `except Exception` blocks let it through.
+    """
+
+
+def job_handler(kind):
+    def register(func):
+        _HANDLERS[kind] = func
+        return func
+    return register
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def new_job(job_model, kind, payload, max_attempts=JOB_MAX_ATTEMPTS, **fields):
+    """Unsaved Job row; add it with the rest of the request's writes and commit."""
+    now = _now()
+    return job_model(kind=kind, payload=json.dumps(payload), status=STATUS_QUEUED, progress=0.0,
+                     attempts=0, max_attempts=max_attempts, cancel_requested=0,
+                     created_at=now, updated_at=now, available_at=now, **fields)
+
+
+class JobContext:
+    """Passed to handlers: progress reporting, cancellation checks and retry info."""
+
+    def __init__(self, session_factory, job_model, job_id, attempt, max_attempts):
+        self.session_factory = session_factory
+        self.job_model = job_model
+        self.job_id = job_id
+        self.attempt = attempt
+        self.max_attempts = max_attempts
+        self._last_report = 0.0
+
+    @property
+    def is_final_attempt(self):
+        return self.attempt >= self.max_attempts
+
+    def progress(self, percent, message=None, force=False):
+        """Records progress (throttled) and raises JobCancelled if a cancel was requested."""
+        now = time.monotonic()
+        if not force and now - self._last_report < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        Job = self.job_model
+        db = self.session_factory()
+        try:
+            values = {"progress": float(max(0.0, min(100.0, percent))), "updated_at": _now(), "heartbeat_at": _now()}
+            if message is not None:
+                values["message"] = message
+            db.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            cancel_requested = db.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+            db.commit()
+        finally:
+            db.close()
+        if cancel_requested:
+            raise JobCancelled()
+
+    def check_cancelled(self):
+        Job = self.job_model
+        db = self.session_factory()
+        try:
+            if db.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar():
+                raise JobCancelled()
+        finally:
+            db.close()
+
+
+class JobRunner:
+    def __init__(self, session_factory, job_model, worker_id, after_job=None):
+        self.session_factory = session_factory
+        self.job_model = job_model
+        self.worker_id = worker_id
+        # Called after every handler, before the job is marked done (e.g. to flush queued alerts)
+        self.after_job = after_job
+        self._last_reap = 0.0
+
+    # --- Queue operations ---
+    def claim(self):
+        """Atomically moves the oldest runnable queued job to running. Returns (id, kind, payload, attempt, max_attempts) or None."""
+        Job = self.job_model
+        db = self.session_factory()
+        try:
+            now = _now()
+            job_id = db.execute(
+                select(Job.id)
+                .where(Job.status == STATUS_QUEUED, Job.available_at <= now)
+                .order_by(Job.id).limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar()
+            if job_id is None:
+                db.rollback()
+                return None
+            claimed = db.execute(
+                update(Job).where(Job.id == job_id, Job.status == STATUS_QUEUED)
+                .values(status=STATUS_RUNNING, worker_id=self.worker_id, attempts=Job.attempts + 1,
+                        started_at=now, heartbeat_at=now, updated_at=now, error=None)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return None
+            job = db.get(Job, job_id)
+            return job.id, job.kind, json.loads(job.payload or "{}"), job.attempts, job.max_attempts
+        finally:
+            db.close()
+
+    def reap_stale(self):
+        """Requeues (or fails) running jobs whose worker stopped heartbeating."""
+        Job = self.job_model
+        cutoff = _now() - timedelta(seconds=JOB_STALE_SECONDS)
+        stale = (Job.status == STATUS_RUNNING, Job.heartbeat_at < cutoff)
+        db = self.session_factory()
+        try:
+            now = _now()
+            cancelled = db.execute(update(Job).where(*stale, Job.cancel_requested == 1).values(
+                status=STATUS_CANCELLED, finished_at=now, updated_at=now)).rowcount
+            requeued = db.execute(update(Job).where(*stale, Job.attempts < Job.max_attempts).values(
+                status=STATUS_QUEUED, worker_id=None, available_at=now, updated_at=now,
+                error="worker stopped responding; retrying")).rowcount
+            failed = db.execute(update(Job).where(*stale).values(
+                status=STATUS_FAILED, finished_at=now, updated_at=now,
+                error="worker stopped responding; no attempts left")).rowcount
+            db.commit()
+            if cancelled or requeued or failed:
+                print(f"[JOBS] Stale jobs: {requeued} requeued, {failed} failed, {cancelled} cancelled.")
+        finally:
+            db.close()
+
+    def _finish(self, job_id, **values):
+        Job = self.job_model
+        db = self.session_factory()
+        try:
+            values.setdefault("finished_at", _now())
+            values["updated_at"] = _now()
+            db.execute(update(Job).where(Job.id == job_id, Job.status == STATUS_RUNNING).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _heartbeat(self, job_id, stop_event):
+        Job = self.job_model
+        while not stop_event.wait(JOB_HEARTBEAT_SECONDS):
+            db = self.session_factory()
+            try:
+                db.execute(update(Job).where(Job.id == job_id, Job.status == STATUS_RUNNING)
+                           .values(heartbeat_at=_now()))
+                db.commit()
+            except Exception as e:
+                print(f"[JOBS] Heartbeat for job {job_id} failed: {e}")
+            finally:
+                db.close()
+
+    # --- Execution ---
+    def execute(self, job_id, kind, payload, attempt, max_attempts):
+        ctx = JobContext(self.session_factory, self.job_model, job_id, attempt, max_attempts)
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop_heartbeat), daemon=True)
+        heartbeat.start()
+        print(f"[JOBS] {self.worker_id}: job {job_id} ({kind}) attempt {attempt}/{max_attempts} started.")
+        try:
+            handler = _HANDLERS.get(kind)
+            if handler is None:
+                raise RuntimeError(f"no handler registered for job kind '{kind}'")
+            try:
+                result = handler(ctx, payload)
+            finally:
+                self._run_after_job(job_id)
+            self._finish(job_id, status=STATUS_SUCCEEDED, progress=100.0,
+                         result=json.dumps(result, default=str) if result is not None else None)
+            print(f"[JOBS] {self.worker_id}: job {job_id} succeeded.")
+        except JobCancelled:
+            self._finish(job_id, status=STATUS_CANCELLED)
+            print(f"[JOBS] {self.worker_id}: job {job_id} cancelled.")
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+            if attempt < max_attempts:
+                delay = JOB_RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+                self._finish(job_id, status=STATUS_QUEUED, worker_id=None, error=error, finished_at=None,
+                             available_at=_now() + timedelta(seconds=delay))
+                print(f"[JOBS] {self.worker_id}: job {job_id} failed ({error}); retrying in {delay:.0f}s.")
+            else:
+                self._finish(job_id, status=STATUS_FAILED, error=error)
+                print(f"[JOBS] {self.worker_id}: job {job_id} failed permanently: {error}")
+        finally:
+            stop_heartbeat.set()
+
+    def _run_after_job(self, job_id):
+        if self.after_job is None:
+            return
+        try:
+            self.after_job()
+        except Exception as e:
+            print(f"[JOBS] {self.worker_id}: after-job hook for job {job_id} failed: {e}")
+
+    def run_forever(self, stop_event):
+        print(f"[JOBS] {self.worker_id}: ready.")
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() - self._last_reap >= JOB_STALE_SECONDS / 2:
+                    self._last_reap = time.monotonic()
+                    self.reap_stale()
+                claimed = self.claim()
+            except Exception as e:
+                print(f"[JOBS] {self.worker_id}: queue error: {e}")
+                claimed = None
+            if claimed is None:
+                stop_event.wait(JOB_POLL_SECONDS)
+                continue
+            self.execute(*claimed)
+        print(f"[JOBS] {self.worker_id}: stopped.")
+
+
+# --- Worker processes ---
+def _worker_main(index, stop_event):
+    # Importing the app registers the job handlers and builds the DB engine for this process
+    import backend.app as app_module
+    from backend.alert_service import get_dispatcher
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    # Alerts queued by a job are delivered before it is marked done: a worker terminated at
+    # shutdown never runs its atexit flush, and the job would be retried without its e-mail
+    runner = JobRunner(app_module.SessionLocal, app_module.Job, worker_id,
+                       after_job=lambda: get_dispatcher().flush())
+    try:
+        runner.run_forever(stop_event)
+    except KeyboardInterrupt:
+        pass
+
+
+class JobWorkerPool:
+    """JOB_WORKERS spawned processes (spawn, not fork: no inherited DB connections or torch state)."""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._processes = []
+
+    def start(self):
+        for index in range(self.workers):
+            process = self._ctx.Process(target=_worker_main, args=(index, self._stop),
+                                        name=f"job-worker-{index}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        print(f"[JOBS] Started {self.workers} job worker process(es).")
+
+    def stop(self, timeout=JOB_SHUTDOWN_TIMEOUT_SECONDS):
+        """Asks workers to finish their current job and stop; one still busy after `timeout` is terminated and its job is retried later."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run job worker processes")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+    pool = JobWorkerPool(max(1, args.workers))
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("[JOBS] Interrupted.")
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    # Go through the package module so handlers registered by backend.app land in the same registry
+    import backend.jobs
+    backend.jobs.main()
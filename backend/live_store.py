@@ -0,0 +1,285 @@
+# backend/live_store.py
+"""
+Session ownership and frame/alert relay for /ws/live.
+
+A live session is *owned* by the worker its mobile publisher is connected to; only that
+worker decodes frames and runs inference. Frames and alerts are published through a
+LiveSessionStore, and every worker that has desktop viewers for the session subscribes
+and fans the messages out to its local viewers.
+
+Two implementations:
+  * InMemoryLiveSessionStore - single process (the default, same behaviour as before).
+  * RedisLiveSessionStore    - any Redis-protocol server, so publishers and viewers may land
+                               on different uvicorn workers or nodes.
+
+Select with LIVE_SESSION_STORE=memory|redis (REDIS_URL for the broker address).
+"""
+import abc
+import asyncio
+import collections
+import json
+import os
+import socket
+import uuid
+
+# Message kinds delivered to subscribers: a raw binary frame, a JSON frame envelope
+# (legacy text clients) or an alert.
+KIND_BYTES = "bytes"
+KIND_JSON = "json"
+KIND_ALERT = "alert"
+
+# Frames waiting to be published to the broker; the oldest is dropped when it falls behind.
+LIVE_STORE_PUBLISH_QUEUE = int(os.getenv("LIVE_STORE_PUBLISH_QUEUE", 64))
+
+
+class LiveSessionStore(abc.ABC):
+    """
+    Interface between /ws/live connections and wherever session state lives.
+    Subscriber callbacks are plain functions `callback(kind, payload)` and must not block.
+    `on_ownership_lost(session_id)`, if set, is called the same way when this worker finds
+    that a session it claimed is now owned elsewhere; it must stop decoding that session.
+    """
+    on_ownership_lost = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abc.abstractmethod
+    async def claim_session(self, session_id: str) -> bool:
+        """Makes this worker the owner of the session. Returns False if another worker owns it."""
+
+    @abc.abstractmethod
+    async def release_session(self, session_id: str):
+        """Gives up ownership of the session (no-op if this worker does not own it)."""
+
+    @abc.abstractmethod
+    async def publish_frame(self, session_id: str, kind: str, payload):
+        """Relays a frame to the session's viewers. May drop frames; must not wait on viewers."""
+
+    @abc.abstractmethod
+    async def publish_alert(self, session_id: str, alert: dict):
+        """Relays an alert to the session's viewers. Alerts are never dropped."""
+
+    @abc.abstractmethod
+    async def subscribe(self, session_id: str, callback):
+        """Starts delivering the session's frames and alerts to `callback`."""
+
+    @abc.abstractmethod
+    async def unsubscribe(self, session_id: str, callback):
+        """Stops delivering to `callback`."""
+
+
+class InMemoryLiveSessionStore(LiveSessionStore):
+    """Single-process store: ownership is implicit and publishing calls subscribers directly."""
+    def __init__(self):
+        self._subscribers = {}  # session_id -> list of callbacks
+
+    async def claim_session(self, session_id: str) -> bool:
+        return True
+
+    async def release_session(self, session_id: str):
+        pass
+
+    async def publish_frame(self, session_id: str, kind: str, payload):
+        for callback in self._subscribers.get(session_id, ()):
+            callback(kind, payload)
+
+    async def publish_alert(self, session_id: str, alert: dict):
+        for callback in self._subscribers.get(session_id, ()):
+            callback(KIND_ALERT, alert)
+
+    async def subscribe(self, session_id: str, callback):
+        self._subscribers.setdefault(session_id, []).append(callback)
+
+    async def unsubscribe(self, session_id: str, callback):
+        callbacks = self._subscribers.get(session_id)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[session_id]
+
+
+class RedisLiveSessionStore(LiveSessionStore):
+    """
+    Broker-backed store for multi-worker deployments.
+
+    Ownership is a `<prefix>:<session>:owner` key set with NX and a TTL that the owning
+    worker keeps refreshing. Each session has one pub/sub channel; messages are a one-byte
+    kind tag (F = binary frame, J = JSON frame, A = alert) followed by the payload.
+
+    Frames are not published inline: publish_frame appends to a bounded queue drained by a
+    background task, so a slow broker costs dropped frames instead of stalling the socket.
+
+    `client` may be any redis.asyncio-compatible client, e.g. a local stand-in in tests.
+    """
+    OWNER_TTL_SECONDS = 30
+
+    # Only touch the owner key if this worker still holds it
+    _EXPIRE_IF_OWNER = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+    _DELETE_IF_OWNER = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    _TAGS = {KIND_BYTES: b"F", KIND_JSON: b"J", KIND_ALERT: b"A"}
+    _KINDS = {ord("F"): KIND_BYTES, ord("J"): KIND_JSON, ord("A"): KIND_ALERT}
+
+    def __init__(self, url: str = None, client=None, prefix: str = "argus:live",
+                 publish_queue_size: int = LIVE_STORE_PUBLISH_QUEUE):
+        if client is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError as e:
+                raise RuntimeError("LIVE_SESSION_STORE=redis requires the 'redis' package (pip install redis).") from e
+            client = redis_asyncio.from_url(url or "redis://localhost:6379/0")
+        self.redis = client
+        self.prefix = prefix
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._owned = set()
+        self._subscribers = {}
+        self._pubsub = None
+        self._reader_task = None
+        self._heartbeat_task = None
+        self._outbox = collections.deque(maxlen=max(1, publish_queue_size))
+        self._outbox_ready = asyncio.Event()
+        self._publisher_task = None
+        self.frames_dropped = 0
+
+    def _owner_key(self, session_id: str) -> str:
+        return f"{self.prefix}:{session_id}:owner"
+
+    def _channel(self, session_id: str) -> str:
+        return f"{self.prefix}:{session_id}"
+
+    async def start(self):
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._heartbeat_task = asyncio.create_task(self._refresh_ownership())
+        self._publisher_task = asyncio.create_task(self._publish_frames())
+        print(f"[LIVE STORE] Redis live session store started as worker {self.worker_id}")
+
+    async def close(self):
+        for task in (self._reader_task, self._heartbeat_task, self._publisher_task):
+            if task:
+                task.cancel()
+        for session_id in list(self._owned):
+            await self.release_session(session_id)
+        if self._pubsub is not None:
+            close = getattr(self._pubsub, "aclose", None) or self._pubsub.close
+            await close()
+
+    async def claim_session(self, session_id: str) -> bool:
+        key = self._owner_key(session_id)
+        claimed = await self.redis.set(key, self.worker_id, nx=True, ex=self.OWNER_TTL_SECONDS)
+        if not claimed:
+            owner = await self.redis.get(key)
+            if isinstance(owner, bytes):
+                owner = owner.decode()
+            claimed = owner == self.worker_id
+        if claimed:
+            self._owned.add(session_id)
+        return bool(claimed)
+
+    async def release_session(self, session_id: str):
+        self._owned.discard(session_id)
+        await self.redis.eval(self._DELETE_IF_OWNER, 1, self._owner_key(session_id), self.worker_id)
+
+    async def _refresh_ownership(self):
+        while True:
+            await asyncio.sleep(self.OWNER_TTL_SECONDS / 3)
+            for session_id in list(self._owned):
+                try:
+                    refreshed = await self.redis.eval(self._EXPIRE_IF_OWNER, 1, self._owner_key(session_id),
+                                                      self.worker_id, self.OWNER_TTL_SECONDS)
+                except Exception as e:
+                    print(f"[LIVE STORE] Could not refresh ownership of session {session_id}: {e}")
+                    continue
+                if not refreshed:
+                    # The key expired (e.g. during a broker outage) and may have been claimed elsewhere
+                    self._lose_ownership(session_id)
+
+    def _lose_ownership(self, session_id: str):
+        if session_id not in self._owned:
+            return  # Released while the refresh was in flight
+        self._owned.discard(session_id)
+        print(f"[LIVE STORE] Lost ownership of session {session_id}.")
+        if self.on_ownership_lost is not None:
+            try:
+                self.on_ownership_lost(session_id)
+            except Exception as e:
+                print(f"[LIVE STORE] Ownership-lost handler failed for session {session_id}: {e}")
+
+    async def publish_frame(self, session_id: str, kind: str, payload):
+        body = bytes(payload) if kind == KIND_BYTES else json.dumps(payload).encode()
+        if len(self._outbox) == self._outbox.maxlen:
+            self.frames_dropped += 1  # deque(maxlen) evicts the oldest frame on append
+        self._outbox.append((self._channel(session_id), self._TAGS[kind] + body))
+        self._outbox_ready.set()
+
+    async def _publish_frames(self):
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            while self._outbox:
+                channel, message = self._outbox.popleft()
+                try:
+                    await self.redis.publish(channel, message)
+                except Exception as e:
+                    print(f"[LIVE STORE] Could not publish frame on {channel}: {e}")
+
+    async def publish_alert(self, session_id: str, alert: dict):
+        await self.redis.publish(self._channel(session_id), self._TAGS[KIND_ALERT] + json.dumps(alert).encode())
+
+    async def subscribe(self, session_id: str, callback):
+        callbacks = self._subscribers.setdefault(session_id, [])
+        if not callbacks:
+            await self._pubsub.subscribe(self._channel(session_id))
+            if self._reader_task is None or self._reader_task.done():
+                self._reader_task = asyncio.create_task(self._read_messages())
+        callbacks.append(callback)
+
+    async def unsubscribe(self, session_id: str, callback):
+        callbacks = self._subscribers.get(session_id)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[session_id]
+                await self._pubsub.unsubscribe(self._channel(session_id))
+
+    async def _read_messages(self):
+        prefix_len = len(self.prefix) + 1
+        while self._subscribers:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                print(f"[LIVE STORE] Pub/sub read failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = message["data"]
+            if not data:
+                continue
+            # One malformed message (or failing callback) must not end the reader for everyone
+            try:
+                kind = self._KINDS.get(data[0])
+                if kind is None:
+                    print(f"[LIVE STORE] Ignoring message with unknown tag {data[:1]!r} on {channel}")
+                    continue
+                payload = data[1:] if kind == KIND_BYTES else json.loads(data[1:])
+                for callback in list(self._subscribers.get(channel[prefix_len:], ())):
+                    callback(kind, payload)
+            except Exception as e:
+                print(f"[LIVE STORE] Dropping message on {channel}: {e}")
+
+
+def create_live_store() -> LiveSessionStore:
+    """Builds the store selected by LIVE_SESSION_STORE (memory or redis)."""
+    backend = os.getenv("LIVE_SESSION_STORE", "memory").lower()
+    if backend == "redis":
+        return RedisLiveSessionStore(url=os.getenv("REDIS_URL"))
+    if backend != "memory":
+        print(f"[LIVE STORE] Unknown LIVE_SESSION_STORE '{backend}', using in-memory store.")
+    return InMemoryLiveSessionStore()
@@ -0,0 +1,81 @@
+# backend/migrate_incident_events.py
+"""
+One-off backfill of `incident_events` from the JSON lists stored in `incidents.note`.
+
+    python -m backend.migrate_incident_events [--batch-size 500] [--dry-run]
+
+Incidents are walked in id order in keyset batches, one transaction per batch. Incidents
+that already have event rows are skipped, so the script can be interrupted and re-run
+safely. Notes that are not a JSON list of {"event", "confidence", "time"} are ignored.
+`incidents.note` itself is left untouched.
+"""
+import argparse
+import json
+import os
+import sys
+
+from sqlalchemy import exists, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+
+def parse_note(note):
+    try:
+        detections = json.loads(note or "[]")
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(detections, list):
+        return []
+    return [d for d in detections if isinstance(d, dict)]
+
+
+def migrate(batch_size=500, dry_run=False):
+    from backend.app import SessionLocal, Incident, IncidentEvent, add_incident_events, incident_event_rows
+
+    last_id = 0
+    migrated = skipped = inserted = 0
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Incident.id, Incident.camera_id, Incident.note)
+                .where(Incident.id > last_id)
+                .where(~exists().where(IncidentEvent.incident_id == Incident.id))
+                .order_by(Incident.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            event_rows = []
+            for incident_id, camera_id, note in rows:
+                new_rows = incident_event_rows(incident_id, camera_id, parse_note(note))
+                if new_rows:
+                    migrated += 1
+                    event_rows.extend(new_rows)
+                else:
+                    skipped += 1
+            inserted += len(event_rows)
+            if not dry_run:
+                add_incident_events(db, event_rows)
+                db.commit()
+            print(f"[MIGRATE] Up to incident {last_id}: {migrated} migrated, {skipped} without events, {inserted} rows.")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    action = "Would insert" if dry_run else "Inserted"
+    print(f"[MIGRATE] Done. {action} {inserted} event rows for {migrated} incidents ({skipped} had no parsable events).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill incident_events from incidents.note")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Parse and count only, write nothing")
+    args = parser.parse_args()
+    migrate(batch_size=args.batch_size, dry_run=args.dry_run)
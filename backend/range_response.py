@@ -0,0 +1,134 @@
+# backend/range_response.py
+"""
+File responses with HTTP Range support for video seeking and resumable downloads.
+
+`FileRangeResponse` answers single-range `Range: bytes=...` requests with 206 Partial
+Content and honours If-Range, If-None-Match and If-Modified-Since against a strong
+ETag derived from size + mtime. Multi-range requests get the whole file (200), which
+RFC 9110 allows. When the ASGI server offers the `http.response.zerocopy` extension the
+body is handed to it as (file, offset, count) for sendfile(); otherwise it is read in
+chunks in a worker thread so the event loop never blocks on disk I/O.
+"""
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_etag(stat_result):
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) inclusive for a single satisfiable byte range, None when the header
+    should be ignored (absent, malformed or multi-range), or raises ValueError when unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _not_modified(request_headers, etag, mtime):
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_matches(value, etag, last_modified):
+    if value is None:
+        return True
+    value = value.strip()
+    # Weak tags never match If-Range (strong comparison)
+    return value == etag if value.startswith('"') else value == last_modified
+
+
+class FileRangeResponse(Response):
+    def __init__(self, request, path, filename=None, media_type="video/mp4", disposition="inline",
+                 extra_headers=None):
+        self.path = path
+        stat_result = os.stat(path)
+        size = stat_result.st_size
+        etag = file_etag(stat_result)
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+            "cache-control": "private, max-age=0, must-revalidate",
+        }
+        if filename:
+            headers["content-disposition"] = f'{disposition}; filename="{filename}"'
+        headers.update(extra_headers or {})
+
+        self.offset, self.length = 0, size
+        status_code = 200
+        if _not_modified(request.headers, etag, stat_result.st_mtime):
+            status_code, self.length = 304, 0
+        elif _if_range_matches(request.headers.get("if-range"), etag, last_modified):
+            try:
+                byte_range = parse_range(request.headers.get("range"), size)
+            except ValueError:
+                byte_range = None
+                status_code, self.length = 416, 0
+                headers["content-range"] = f"bytes */{size}"
+            if byte_range is not None:
+                start, end = byte_range
+                status_code, self.offset, self.length = 206, start, end - start + 1
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        super().__init__(content=None, status_code=status_code, headers=headers,
+                         media_type=media_type if status_code in (200, 206) else None)
+        if status_code in (200, 206):
+            self.headers["content-length"] = str(self.length)
+        self.send_body = status_code in (200, 206) and request.method != "HEAD"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopy", "file": f, "offset": self.offset,
+                            "count": self.length, "more_body": False})
+                return
+            await run_in_threadpool(f.seek, self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; close the response cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
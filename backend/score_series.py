@@ -0,0 +1,94 @@
+# backend/score_series.py
+"""
+Per-clip softmax score series, stored per incident as one float16 `.npy` file.
+
+Each record is (frame, probs[NUM_CLASSES]): `frame` is the last frame of the clip the
+probabilities belong to. A one-hour 25 FPS video scored every 16 frames is ~5.6k records
+at 32 bytes each. Writers stream records to a `.part` file while the video is processed,
+so memory stays flat, and `save()` prepends the `.npy` header once the incident id is
+known. Readers memory-map the file and reduce it to a few hundred points with
+`minmax_reduce`, so large series are never sent as JSON.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.anomaly_config import NUM_CLASSES
+
+
+def series_dtype(num_classes=NUM_CLASSES):
+    return np.dtype([("frame", "<i4"), ("probs", "<f2", (num_classes,))])
+
+
+def series_path(directory, incident_id):
+    return os.path.join(directory, f"incident_{incident_id}.npy")
+
+
+class ScoreSeriesWriter:
+    def __init__(self, directory, num_classes=NUM_CLASSES):
+        self.directory = directory
+        self.dtype = series_dtype(num_classes)
+        self.count = 0
+        self._record = np.zeros(1, dtype=self.dtype)
+        os.makedirs(directory, exist_ok=True)
+        self._part = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+
+    def append(self, frame, probs):
+        if probs is None or self._part is None:
+            return
+        self._record["frame"] = frame
+        self._record["probs"] = probs
+        self._part.write(self._record.tobytes())
+        self.count += 1
+
+    def save(self, incident_id):
+        """Writes incident_<id>.npy (replacing any previous series). Returns its path, or None if empty."""
+        if self._part is None or not self.count:
+            self.discard()
+            return None
+        part, self._part = self._part, None
+        path = series_path(self.directory, incident_id)
+        tmp_path = path + ".tmp"
+        try:
+            part.flush()
+            part.seek(0)
+            with open(tmp_path, "wb") as f:
+                np.lib.format.write_array_header_1_0(f, {
+                    "descr": np.lib.format.dtype_to_descr(self.dtype),
+                    "fortran_order": False,
+                    "shape": (self.count,),
+                })
+                shutil.copyfileobj(part, f)
+            os.replace(tmp_path, path)
+            return path
+        finally:
+            part.close()
+            os.remove(part.name)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def discard(self):
+        if self._part is not None:
+            part, self._part = self._part, None
+            part.close()
+            os.remove(part.name)
+
+
+def load_series(path):
+    """Memory-mapped structured array with fields `frame` and `probs`."""
+    return np.load(path, mmap_mode="r")
+
+
+def minmax_reduce(frames, values, points):
+    """
+    Reduces a series to at most `points` buckets, keeping each bucket's min and max so
+    short spikes survive downsampling. Returns (bucket_first_frame, bucket_last_frame, mins, maxs).
+    """
+    n = len(values)
+    buckets = max(1, min(points, n))
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    ends = np.append(starts[1:], n) - 1
+    values = np.asarray(values, dtype=np.float32)
+    return frames[starts], frames[ends], np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)
@@ -0,0 +1,97 @@
+# backend/transcode.py
+"""
+Web-safe H.264 encoding fed from frames that are already decoded.
+
+The upload pipeline decodes the raw video once with OpenCV and hands every frame to both
+inference and a `WebTranscoder`, which pipes them as raw BGR into an ffmpeg process. The
+audio track (if any) is copied from the original file by the same ffmpeg process, so the
+video stream is never decoded twice. The output is written next to its final name and
+renamed into place only when ffmpeg exits cleanly.
+"""
+import os
+import shutil
+import subprocess
+import uuid
+
+FFMPEG_BIN = shutil.which("ffmpeg")
+TRANSCODE_PRESET = os.getenv("TRANSCODE_PRESET", "fast")
+
+
+class WebTranscoder:
+    def __init__(self, out_path, width, height, fps, audio_source=None):
+        self.out_path = out_path
+        # Unique per encoder: two uploads of the same content may encode to one target at once
+        self.tmp_path = f"{out_path}.{uuid.uuid4().hex[:8]}.part.mp4"
+        self.width, self.height, self.fps = width, height, fps or 25
+        self.audio_source = audio_source
+        self.process = None
+
+    def start(self):
+        """Launches ffmpeg; False when ffmpeg is unavailable or the frame size is unknown."""
+        if not FFMPEG_BIN or not self.width or not self.height:
+            return False
+        cmd = [FFMPEG_BIN, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{self.width}x{self.height}",
+               "-r", f"{self.fps:.3f}", "-i", "pipe:0"]
+        if self.audio_source:
+            cmd += ["-i", self.audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", "aac"]
+        cmd += ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-c:v", "libx264", "-preset", TRANSCODE_PRESET,
+                "-pix_fmt", "yuv420p", "-movflags", "+faststart", "-shortest", self.tmp_path]
+        try:
+            # stderr discarded so a chatty encoder can never fill a pipe and stall us
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"[TRANSCODE] Could not start ffmpeg: {e}")
+            return False
+        return True
+
+    def write(self, frame):
+        """Feeds one BGR frame; returns False (and gives up) if the encoder went away."""
+        if self.process is None:
+            return False
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            return True  # Mid-stream size change: skip rather than corrupt the raw stream
+        try:
+            self.process.stdin.write(frame.tobytes())
+            return True
+        except (BrokenPipeError, OSError) as e:
+            print(f"[TRANSCODE] Encoder stopped accepting frames: {e}")
+            self.abort()
+            return False
+
+    def finish(self, timeout=300):
+        """Flushes the encoder; True once the output is in place at `out_path`."""
+        if self.process is None:
+            return False
+        try:
+            self.process.stdin.close()
+            code = self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[TRANSCODE] Encoder did not finish: {e}")
+            self.abort()
+            return False
+        self.process = None
+        if code != 0 or not os.path.exists(self.tmp_path):
+            print(f"[TRANSCODE] ffmpeg exited with code {code}.")
+            self._remove_tmp()
+            return False
+        os.replace(self.tmp_path, self.out_path)
+        return True
+
+    def abort(self):
+        if self.process is not None:
+            self.process.kill()
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.process.wait()
+            self.process = None
+        self._remove_tmp()
+
+    def _remove_tmp(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,105 @@
+# backend/upload_stream.py
+"""
+Streams the file of a multipart/form-data request straight into the content store.
+
+`UploadFile` parameters are only handed to a route after Starlette has spooled the whole
+body to a temporary file, so storing them means reading and writing every byte a second
+time. `receive_multipart_file` instead parses the request body as it arrives and feeds
+the chosen file field to a `ContentWriter`, which hashes and writes it in one pass. Disk
+writes (and hashing, which releases the GIL) run in the threadpool in `buffer_bytes`
+pieces, never on the event loop. Other form fields are ignored.
+"""
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+BUFFER_BYTES = 1024 * 1024
+
+
+class _FileFieldCollector:
+    """MultipartParser callbacks that collect the bytes of the first file part named `field`."""
+
+    def __init__(self, field):
+        self.field = field.encode()
+        self.filename = None
+        self.found = False
+        self.pending = bytearray()
+        self._in_field = False
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if not self.found and params.get(b"name") == self.field and b"filename" in params:
+            self.found = self._in_field = True
+            self.filename = params[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(self, data, start, end):
+        if self._in_field:
+            self.pending += data[start:end]
+
+    def on_part_end(self):
+        self._in_field = False
+
+
+async def receive_multipart_file(request: Request, store, field="file", buffer_bytes=BUFFER_BYTES):
+    """
+    Stores the `field` file of a multipart request in `store` while the body is received.
+    Returns (filename, content_hash, path). Raises 400 for a malformed body and 422 when
+    the field is missing; nothing is left in the store in either case.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(400, detail="expected a multipart/form-data body")
+    collector = _FileFieldCollector(field)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    writer = await run_in_threadpool(store.open_writer)
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if len(collector.pending) >= buffer_bytes:
+                    await run_in_threadpool(writer.write, collector.pending)
+                    collector.pending.clear()
+            parser.finalize()
+        except FormParserError as e:
+            raise HTTPException(400, detail=f"malformed multipart body: {e}")
+        if not collector.found:
+            raise HTTPException(422, detail=f"missing file field '{field}'")
+        await run_in_threadpool(writer.write, collector.pending)
+        content_hash, path = await run_in_threadpool(writer.commit)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    return collector.filename, content_hash, path
@@ -0,0 +1,85 @@
+# benchmarks/_common.py
+"""
+Shared setup for the backend benchmarks: a throwaway database for backend.app and a fast
+Core bulk seeder for incidents.
+
+configure_backend() must run before backend.app is imported, since the app reads its
+configuration from the environment at import time. An existing DATABASE_URL (e.g. a
+Postgres instance) can be passed instead of the default SQLite file.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.anomaly_config import ALERT_ANOMALY_CLASSES  # noqa: E402
+
+SEED_STATUSES = ("detected", "reviewed", "dismissed")
+
+
+def configure_backend(database_url=None, workdir=None):
+    """Points backend.app at a benchmark database and storage directory; returns the workdir."""
+    workdir = workdir or tempfile.mkdtemp(prefix="argus-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STORAGE_DIR"] = os.path.join(workdir, "storage")
+    os.environ.setdefault("ARGUS_API_KEY", "bench-api-key")
+    os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+    return workdir
+
+
+def seed_incidents(backend, rows, cameras=20, days=365, chunk=50_000, seed=0):
+    """
+    Bulk-inserts incidents with Core until the table holds `rows` (an already seeded database
+    is reused). Core inserts bypass the ORM hooks, so no rollups are recorded; run
+    incident_rollup.rebuild() afterwards if they are needed. Returns the incident count.
+    """
+    from sqlalchemy import func, insert, select
+
+    with backend.engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(backend.Incident)).scalar()
+        if not conn.execute(select(func.count()).select_from(backend.Camera)).scalar():
+            conn.execute(insert(backend.Camera), [
+                {"id": i, "name": f"Bench camera {i}", "location": f"Site {i}"} for i in range(1, cameras + 1)
+            ])
+    if existing >= rows:
+        print(f"Reusing {existing:,} seeded incidents.")
+        return existing
+
+    rng = random.Random(seed + existing)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    for offset in range(existing, rows, chunk):
+        batch = [
+            {
+                "camera_id": rng.randint(1, cameras),
+                "event_type": rng.choice(ALERT_ANOMALY_CLASSES),
+                "score": round(rng.uniform(0.5, 1.0), 3),
+                "started_at": now - timedelta(seconds=rng.uniform(0, days * 86400)),
+                "status": rng.choice(SEED_STATUSES),
+            }
+            for _ in range(min(chunk, rows - offset))
+        ]
+        with backend.engine.begin() as conn:
+            conn.execute(insert(backend.Incident), batch)
+        print(f"  seeded {offset + len(batch):,}/{rows:,} incidents", end="\r", flush=True)
+    print(f"\nSeeded {rows - existing:,} incidents in {time.perf_counter() - started:.0f}s.")
+    return rows
+
+
+def timed(fn, repeat=5):
+    """Median wall time of fn() in milliseconds, after one untimed warm-up call."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
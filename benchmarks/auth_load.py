@@ -0,0 +1,117 @@
+# benchmarks/auth_load.py
+"""
+Load test for authenticated polling: requests/sec with and without the token->user cache.
+
+Concurrent clients poll the routes the UI hits most (/users/me, /cameras, /incidents) with
+one bearer token, first with the cache disabled (every request decodes the JWT and queries
+`users`) and then enabled.
+
+In-process (default) drives the ASGI app directly through httpx, so only the backend is
+measured. Against a running server, start it once with AUTH_CACHE_MAX_ENTRIES=0 and once
+without, and point --url at it:
+
+    python benchmarks/auth_load.py --clients 50 --seconds 10
+    python benchmarks/auth_load.py --url http://localhost:8000 --email a@b.c --password secret
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import configure_backend, seed_incidents  # noqa: E402
+
+PATHS = ("/users/me", "/cameras", "/incidents?limit=20")
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+async def run_load(client, token, clients, seconds):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(PATHS[i % len(PATHS)], headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def report(label, result):
+    print(f"{label:<16} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+
+async def against_server(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        response = await client.post("/token", data={"username": args.email, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        print(f"{'server':<16} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        report(args.url, await run_load(client, token, args.clients, args.seconds))
+
+
+async def in_process(args):
+    configure_backend(args.database_url, args.workdir)
+    import backend.app as backend
+
+    backend.Base.metadata.create_all(bind=backend.engine)
+    seed_incidents(backend, args.incidents)
+    with backend.SessionLocal() as db:
+        if backend.get_user(db, BENCH_EMAIL) is None:
+            db.add(backend.User(email=BENCH_EMAIL, hashed_password=backend.get_password_hash(BENCH_PASSWORD)))
+            db.commit()
+    token = backend.create_access_token({"sub": BENCH_EMAIL})
+    cache = backend.token_user_cache
+    configured_size = cache.maxsize
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+        print(f"{args.clients} clients, {args.seconds:g}s per run, paths {', '.join(PATHS)}\n")
+        print(f"{'token cache':<16} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for label, maxsize in (("disabled", 0), ("enabled", configured_size)):
+            cache.clear()
+            cache.maxsize = maxsize  # 0: every entry is evicted as soon as it is stored
+            cache.hits = cache.misses = 0
+            report(label, await run_load(client, token, args.clients, args.seconds))
+            print(f"{'':<16} cache {cache.stats()}")
+    await backend.async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--incidents", type=int, default=10_000, help="Seeded incidents (in-process only)")
+    parser.add_argument("--database-url")
+    parser.add_argument("--workdir")
+    parser.add_argument("--url", help="Load-test a running server instead of the in-process app")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    asyncio.run(against_server(args) if args.url else in_process(args))
+
+
+if __name__ == "__main__":
+    main()
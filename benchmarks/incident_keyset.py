@@ -0,0 +1,86 @@
+# benchmarks/incident_keyset.py
+"""
+/incidents page latency versus depth on a large table: keyset cursor against LIMIT/OFFSET.
+
+Seeds a million incidents (reused on later runs with the same --workdir), then fetches a
+page at increasing depths through the real list_incidents route function, with and
+without filters. Keyset pages should stay flat while OFFSET grows with the depth.
+
+    python benchmarks/incident_keyset.py --rows 1000000 --workdir /tmp/argus-bench
+    python benchmarks/incident_keyset.py --database-url postgresql://user:pw@localhost/argus_bench
+"""
+import argparse
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import configure_backend, seed_incidents, timed  # noqa: E402
+
+DEPTHS = (0, 1_000, 10_000, 100_000, 500_000, 900_000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url")
+    parser.add_argument("--workdir")
+    args = parser.parse_args()
+
+    configure_backend(args.database_url, args.workdir)
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    import backend.app as backend
+
+    backend.Base.metadata.create_all(bind=backend.engine)
+    rows = seed_incidents(backend, args.rows)
+    viewer = SimpleNamespace(id=1)
+    Incident = backend.Incident
+    newest_first = (Incident.started_at.desc(), Incident.id.desc())
+
+    def filtered(query, filters):
+        for column, value in filters.items():
+            query = query.where(getattr(Incident, column) == value)
+        return query
+
+    def keyset_page(cursor, filters):
+        with backend.SessionLocal() as db:
+            backend.list_incidents(db=db, limit=args.limit, cursor=cursor,
+                                   camera_id=filters.get("camera_id"), event_type=filters.get("event_type"),
+                                   status_filter=None, since=None, until=None, current_user=viewer)
+
+    def offset_page(depth, filters):
+        with backend.SessionLocal() as db:
+            db.execute(filtered(select(Incident), filters).options(selectinload(Incident.clips))
+                       .order_by(*newest_first).offset(depth).limit(args.limit + 1)).scalars().all()
+
+    def cursor_at(depth, filters):
+        """The cursor a client would hold after paging down to `depth` rows (found untimed)."""
+        if depth == 0:
+            return None
+        with backend.SessionLocal() as db:
+            row = db.execute(filtered(select(Incident.started_at, Incident.id), filters)
+                             .order_by(*newest_first).offset(depth - 1).limit(1)).first()
+        return backend.encode_keyset_cursor(row.started_at, row.id) if row else False
+
+    scenarios = [
+        ("all incidents", {}),
+        ("camera_id=3", {"camera_id": 3}),
+        ("event_type=Fighting", {"event_type": "Fighting"}),
+    ]
+    for label, filters in scenarios:
+        print(f"\n{label} ({rows:,} rows, limit {args.limit}, median of {args.repeat})")
+        print(f"{'depth':>10} {'keyset ms':>10} {'OFFSET ms':>10}")
+        for depth in DEPTHS:
+            cursor = cursor_at(depth, filters)
+            if cursor is False:
+                break  # Fewer matching rows than this depth
+            keyset_ms = timed(lambda: keyset_page(cursor, filters), args.repeat)
+            offset_ms = timed(lambda: offset_page(depth, filters), args.repeat)
+            print(f"{depth:>10,} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
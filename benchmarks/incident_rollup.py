@@ -0,0 +1,75 @@
+# benchmarks/incident_rollup.py
+"""
+/stats latency from the hourly rollups against a GROUP BY over the raw incidents table.
+
+Seeds incidents with Core (reused on later runs with the same --workdir), rebuilds
+incident_stats_hourly once (timed), then answers the same questions both ways: the real
+incident_stats route function, and a GROUP BY on `incidents` for the same range. The
+rollup reads at most one row per hour, camera and event type, so it pulls ahead once
+incidents outnumber those buckets; with sparse seeds both sides scan about as many rows.
+
+    python benchmarks/incident_rollup.py --rows 1000000 --workdir /tmp/argus-bench
+    python benchmarks/incident_rollup.py --database-url postgresql://user:pw@localhost/argus_bench
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import configure_backend, seed_incidents, timed  # noqa: E402
+
+RANGES = (("24 hours", timedelta(hours=24)), ("7 days", timedelta(days=7)),
+          ("30 days", timedelta(days=30)), ("365 days", timedelta(days=365)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url")
+    parser.add_argument("--workdir")
+    args = parser.parse_args()
+
+    configure_backend(args.database_url, args.workdir)
+    from sqlalchemy import func, select
+    import backend.app as backend
+
+    backend.Base.metadata.create_all(bind=backend.engine)
+    rows = seed_incidents(backend, args.rows)
+    with backend.SessionLocal() as db:
+        started = time.perf_counter()
+        buckets = backend.incident_rollup.rebuild(db)
+        print(f"Rebuilt {buckets:,} rollup rows from {rows:,} incidents in {time.perf_counter() - started:.1f}s.")
+
+    viewer = SimpleNamespace(id=1)
+    Incident = backend.Incident
+    until = datetime.now(timezone.utc)
+
+    def rollup_stats(since, group_by):
+        with backend.SessionLocal() as db:
+            backend.incident_stats(db=db, since=since, until=until, group_by=group_by,
+                                   camera_id=None, event_type=None, current_user=viewer)
+
+    def raw_stats(since, group_by):
+        dimension = Incident.camera_id if group_by == "camera" else Incident.event_type
+        with backend.SessionLocal() as db:
+            db.execute(select(dimension, func.count(), func.avg(Incident.score))
+                       .where(Incident.started_at >= since, Incident.started_at < until,
+                              Incident.event_type != backend.PENDING_EVENT_TYPE)
+                       .group_by(dimension).order_by(dimension)).all()
+
+    for group_by in ("camera", "event_type"):
+        print(f"\ngroup_by={group_by} ({rows:,} incidents, median of {args.repeat})")
+        print(f"{'range':>10} {'rollup ms':>10} {'raw ms':>10}")
+        for label, span in RANGES:
+            since = until - span
+            rollup_ms = timed(lambda: rollup_stats(since, group_by), args.repeat)
+            raw_ms = timed(lambda: raw_stats(since, group_by), args.repeat)
+            print(f"{label:>10} {rollup_ms:>10.2f} {raw_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
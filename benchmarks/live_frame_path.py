@@ -0,0 +1,127 @@
+# benchmarks/live_frame_path.py
+"""
+Per-frame cost of the live (/ws/live) frame path: JPEG decode -> resize -> history -> clip.
+
+Compares the old list/deque history (a fresh resized array per frame, np.stack per clip)
+with ClipRingBuffer (resize into a preallocated slot, zero-copy clip view). Reports
+latency percentiles and tracemalloc allocations per frame; the model itself is not run,
+so the numbers isolate the buffering work that happens on every frame.
+
+    python benchmarks/live_frame_path.py --frames 2000 --width 1280 --height 720
+"""
+import argparse
+import collections
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils import ClipRingBuffer  # noqa: E402
+
+FRAMES_PER_CLIP = 16
+PRE_ROLL_CAPACITY = 240  # 8 s at 30 fps, as in backend/app.py
+
+
+def make_jpegs(count, width, height):
+    """A handful of distinct noisy frames, cycled so decode cost is realistic."""
+    rng = np.random.default_rng(0)
+    jpegs = []
+    for _ in range(count):
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (9, 9), 0)
+        jpegs.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+    return jpegs
+
+
+class ListPath:
+    """The pre-ring-buffer path: deque of resized copies, stacked every 16 frames."""
+    name = "list + np.stack"
+
+    def __init__(self):
+        self.history = collections.deque(maxlen=PRE_ROLL_CAPACITY)
+        self.since = 0
+
+    def step(self, jpeg):
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        self.history.append(cv2.resize(frame, (224, 224)))
+        self.since += 1
+        if self.since == FRAMES_PER_CLIP:
+            self.since = 0
+            return np.stack(list(self.history)[-FRAMES_PER_CLIP:])
+        return None
+
+
+class RingPath:
+    """The current path: resize into ClipRingBuffer, contiguous view every 16 frames."""
+    name = "ClipRingBuffer"
+
+    def __init__(self):
+        self.history = ClipRingBuffer(PRE_ROLL_CAPACITY, 224, 224, max_view=FRAMES_PER_CLIP)
+        self.since = 0
+
+    def step(self, jpeg):
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        self.history.append(frame)
+        self.since += 1
+        if self.since == FRAMES_PER_CLIP:
+            self.since = 0
+            return self.history.latest(FRAMES_PER_CLIP)
+        return None
+
+
+def run(path, jpegs, frames, warmup):
+    for i in range(warmup):
+        path.step(jpegs[i % len(jpegs)])
+
+    latencies = []
+    for i in range(frames):
+        started = time.perf_counter()
+        path.step(jpegs[i % len(jpegs)])
+        latencies.append(time.perf_counter() - started)
+
+    # Separate pass: tracing slows every allocation down and would skew the timings
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for i in range(frames):
+        path.step(jpegs[i % len(jpegs)])
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    allocated_blocks = sum(max(s.count_diff, 0) for s in stats)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "retained_blocks": allocated_blocks,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=PRE_ROLL_CAPACITY + FRAMES_PER_CLIP)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    jpegs = make_jpegs(8, args.width, args.height)
+    print(f"{args.frames} frames of {args.width}x{args.height} JPEG, clip every {FRAMES_PER_CLIP} frames\n")
+    print(f"{'path':<18} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'peak KiB':>10} {'blocks':>8}")
+    for path_cls in (ListPath, RingPath):
+        r = run(path_cls(), jpegs, args.frames, args.warmup)
+        print(f"{path_cls.name:<18} {r['p50_ms']:8.3f} {r['p99_ms']:8.3f} {r['mean_ms']:8.3f} "
+              f"{r['peak_kib']:10.1f} {r['retained_blocks']:8d}")
+
+
+if __name__ == "__main__":
+    main()
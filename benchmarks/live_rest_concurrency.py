@@ -0,0 +1,196 @@
+# benchmarks/live_rest_concurrency.py
+"""
+REST latency while /ws/live is busy: checks that live traffic and DB-backed routes do not
+stall each other on the event loop.
+
+Runs two phases against one server: REST polling alone, then the same polling while
+mobile publishers stream binary frames to /ws/live and desktop viewers receive them.
+Reports REST req/s and p50/p99 latency for both phases, plus frames relayed and the
+publisher-to-viewer relay latency (taken from the capture timestamp in each frame header).
+
+By default a server is started with uvicorn on a seeded throwaway database. Use --url to
+measure an already running deployment instead:
+
+    python benchmarks/live_rest_concurrency.py --publishers 4 --viewers 2 --fps 15
+    python benchmarks/live_rest_concurrency.py --url http://localhost:8000 --email a@b.c --password secret
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, configure_backend, seed_incidents  # noqa: E402
+from auth_load import BENCH_EMAIL, BENCH_PASSWORD, PATHS, run_load  # noqa: E402
+
+# Same layout as backend.app.LIVE_FRAME_HEADER: uint32 sequence, float64 capture time in ms
+LIVE_FRAME_HEADER = struct.Struct("<Id")
+
+
+class LiveStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.latencies_ms = []
+
+
+def make_jpeg(width=640, height=480):
+    import cv2
+
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", cv2.GaussianBlur(frame, (9, 9), 0))[1].tobytes()
+
+
+async def publisher(ws_url, token, session_id, fps, seconds, jpeg, stats):
+    async with websockets.connect(f"{ws_url}/ws/live/{session_id}/mobile?token={token}", max_size=None) as ws:
+        async def drain():
+            async for _ in ws:  # Capture-control messages from the server
+                pass
+        drain_task = asyncio.create_task(drain())
+        interval = 1.0 / fps
+        next_at = time.perf_counter()
+        deadline = next_at + seconds
+        sequence = 0
+        while time.perf_counter() < deadline:
+            await ws.send(LIVE_FRAME_HEADER.pack(sequence, time.time() * 1000) + jpeg)
+            stats.sent += 1
+            sequence += 1
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        drain_task.cancel()
+
+
+async def viewer(ws_url, token, session_id, seconds, stats):
+    async with websockets.connect(f"{ws_url}/ws/live/{session_id}/desktop?token={token}", max_size=None) as ws:
+        deadline = time.perf_counter() + seconds
+        while (remaining := deadline - time.perf_counter()) > 0:
+            try:
+                message = await asyncio.wait_for(ws.recv(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if isinstance(message, bytes) and len(message) > LIVE_FRAME_HEADER.size:
+                _, capture_ts = LIVE_FRAME_HEADER.unpack_from(message)
+                stats.latencies_ms.append(time.time() * 1000 - capture_ts)
+                stats.received += 1
+
+
+async def live_traffic(ws_url, token, args, jpeg, stats):
+    sessions = [f"bench-{n}" for n in range(args.publishers)]
+    viewers = [asyncio.create_task(viewer(ws_url, token, session_id, args.seconds + 1.0, stats))
+               for session_id in sessions for _ in range(args.viewers)]
+    await asyncio.sleep(0.5)  # Viewers subscribe before the first frame
+    await asyncio.gather(*(publisher(ws_url, token, session_id, args.fps, args.seconds, jpeg, stats)
+                           for session_id in sessions))
+    await asyncio.gather(*viewers)
+
+
+def report_rest(label, result):
+    print(f"{label:<22} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+
+async def benchmark(base_url, email, password, args):
+    ws_url = "ws" + base_url[len("http"):]
+    jpeg = make_jpeg()
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        response = await client.post("/token", data={"username": email, "password": password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        print(f"REST: {args.clients} clients on {', '.join(PATHS)}; live: {args.publishers} publisher(s) x "
+              f"{args.viewers} viewer(s) at {args.fps:g} fps, {len(jpeg) // 1024} KiB frames; {args.seconds:g}s per phase\n")
+        print(f"{'phase':<22} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        await run_load(client, token, args.clients, 2.0)  # Warm-up: connection pools, token cache
+        report_rest("REST only", await run_load(client, token, args.clients, args.seconds))
+
+        stats = LiveStats()
+        rest, _ = await asyncio.gather(run_load(client, token, args.clients, args.seconds),
+                                       live_traffic(ws_url, token, args, jpeg, stats))
+        report_rest("REST + /ws/live", rest)
+
+    expected = stats.sent * args.viewers
+    print(f"\nlive: {stats.sent} frames published, {stats.received}/{expected} delivered to viewers "
+          f"(viewers may be rate-limited or drop stale frames)")
+    if stats.latencies_ms:
+        stats.latencies_ms.sort()
+        print(f"relay latency p50 {statistics.median(stats.latencies_ms):.1f} ms, "
+              f"p99 {stats.latencies_ms[int(len(stats.latencies_ms) * 0.99) - 1]:.1f} ms")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    """Seeds a throwaway database and serves backend.app from it with uvicorn; returns (process, url)."""
+    workdir = configure_backend(args.database_url, args.workdir)
+    import backend.app as backend
+
+    backend.Base.metadata.create_all(bind=backend.engine)
+    seed_incidents(backend, args.incidents)
+    with backend.SessionLocal() as db:
+        if backend.get_user(db, BENCH_EMAIL) is None:
+            db.add(backend.User(email=BENCH_EMAIL, hashed_password=backend.get_password_hash(BENCH_PASSWORD)))
+            db.commit()
+    backend.engine.dispose()
+
+    port = free_port()
+    log_path = os.path.join(workdir, "server.log")
+    print(f"Starting uvicorn on port {port} (log: {log_path})")
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port),
+                                    "--log-level", "warning"], cwd=ROOT, env=os.environ.copy(),
+                                   stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError("server did not become healthy within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent REST pollers")
+    parser.add_argument("--publishers", type=int, default=4, help="Live sessions, one mobile publisher each")
+    parser.add_argument("--viewers", type=int, default=2, help="Desktop viewers per session")
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--incidents", type=int, default=10_000, help="Seeded incidents (local server only)")
+    parser.add_argument("--database-url")
+    parser.add_argument("--workdir")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--email", default=BENCH_EMAIL)
+    parser.add_argument("--password", default=BENCH_PASSWORD)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(benchmark(args.url.rstrip("/"), args.email, args.password, args))
+        return
+    process, url = start_server(args)
+    try:
+        asyncio.run(benchmark(url, BENCH_EMAIL, BENCH_PASSWORD, args))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
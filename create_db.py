@@ -9,7 +9,8 @@ def create_database_and_tables():
     """
     Connects to the PostgreSQL server, creates the database if it doesn't exist,
     and then creates the necessary tables ('users', 'cameras', 'incidents',
-    'clips', 'alerts') for the Argus Core backend.
+    'clips', 'incident_events', 'incident_stats_hourly', 'uploads', 'jobs', 'alerts')
+    for the Argus Core backend.
     """
     # --- Database Configuration from .env ---
     DB_NAME = os.getenv("DB_NAME", "argus_core_db")
@@ -101,18 +102,121 @@ def create_database_and_tables():
         ''')
         print(" -> 'incidents' table checked/created.")
 
+        # Composite indexes for keyset pagination of /incidents on (started_at, id)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incidents_started_at_id ON incidents (started_at, id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incidents_camera_started_at_id ON incidents (camera_id, started_at, id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incidents_event_type_started_at_id ON incidents (event_type, started_at, id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incidents_status_started_at_id ON incidents (status, started_at, id);")
+        print(" -> 'incidents' indexes checked/created.")
+
         # Clips Table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS clips (
                 id SERIAL PRIMARY KEY,
                 incident_id INTEGER NOT NULL REFERENCES incidents(id) ON DELETE CASCADE, -- Delete clips if incident is deleted
-                file_path TEXT NOT NULL UNIQUE, -- File path should be unique
+                file_path TEXT NOT NULL, -- Shared when clips have identical content (content-addressed storage)
                 uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                duration_seconds REAL
+                duration_seconds REAL,
+                width INTEGER, -- Probed by clip post-processing
+                height INTEGER,
+                fps REAL,
+                processed_at TIMESTAMP WITH TIME ZONE, -- Set once poster/sprite/HLS assets exist
+                content_hash VARCHAR(64), -- SHA-256 of the uploaded file
+                model_version VARCHAR(64) -- Model that produced the linked analysis
             );
         ''')
+        # Columns added after the first release; no-ops on fresh databases
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS width INTEGER;")
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS height INTEGER;")
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS fps REAL;")
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS processed_at TIMESTAMP WITH TIME ZONE;")
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);")
+        cursor.execute("ALTER TABLE clips ADD COLUMN IF NOT EXISTS model_version VARCHAR(64);")
+        cursor.execute("ALTER TABLE clips DROP CONSTRAINT IF EXISTS clips_file_path_key;")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_clips_content_hash ON clips (content_hash);")
         print(" -> 'clips' table checked/created.")
 
+        # Incident Events Table (one row per detection; replaces parsing incidents.note)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS incident_events (
+                id BIGSERIAL PRIMARY KEY,
+                incident_id INTEGER NOT NULL REFERENCES incidents(id) ON DELETE CASCADE,
+                camera_id INTEGER NOT NULL, -- Copied from the incident so camera filters need no join
+                class_idx SMALLINT NOT NULL, -- Index into ANOMALY_CLASSES (src/anomaly_config.py)
+                confidence REAL NOT NULL,
+                frame_offset INTEGER, -- Frame number inside the source video, when known
+                detected_at TIMESTAMP WITH TIME ZONE NOT NULL
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incident_events_incident_id ON incident_events (incident_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incident_events_class_detected_id ON incident_events (class_idx, detected_at, id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incident_events_camera_class_detected_id ON incident_events (camera_id, class_idx, detected_at, id);")
+        print(" -> 'incident_events' table checked/created.")
+
+        # Hourly incident rollups (kept current by the backend; backfill with
+        # `python -m backend.incident_stats rebuild`)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS incident_stats_hourly (
+                bucket_start TIMESTAMP WITH TIME ZONE NOT NULL, -- Start of the UTC hour
+                camera_id INTEGER NOT NULL,
+                event_type VARCHAR(255) NOT NULL,
+                incident_count INTEGER NOT NULL DEFAULT 0,
+                score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket_start, camera_id, event_type)
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incident_stats_hourly_camera_bucket ON incident_stats_hourly (camera_id, bucket_start);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_incident_stats_hourly_event_type_bucket ON incident_stats_hourly (event_type, bucket_start);")
+        print(" -> 'incident_stats_hourly' table checked/created.")
+
+        # Uploads Table (resumable chunked clip uploads)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                id VARCHAR(32) PRIMARY KEY,
+                incident_id INTEGER NOT NULL REFERENCES incidents(id) ON DELETE CASCADE,
+                filename VARCHAR(255) NOT NULL,
+                file_path TEXT NOT NULL,
+                total_size BIGINT NOT NULL,
+                received_bytes BIGINT NOT NULL DEFAULT 0, -- Committed offset clients resume from
+                sha256 VARCHAR(64), -- Optional whole-file checksum verified on completion
+                status VARCHAR(20) NOT NULL DEFAULT 'uploading',
+                clip_id INTEGER REFERENCES clips(id) ON DELETE SET NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        ''')
+        print(" -> 'uploads' table checked/created.")
+
+        # Jobs Table (queued detection / upload analysis, run by backend/jobs.py workers)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id SERIAL PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, failed, cancelled
+                progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                incident_id INTEGER REFERENCES incidents(id) ON DELETE SET NULL,
+                worker_id VARCHAR(100),
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Retry backoff
+                started_at TIMESTAMP WITH TIME ZONE,
+                heartbeat_at TIMESTAMP WITH TIME ZONE, -- Stale heartbeats are requeued
+                finished_at TIMESTAMP WITH TIME ZONE
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_id ON jobs (status, id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_jobs_updated_at ON jobs (updated_at);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_jobs_user_id ON jobs (user_id);")
+        print(" -> 'jobs' table checked/created.")
+
         # Alerts Table (Optional: for logging alert attempts)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
@@ -2,7 +2,7 @@
 import torch
 import torchvision.transforms as T
 from torchvision.models.video import r3d_18
-from PIL import Image
+import numpy as np
 import cv2
 import os
 import sys
@@ -32,33 +32,48 @@ except Exception as e:
 model = model.eval().to(device)
 
 # Define the transformation pipeline for input frames.
+# Frames arrive as a uint8 [T, H, W, 3] BGR batch and are transformed on-device in one pass,
+# matching the PIL Resize -> ToTensor -> Normalize pipeline used during training.
 transform = T.Compose([
-    T.Resize((112, 112)),
-    T.ToTensor(),
+    T.Resize((112, 112), antialias=True),
     T.Normalize(mean=[0.43216, 0.394666, 0.37645], std=[0.22803, 0.22145, 0.216989])
 ])
 
 def preprocess_frames(frames):
     """
-    Preprocesses a list of video frames into a single PyTorch tensor suitable for the model.
+    Preprocesses a clip of video frames into a single PyTorch tensor suitable for the model.
     Args:
-        frames (list of numpy.ndarray): A list of OpenCV frames (BGR format).
+        frames (numpy.ndarray or list of numpy.ndarray): A contiguous uint8 [T, H, W, 3] array
+            (e.g. a ClipRingBuffer.latest() view, wrapped without copying) or a list of OpenCV frames (BGR format).
     Returns:
         torch.Tensor: A preprocessed tensor of shape [1, C, T, H, W] on the specified device.
     """
-    frames_rgb_pil = [Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in frames]
-    transformed_frames = [transform(f) for f in frames_rgb_pil]
-    clip = torch.stack(transformed_frames).permute(1, 0, 2, 3).unsqueeze(0).to(device)
-    return clip
+    if not isinstance(frames, np.ndarray):
+        frames = np.stack(frames)
+    clip = torch.from_numpy(frames).to(device, non_blocking=True)
+    # BGR -> RGB, [T, H, W, C] -> [T, C, H, W], uint8 -> float in [0, 1]
+    clip = clip.flip(-1).permute(0, 3, 1, 2).float().div_(255.0)
+    clip = transform(clip)
+    return clip.permute(1, 0, 2, 3).unsqueeze(0)
 
 def predict_anomaly(frames):
     """
     Predicts the most likely anomaly class and its probability given a sequence of video frames.
     Args:
-        frames (list of numpy.ndarray): A list of OpenCV frames (BGR format) representing a video clip.
+        frames (numpy.ndarray or list of numpy.ndarray): OpenCV frames (BGR format) representing a video clip.
     Returns:
         tuple: (predicted_class_name: str, probability: float) or (None, None) if inference fails.
     """
+    predicted_class_name, probability, _ = predict_anomaly_probs(frames)
+    return predicted_class_name, probability
+
+def predict_anomaly_probs(frames):
+    """
+    Like predict_anomaly, but also returns the full softmax vector.
+    Returns:
+        tuple: (predicted_class_name, probability, probs: numpy.ndarray of shape (NUM_CLASSES,))
+        or (None, None, None) if inference fails.
+    """
     try:
         with torch.no_grad():
             clip = preprocess_frames(frames)
@@ -67,7 +82,28 @@ def predict_anomaly(frames):
             max_prob, predicted_idx = torch.max(probs, dim=1)
             predicted_class_name = IDX_TO_CLASS[predicted_idx.item()]
             probability = max_prob.item()
-            return predicted_class_name, probability
+            return predicted_class_name, probability, probs[0].cpu().numpy()
     except Exception as e:
         print(f"[ERROR] Exception in predict_anomaly: {e}")
-        return None, None
+        return None, None, None
+
+def predict_anomaly_batch(clips):
+    """
+    Runs one forward pass over several clips, e.g. one clip from each of several cameras.
+    Args:
+        clips (list): Clips as accepted by predict_anomaly (all of the same frame count and size).
+    Returns:
+        list of tuple: (predicted_class_name, probability) per clip, in input order,
+        or (None, None) for every clip if inference fails.
+    """
+    if not clips:
+        return []
+    try:
+        with torch.no_grad():
+            batch = torch.cat([preprocess_frames(frames) for frames in clips], dim=0)
+            probs = torch.softmax(model(batch), dim=1)
+            max_probs, predicted_idx = torch.max(probs, dim=1)
+            return [(IDX_TO_CLASS[idx], prob) for idx, prob in zip(predicted_idx.tolist(), max_probs.tolist())]
+    except Exception as e:
+        print(f"[ERROR] Exception in predict_anomaly_batch: {e}")
+        return [(None, None)] * len(clips)
@@ -1,4 +1,5 @@
 # src/edge_client.py
+import argparse
 import cv2
 import os
 from dotenv import load_dotenv
@@ -7,18 +8,21 @@ import random
 import sys
 import collections
 import re
-import requests
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-import numpy as np
 
 current_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in locals() else os.getcwd()
 sys.path.append(os.path.abspath(os.path.join(current_dir, '..')))
 
-from anomaly_detection import predict_anomaly
+from anomaly_detection import predict_anomaly, predict_anomaly_batch
 from anomaly_config import ANOMALY_CLASSES, ALERT_ANOMALY_CLASSES, CLASS_TO_IDX
 from pose_analysis import detect_poses
-from utils import AnomalyConfidenceQueue
+from utils import AnomalyConfidenceQueue, ClipRingBuffer
+from edge_outbox import EdgeOutbox
+from edge_evidence import EventWindowRecorder, encode_clip, EVIDENCE_BITRATE, EVIDENCE_MAX_WIDTH, EVIDENCE_PREVIEW, EVIDENCE_PREVIEW_WIDTH, EVIDENCE_PREVIEW_BITRATE
 from backend.alert_service import send_alert
 
 UCF_CRIME_TEST_DIR = "datasets/ucf_crime/test"
@@ -59,6 +63,8 @@ API_KEY = os.getenv("ARGUS_API_KEY")
 HEADERS = {"x-api-key": API_KEY}
 VIDEO_TEMP_DIR = "temp_clips"
 os.makedirs(VIDEO_TEMP_DIR, exist_ok=True)
+OUTBOX_PATH = os.getenv("EDGE_OUTBOX_PATH", os.path.join(VIDEO_TEMP_DIR, "outbox.sqlite3"))
+OUTBOX = EdgeOutbox(OUTBOX_PATH, BACKEND_API_URL, headers=HEADERS)
 
 # --- Anomaly Detection Configuration (remains the same) ---
 ALERT_CONFIDENCE_THRESHOLD = 0.5
@@ -71,55 +77,115 @@ CAMERA_SOURCES = [
 ]
 
 # --- Helper Functions (remain the same) ---
-def save_clip(frames, base_filename, fps):
-    # This function remains unchanged...
+def save_clip(frames, base_filename, fps, bitrate=EVIDENCE_BITRATE, max_width=EVIDENCE_MAX_WIDTH):
+    """Encodes frames as H.264 (see edge_evidence.encode_clip) into VIDEO_TEMP_DIR."""
     if not frames: return None
     sanitized_filename = re.sub(r'[^a-zA-Z0-9_-]', '_', base_filename)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{sanitized_filename}_{timestamp}.mp4"
     filepath = os.path.join(VIDEO_TEMP_DIR, filename)
-    try:
-        height, width, _ = frames[0].shape
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(filepath, fourcc, fps, (width, height))
-        for frame in frames:
-            out.write(frame)
-        out.release()
-        return filepath
-    except Exception as e:
-        print(f"[ERROR] Failed to save clip {filepath}: {e}")
-        return None
+    return encode_clip(frames, filepath, fps, bitrate=bitrate, max_width=max_width)
 
 def send_alert_to_backend(camera_id: int, anomaly_type: str, score: float, started_at: datetime, ended_at: datetime):
-    # This function remains unchanged...
-    try:
-        payload = { "camera_id": camera_id, "event_type": anomaly_type, "score": score, "started_at": started_at.isoformat(), "ended_at": ended_at.isoformat() if ended_at else started_at.isoformat() }
-        response = requests.post(f"{BACKEND_API_URL}/events", json=payload, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        print(f"✅ Consolidated incident created. Response: {response.json()}")
-        return response.json()['id']
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Failed to send consolidated incident to backend API: {e}")
-        return None
+    """Queues the incident in the outbox and returns its outbox id; delivery happens in the background."""
+    payload = { "camera_id": camera_id, "event_type": anomaly_type, "score": score, "started_at": started_at.isoformat(), "ended_at": ended_at.isoformat() if ended_at else started_at.isoformat() }
+    return OUTBOX.enqueue_event(payload)
 
-def upload_clip_to_backend(incident_id: int, file_path: str):
-    # This function remains unchanged...
+def upload_clip_to_backend(event_outbox_id: int, file_path: str, priority: int = 0):
+    """Queues a clip upload; it is sent once the backend has created the incident. The file is removed after upload."""
     if not file_path or not os.path.exists(file_path):
         print(f"[ERROR] Clip file not found for upload: {file_path}")
-        return
-    try:
-        with open(file_path, "rb") as f:
-            files = {'file': (os.path.basename(file_path), f, 'video/mp4')}
-            data = {'incident_id': incident_id}
-            response = requests.post(f"{BACKEND_API_URL}/clips/upload", data=data, files=files, headers=HEADERS, timeout=60)
-            response.raise_for_status()
-        print(f"✅ Full video uploaded successfully for incident {incident_id}. Response: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Failed to upload clip for incident {incident_id}: {e}")
-    finally:
-        pass
+        return None
+    return OUTBOX.enqueue_clip(event_outbox_id, file_path, delete_after_send=True, priority=priority)
+
+def load_camera_sources(config_path):
+    """
+    Loads cameras from a JSON file: a list of {"id": 1, "source": "...", "location": "..."}.
+    A source may be a video file, an RTSP/HTTP URL or a device index such as "0".
+    """
+    with open(config_path, "r") as f:
+        cameras = json.load(f)
+    if isinstance(cameras, dict):
+        cameras = cameras.get("cameras", [])
+    for cam in cameras:
+        source = cam.get("source")
+        if isinstance(source, str) and source.isdigit():
+            cam["source"] = int(source)
+        cam.setdefault("location", f"Camera {cam['id']}")
+    return cameras
+
+def update_alert_state(anomaly_conf_queues, alert_triggered_status, detected_anomalies, predicted_class_name, prob_anomaly, label=""):
+    """Feeds one clip prediction into a camera's confidence queues; returns the newly triggered alerts."""
+    triggered = []
+    if predicted_class_name in anomaly_conf_queues:
+        anomaly_conf_queues[predicted_class_name].update(prob_anomaly)
+    else:
+        for q in anomaly_conf_queues.values():
+            q.clear()
+
+    for anomaly_type in ALERT_ANOMALY_CLASSES:
+        current_queue = anomaly_conf_queues[anomaly_type]
+
+        if current_queue.should_alert(threshold=ALERT_CONFIDENCE_THRESHOLD, min_hits=MIN_HITS_FOR_ALERT):
+            if not alert_triggered_status[anomaly_type]:
+                print(f"\n[ALERT DETECTED IN STREAM]{label} {anomaly_type} Confidence: {prob_anomaly:.2f}")
+                alert_triggered_status[anomaly_type] = True
+                triggered.append({
+                    "anomaly_type": anomaly_type,
+                    "score": prob_anomaly,
+                    "timestamp": datetime.now(timezone.utc)
+                })
+        else:
+            if alert_triggered_status[anomaly_type]:
+                print(f"[ALERT CLEARED IN STREAM]{label} {anomaly_type} confidence dropped. Current prob: {prob_anomaly:.2f}")
+                alert_triggered_status[anomaly_type] = False
+    detected_anomalies.extend(triggered)
+    return triggered
+
+def draw_status(frame, predicted_class_name, prob_anomaly, alert_triggered_status):
+    status_text = f"Detected: {predicted_class_name} (P: {prob_anomaly:.2f})"
+    for anomaly_type, triggered in alert_triggered_status.items():
+        if triggered:
+            status_text += f" | ACTIVE: {anomaly_type}"
+    cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2, cv2.LINE_AA)
+
+def report_event_window(camera_id, camera_location, window, fps):
+    """Sends one incident for an anomaly window with its evidence segment (and a low-res preview first)."""
+    summary_types = window.anomaly_types
+    print(f"--- Camera {camera_id}: sending incident for {summary_types} ({len(window.frames) / fps:.1f}s window) ---")
+
+    # Queued locally; the outbox delivers it even if the backend is down right now
+    event_outbox_id = send_alert_to_backend(
+        camera_id=camera_id, anomaly_type=summary_types, score=window.max_score,
+        started_at=window.started_at, ended_at=window.ended_at
+    )
 
-def process_video_file(cam_info):
+    base_filename = f"evidence_{camera_id}_{event_outbox_id}"
+    preview_path = None
+    if EVIDENCE_PREVIEW:
+        preview_path = save_clip(window.frames, base_filename=f"{base_filename}_preview", fps=fps,
+                                 bitrate=EVIDENCE_PREVIEW_BITRATE, max_width=EVIDENCE_PREVIEW_WIDTH)
+    clip_path = save_clip(window.frames, base_filename=base_filename, fps=fps)
+    if not clip_path:
+        print("[ERROR] Failed to save the evidence clip.")
+
+    email_path = preview_path or clip_path
+    if email_path:
+        print("Proceeding to send email alert...")
+        send_alert(
+            video_file_path=email_path,
+            location=camera_location,
+            anomaly_type=summary_types
+        )
+
+    # The outbox owns the files from here and deletes them once uploaded; previews jump the queue
+    if preview_path:
+        upload_clip_to_backend(event_outbox_id, preview_path, priority=1)
+    if clip_path:
+        print(f"Evidence saved to {clip_path} ({os.path.getsize(clip_path) / 1024:.0f} KB). Queued for upload.")
+        upload_clip_to_backend(event_outbox_id, clip_path)
+
+def process_video_file(cam_info, headless=False):
     camera_id = cam_info["id"]
     video_source = cam_info["source"]
     camera_location = cam_info["location"]
@@ -131,8 +197,8 @@ def process_video_file(cam_info):
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
     
-    full_video_frames_buffer = [] 
-    frames_buffer_for_ml = []
+    recorder = EventWindowRecorder(fps)
+    clip_buffer = ClipRingBuffer(FRAMES_PER_CLIP, 224, 224)
     
     detected_anomalies = []
     anomaly_conf_queues = {
@@ -150,46 +216,27 @@ def process_video_file(cam_info):
             print("End of video stream.")
             break
         
-        full_video_frames_buffer.append(frame.copy())
+        window = recorder.push(frame.copy())
+        if window:
+            report_event_window(camera_id, camera_location, window, fps)
         
-        processed_frame = cv2.resize(frame, (224, 224))
-        frames_buffer_for_ml.append(processed_frame)
+        clip_buffer.append(frame)  # Resized into the preallocated slot
 
-        if len(frames_buffer_for_ml) == FRAMES_PER_CLIP:
-            predicted_class_name, prob_anomaly = predict_anomaly(frames_buffer_for_ml)
+        if len(clip_buffer) == FRAMES_PER_CLIP:
+            predicted_class_name, prob_anomaly = predict_anomaly(clip_buffer.latest())
             
             if prob_anomaly is not None:
-                if predicted_class_name in anomaly_conf_queues:
-                    anomaly_conf_queues[predicted_class_name].update(prob_anomaly)
-                else:
-                    for q in anomaly_conf_queues.values():
-                        q.clear()
-
-                for anomaly_type in ALERT_ANOMALY_CLASSES:
-                    current_queue = anomaly_conf_queues[anomaly_type]
-                    
-                    if current_queue.should_alert(threshold=ALERT_CONFIDENCE_THRESHOLD, min_hits=MIN_HITS_FOR_ALERT):
-                        if not alert_triggered_status[anomaly_type]:
-                            print(f"\n[ALERT DETECTED IN STREAM] {anomaly_type} Confidence: {prob_anomaly:.2f}")
-                            alert_triggered_status[anomaly_type] = True
-                            detected_anomalies.append({
-                                "anomaly_type": anomaly_type,
-                                "score": prob_anomaly, 
-                                "timestamp": datetime.now(timezone.utc)
-                            })
-                    else:
-                        if alert_triggered_status[anomaly_type]:
-                            print(f"[ALERT CLEARED IN STREAM] {anomaly_type} confidence dropped. Current prob: {prob_anomaly:.2f}")
-                            alert_triggered_status[anomaly_type] = False
+                for anomaly in update_alert_state(anomaly_conf_queues, alert_triggered_status, detected_anomalies,
+                                                  predicted_class_name, prob_anomaly):
+                    recorder.trigger(anomaly)
 
                 # --- NEW: Add status text to the frame for display ---
-                status_text = f"Detected: {predicted_class_name} (P: {prob_anomaly:.2f})"
-                for anomaly_type, triggered in alert_triggered_status.items():
-                    if triggered:
-                        status_text += f" | ACTIVE: {anomaly_type}"
-                cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2, cv2.LINE_AA)
+                draw_status(frame, predicted_class_name, prob_anomaly, alert_triggered_status)
+
+            clip_buffer.clear()
 
-            frames_buffer_for_ml.clear()
+        if headless:
+            continue
 
         # --- NEW: Display the video frame in a window ---
         cv2.imshow('Argus Core - Edge Client', frame)
@@ -201,53 +248,288 @@ def process_video_file(cam_info):
 
     print(f"\nVideo processing finished for Camera {camera_id}.")
 
-    # --- Post-processing (remains the same) ---
+    # --- Post-processing: flush a window still recording at end of stream ---
+    window = recorder.finish()
+    if window:
+        report_event_window(camera_id, camera_location, window, fps)
     if not detected_anomalies:
         print("--- No alert-worthy anomalies detected in this video stream. ---")
-    else:
-        print("--- Consolidating detected anomalies and sending a single alert... ---")
-        summary_types = ", ".join(sorted(set([a["anomaly_type"] for a in detected_anomalies])))
-        max_score = max([a["score"] for a in detected_anomalies])
-        start_time = min([a["timestamp"] for a in detected_anomalies])
-        end_time = max([a["timestamp"] for a in detected_anomalies])
-        
-        incident_id = send_alert_to_backend(
-            camera_id=camera_id, anomaly_type=summary_types, score=max_score,
-            started_at=start_time, ended_at=end_time
-        )
-        
-        if incident_id:
-            print("Saving full video as evidence...")
-            full_clip_path = save_clip(
-                full_video_frames_buffer,
-                base_filename=f"consolidated_evidence_{camera_id}_{incident_id}",
-                fps=fps
-            )
-            if full_clip_path:
-                print(f"Full video saved to {full_clip_path}. Uploading now...")
-                upload_clip_to_backend(incident_id, full_clip_path)
-                
-                print("Proceeding to send email alert...")
-                send_alert(
-                    video_file_path=full_clip_path,
-                    location=camera_location,
-                    anomaly_type=summary_types
-                )
-
-                if os.path.exists(full_clip_path):
-                    os.remove(full_clip_path)
-            else:
-                print("[ERROR] Failed to save the full evidence clip.")
 
     # --- Cleanup ---
     cap.release()
     # --- NEW: Destroy the OpenCV window ---
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
     print(f"--- Processing for camera {camera_id} stopped. ---")
 
+# --- Concurrent multi-camera mode ---
+# Every camera decodes in its own thread; clips from all cameras go to one inference
+# worker that batches them into a single forward pass and routes each result back.
+# Files block on a full queue so results match the sequential mode; live sources never
+# block decoding and drop their oldest pending clip instead. Evidence encoding and alert
+# e-mails run on a separate pool so they never stall a camera's decode loop.
+INFERENCE_BATCH_SIZE = 4
+INFERENCE_BATCH_WAIT_SECONDS = 0.02
+MAX_PENDING_CLIPS_PER_CAMERA = 2
+EVIDENCE_WORKERS = 2
+STATS_INTERVAL_SECONDS = 5.0
+
+class BatchedInferenceWorker(threading.Thread):
+    """Collects clips from all cameras and runs them through the model in batches."""
+
+    def __init__(self, batch_size=INFERENCE_BATCH_SIZE, max_wait=INFERENCE_BATCH_WAIT_SECONDS):
+        super().__init__(name="edge-inference", daemon=True)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.clips = queue.Queue()
+        self.stop_event = threading.Event()
+
+    def submit(self, camera, clip):
+        self.clips.put((camera, clip, time.monotonic()))
+
+    def notify(self, camera):
+        """A live camera queued a clip in its own drop-oldest slot; it is taken when a batch forms."""
+        self.clips.put((camera, None, None))
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                batch = [self.clips.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.clips.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            ready = []
+            for camera, clip, submitted_at in batch:
+                if clip is None:
+                    taken = camera.take_live_clip()
+                    if taken is None:
+                        continue  # The clip this notification was for has been dropped
+                    clip, submitted_at = taken
+                ready.append((camera, clip, submitted_at))
+            if not ready:
+                continue
+
+            results = predict_anomaly_batch([clip for _, clip, _ in ready])
+            done_at = time.monotonic()
+            for (camera, _, submitted_at), (predicted_class_name, prob_anomaly) in zip(ready, results):
+                camera.on_prediction(predicted_class_name, prob_anomaly, done_at - submitted_at)
+
+class CameraWorker(threading.Thread):
+    """Decodes one camera and owns its alert state; predictions arrive from the inference worker."""
+
+    def __init__(self, cam_info, inference_worker, stop_event, evidence_executor):
+        super().__init__(name=f"edge-camera-{cam_info['id']}", daemon=True)
+        self.camera_id = cam_info["id"]
+        self.video_source = cam_info["source"]
+        self.camera_location = cam_info["location"]
+        self.inference_worker = inference_worker
+        self.stop_event = stop_event
+        self.evidence_executor = evidence_executor
+        # Device indices and stream URLs are live; anything on disk is replayed as a file
+        self.is_live = not (isinstance(self.video_source, str) and os.path.isfile(self.video_source))
+        self.pending_clips = threading.Semaphore(MAX_PENDING_CLIPS_PER_CAMERA)
+        self.live_clips = collections.deque(maxlen=MAX_PENDING_CLIPS_PER_CAMERA)
+        self.lock = threading.Lock()
+
+        self.fps = 25
+        self.recorder = None
+        self.detected_anomalies = []
+        self.anomaly_conf_queues = {
+            anomaly_type: AnomalyConfidenceQueue(max_len=FRAMES_PER_CLIP)
+            for anomaly_type in ALERT_ANOMALY_CLASSES
+        }
+        self.alert_triggered_status = {anomaly_type: False for anomaly_type in ALERT_ANOMALY_CLASSES}
+        self.last_prediction = None
+        self.latest_frame = None
+
+        self.frames_decoded = 0
+        self.clips_dropped = 0
+        self.started_at = None
+        self.finished_at = None
+        self.inference_lags = collections.deque(maxlen=50)
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_source)
+        if not cap.isOpened():
+            print(f"Error: Could not open video source for {self.camera_id}: {self.video_source}")
+            return
+        if self.is_live:
+            # Keep the driver-side buffer minimal so a slow loop sees new frames, not stale ones
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        self.recorder = EventWindowRecorder(self.fps)
+        print(f"Starting Camera {self.camera_id} at {self.video_source} (FPS: {self.fps:.2f})...")
+
+        clip_buffer = ClipRingBuffer(FRAMES_PER_CLIP, 224, 224)
+        self.started_at = time.monotonic()
+        while not self.stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                print(f"End of video stream for Camera {self.camera_id}.")
+                break
+            self.frames_decoded += 1
+            with self.lock:
+                window = self.recorder.push(frame.copy())
+            if window:
+                self._report(window)
+            clip_buffer.append(frame)
+
+            if len(clip_buffer) == FRAMES_PER_CLIP:
+                # One copy: the clip outlives this buffer's slots on the inference thread
+                if self.is_live:
+                    self._queue_live_clip(clip_buffer.latest().copy())
+                else:
+                    # Block rather than drop so file results match the sequential mode
+                    while not self.pending_clips.acquire(timeout=0.5):
+                        if self.stop_event.is_set():
+                            break
+                    else:
+                        self.inference_worker.submit(self, clip_buffer.latest().copy())
+                clip_buffer.clear()
+
+            with self.lock:
+                if self.last_prediction is not None:
+                    draw_status(frame, *self.last_prediction, self.alert_triggered_status)
+                self.latest_frame = frame
+        cap.release()
+
+        # Let in-flight clips finish before consolidating
+        if not self.is_live:
+            for _ in range(MAX_PENDING_CLIPS_PER_CAMERA):
+                self.pending_clips.acquire(timeout=30)
+        self.finished_at = time.monotonic()
+        print(f"\nVideo processing finished for Camera {self.camera_id}.")
+        with self.lock:
+            window = self.recorder.finish()
+        if window:
+            self._report(window)
+        if not self.detected_anomalies:
+            print(f"--- Camera {self.camera_id}: no alert-worthy anomalies detected in this video stream. ---")
+        print(f"--- Processing for camera {self.camera_id} stopped. ---")
+
+    def _queue_live_clip(self, clip):
+        with self.lock:
+            if len(self.live_clips) == self.live_clips.maxlen:
+                self.clips_dropped += 1  # deque(maxlen) evicts the oldest clip on append
+            self.live_clips.append((clip, time.monotonic()))
+        self.inference_worker.notify(self)
+
+    def take_live_clip(self):
+        """Oldest pending live clip as (clip, submitted_at), or None if it was dropped."""
+        with self.lock:
+            return self.live_clips.popleft() if self.live_clips else None
+
+    def _report(self, window):
+        """Encodes, e-mails and queues a finished window on the evidence pool, off the decode loop."""
+        future = self.evidence_executor.submit(report_event_window, self.camera_id, self.camera_location, window, self.fps)
+        future.add_done_callback(self._on_report_done)
+
+    def _on_report_done(self, future):
+        if future.exception() is not None:
+            print(f"[ERROR] Camera {self.camera_id}: failed to report event window: {future.exception()}")
+
+    def on_prediction(self, predicted_class_name, prob_anomaly, lag):
+        try:
+            self.inference_lags.append(lag)
+            if prob_anomaly is None:
+                return
+            with self.lock:
+                self.last_prediction = (predicted_class_name, prob_anomaly)
+                for anomaly in update_alert_state(self.anomaly_conf_queues, self.alert_triggered_status, self.detected_anomalies,
+                                                  predicted_class_name, prob_anomaly, label=f" [Camera {self.camera_id}]"):
+                    self.recorder.trigger(anomaly)
+        finally:
+            if not self.is_live:
+                self.pending_clips.release()
+
+    def stats(self):
+        if self.started_at is None:
+            return f"Camera {self.camera_id}: not started"
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        achieved_fps = self.frames_decoded / elapsed if elapsed > 0 else 0.0
+        lags = list(self.inference_lags)
+        avg_lag_ms = 1000 * sum(lags) / len(lags) if lags else 0.0
+        max_lag_ms = 1000 * max(lags) if lags else 0.0
+        return (f"Camera {self.camera_id}: {achieved_fps:.1f} fps achieved (source {self.fps:.1f}), "
+                f"inference lag avg {avg_lag_ms:.0f} ms / max {max_lag_ms:.0f} ms, {self.clips_dropped} clips dropped")
+
+def process_cameras_concurrently(cameras, headless=False, batch_size=INFERENCE_BATCH_SIZE):
+    stop_event = threading.Event()
+    inference_worker = BatchedInferenceWorker(batch_size=batch_size)
+    inference_worker.start()
+    evidence_executor = ThreadPoolExecutor(max_workers=EVIDENCE_WORKERS, thread_name_prefix="edge-evidence")
+    workers = [CameraWorker(cam, inference_worker, stop_event, evidence_executor) for cam in cameras]
+    for worker in workers:
+        worker.start()
+
+    # OpenCV windows must be driven from the main thread
+    next_stats_at = time.monotonic() + STATS_INTERVAL_SECONDS
+    try:
+        while any(worker.is_alive() for worker in workers):
+            if headless:
+                time.sleep(0.2)
+            else:
+                for worker in workers:
+                    with worker.lock:
+                        frame = worker.latest_frame
+                    if frame is not None:
+                        cv2.imshow(f'Argus Core - Edge Client - Camera {worker.camera_id}', frame)
+                if cv2.waitKey(30) & 0xFF == ord('q'):
+                    print("Exiting detection loop.")
+                    stop_event.set()
+            if time.monotonic() >= next_stats_at:
+                for worker in workers:
+                    print(f"[STATS] {worker.stats()}")
+                next_stats_at = time.monotonic() + STATS_INTERVAL_SECONDS
+    except KeyboardInterrupt:
+        print("Interrupted, stopping cameras...")
+        stop_event.set()
+    for worker in workers:
+        worker.join()
+    inference_worker.stop()
+    # Finish encoding and queueing evidence that is still in flight
+    evidence_executor.shutdown(wait=True)
+
+    print("--- Final per-camera statistics ---")
+    for worker in workers:
+        print(f"[STATS] {worker.stats()}")
+    if not headless:
+        cv2.destroyAllWindows()
+
 if __name__ == '__main__':
-    for cam in CAMERA_SOURCES:
-        if cam["source"]:
-            process_video_file(cam)
+    parser = argparse.ArgumentParser(description="Argus Core edge client")
+    parser.add_argument("--cameras", help="JSON file listing cameras ({id, source, location}); defaults to one random test video")
+    parser.add_argument("--headless", action="store_true", help="Disable the OpenCV preview windows")
+    parser.add_argument("--concurrent", action="store_true", help="Process all cameras at once with batched inference")
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE, help="Max clips per inference batch in concurrent mode")
+    args = parser.parse_args()
+
+    cameras = load_camera_sources(args.cameras) if args.cameras else CAMERA_SOURCES
+    available = []
+    for cam in cameras:
+        if cam["source"] is not None and cam["source"] != "":
+            available.append(cam)
         else:
-            print(f"Skipping camera {cam['id']} due to missing video source.")
\ No newline at end of file
+            print(f"Skipping camera {cam['id']} due to missing video source.")
+
+    OUTBOX.start()
+    try:
+        if args.concurrent:
+            process_cameras_concurrently(available, headless=args.headless, batch_size=args.batch_size)
+        else:
+            for cam in available:
+                process_video_file(cam, headless=args.headless)
+    finally:
+        OUTBOX.stop()
@@ -0,0 +1,169 @@
+# src/edge_evidence.py
+"""
+Event-window evidence for the edge client.
+
+Instead of keeping and uploading the whole source video, the edge keeps a short pre-roll
+of frames in memory. When an anomaly fires it records until the post-roll has elapsed
+(later detections inside the window extend it). Each finished window is encoded with
+H.264 at a configurable bitrate and optional downscale, plus an optional low-res preview
+that is uploaded ahead of the full-quality segment.
+"""
+import collections
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+
+EVIDENCE_PRE_ROLL_SECONDS = float(os.getenv("EVIDENCE_PRE_ROLL_SECONDS", 5))
+EVIDENCE_POST_ROLL_SECONDS = float(os.getenv("EVIDENCE_POST_ROLL_SECONDS", 5))
+# Hard cap so a camera stuck in alert does not buffer forever
+EVIDENCE_MAX_WINDOW_SECONDS = float(os.getenv("EVIDENCE_MAX_WINDOW_SECONDS", 120))
+EVIDENCE_BITRATE = os.getenv("EVIDENCE_BITRATE", "800k")
+EVIDENCE_MAX_WIDTH = int(os.getenv("EVIDENCE_MAX_WIDTH", 960))  # 0 keeps the source resolution
+EVIDENCE_PREVIEW = os.getenv("EVIDENCE_PREVIEW", "1") == "1"
+EVIDENCE_PREVIEW_WIDTH = int(os.getenv("EVIDENCE_PREVIEW_WIDTH", 320))
+EVIDENCE_PREVIEW_BITRATE = os.getenv("EVIDENCE_PREVIEW_BITRATE", "150k")
+
+FFMPEG_BIN = shutil.which("ffmpeg")
+
+
+class EventWindow:
+    __slots__ = ("frames", "anomalies", "frames_left", "max_frames")
+
+    def __init__(self, pre_roll_frames, post_roll_frames, max_frames):
+        self.frames = list(pre_roll_frames)
+        self.anomalies = []
+        self.frames_left = post_roll_frames
+        self.max_frames = max_frames
+
+    @property
+    def anomaly_types(self):
+        return ", ".join(sorted(set(a["anomaly_type"] for a in self.anomalies)))
+
+    @property
+    def max_score(self):
+        return max(a["score"] for a in self.anomalies)
+
+    @property
+    def started_at(self):
+        return min(a["timestamp"] for a in self.anomalies)
+
+    @property
+    def ended_at(self):
+        return max(a["timestamp"] for a in self.anomalies)
+
+
+class EventWindowRecorder:
+    """Keeps a rolling pre-roll and cuts one window per (merged) anomaly episode."""
+
+    def __init__(self, fps, pre_roll_seconds=EVIDENCE_PRE_ROLL_SECONDS, post_roll_seconds=EVIDENCE_POST_ROLL_SECONDS,
+                 max_window_seconds=EVIDENCE_MAX_WINDOW_SECONDS):
+        self.post_roll_frames = max(1, int(post_roll_seconds * fps))
+        self.max_frames = max(1, int(max_window_seconds * fps))
+        self.pre_roll = collections.deque(maxlen=max(1, int(pre_roll_seconds * fps)))
+        self.active = None
+
+    def trigger(self, anomaly):
+        """Starts a window (or extends the open one) for an anomaly dict {anomaly_type, score, timestamp}."""
+        if self.active is None:
+            self.active = EventWindow(self.pre_roll, self.post_roll_frames, self.max_frames)
+            self.pre_roll.clear()
+        else:
+            self.active.frames_left = self.post_roll_frames
+        self.active.anomalies.append(anomaly)
+
+    def push(self, frame):
+        """Adds a frame; returns the finished EventWindow when a window closes, else None."""
+        if self.active is None:
+            self.pre_roll.append(frame)
+            return None
+        self.active.frames.append(frame)
+        self.active.frames_left -= 1
+        if self.active.frames_left <= 0 or len(self.active.frames) >= self.active.max_frames:
+            return self.finish()
+        return None
+
+    def finish(self):
+        """Closes the open window (e.g. at end of stream) and returns it, or None."""
+        window, self.active = self.active, None
+        return window
+
+
+def _scaled_size(width, height, max_width):
+    if not max_width or width <= max_width:
+        return width, height
+    scale = max_width / width
+    # H.264 with yuv420p needs even dimensions
+    return max_width - max_width % 2, int(height * scale) // 2 * 2
+
+
+def _encode_ffmpeg(frames, filepath, fps, bitrate, size, out_size):
+    """H.264 through an ffmpeg pipe. Raises on any failure; the process is always reaped."""
+    (width, height), (out_w, out_h) = size, out_size
+    cmd = [
+        FFMPEG_BIN, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:.3f}", "-i", "-",
+        "-vf", f"scale={out_w}:{out_h}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate,
+        "-movflags", "+faststart", "-an", filepath,
+    ]
+    # stderr goes to a file, not a pipe, so ffmpeg can never block on it while we feed frames
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=err)
+        try:
+            for frame in frames:
+                proc.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            pass  # ffmpeg exited early (e.g. no libx264); its exit code and stderr say why
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            proc.wait()
+        if proc.returncode != 0:
+            err.seek(0)
+            raise RuntimeError(err.read().decode(errors="ignore").strip() or f"ffmpeg exited with {proc.returncode}")
+    if not os.path.exists(filepath):
+        raise RuntimeError("ffmpeg exited without writing the clip")
+
+
+def _encode_opencv(frames, filepath, fps, size, out_size):
+    out = cv2.VideoWriter(filepath, cv2.VideoWriter_fourcc(*'mp4v'), fps, out_size)
+    if not out.isOpened():
+        raise RuntimeError("OpenCV could not open an mp4v writer")
+    try:
+        for frame in frames:
+            out.write(frame if out_size == size else cv2.resize(frame, out_size, interpolation=cv2.INTER_AREA))
+    finally:
+        out.release()
+
+
+def encode_clip(frames, filepath, fps, bitrate=EVIDENCE_BITRATE, max_width=EVIDENCE_MAX_WIDTH):
+    """
+    Encodes BGR frames to an H.264 MP4 via an ffmpeg pipe, downscaling to max_width.
+    Falls back to OpenCV's mp4v writer if ffmpeg is not installed or fails for any reason
+    (missing encoder, crash, broken pipe). Returns filepath or None.
+    """
+    if not frames:
+        return None
+    height, width, _ = frames[0].shape
+    size, out_size = (width, height), _scaled_size(width, height, max_width)
+    if FFMPEG_BIN:
+        try:
+            _encode_ffmpeg(frames, filepath, fps, bitrate, size, out_size)
+            return filepath
+        except Exception as e:
+            print(f"[ERROR] ffmpeg failed to encode clip {filepath}: {e}. Falling back to OpenCV.")
+    try:
+        _encode_opencv(frames, filepath, fps, size, out_size)
+        return filepath
+    except Exception as e:
+        print(f"[ERROR] Failed to encode clip {filepath}: {e}")
+        return None
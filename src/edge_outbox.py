@@ -0,0 +1,317 @@
+# src/edge_outbox.py
+"""
+Durable outbox for edge -> backend traffic.
+
+Incidents and clip uploads are written to a small SQLite journal and delivered by a
+background sender thread over one pooled `requests.Session`, so the detection loop only
+ever pays for a local INSERT. Failed deliveries are retried with exponential backoff and
+anything still pending when the process exits is replayed on the next start.
+
+A clip row depends on the event row it belongs to: it is only uploaded once the backend
+has returned an incident id for that event. Clips go through the resumable /uploads
+protocol in CHUNK_BYTES pieces; the upload id is journalled so an interrupted transfer
+(or a restart) resumes from the server's committed offset instead of starting over.
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+# Delivered events are kept a while so late clips can still look up their incident id
+SENT_RETENTION_SECONDS = 24 * 3600
+# Pending incidents are sent together through /events/batch, up to this many per request
+EVENT_BATCH_SIZE = int(os.getenv("EDGE_EVENT_BATCH_SIZE", 50))
+CHUNK_BYTES = int(os.getenv("EDGE_UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,                 -- 'event' or 'clip'
+    payload TEXT,                       -- JSON body for events
+    file_path TEXT,                     -- clip file for uploads
+    depends_on INTEGER,                 -- outbox id of the event a clip belongs to
+    delete_after_send INTEGER DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending | sent | failed
+    result_id INTEGER,                  -- incident id returned by the backend
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    upload_id TEXT,                     -- server-side resumable upload for clips
+    priority INTEGER NOT NULL DEFAULT 0, -- higher goes first (e.g. low-res previews)
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_at);
+"""
+
+
+class PermanentDeliveryError(Exception):
+    """The backend rejected the request; retrying will not help."""
+
+
+class EdgeOutbox:
+    def __init__(self, db_path, base_url, headers=None, pool_size=4):
+        self.db_path = db_path
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "upload_id" not in columns:
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN upload_id TEXT")
+        if "priority" not in columns:
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # --- Producer side (called from detection threads; local disk only) ---
+    def enqueue_event(self, payload):
+        """Queues an incident for POST /events and returns its outbox id."""
+        outbox_id = self._insert("event", payload=json.dumps(payload, default=str))
+        print(f"[OUTBOX] Queued incident {payload.get('event_type')} (outbox #{outbox_id}).")
+        return outbox_id
+
+    def enqueue_clip(self, event_outbox_id, file_path, delete_after_send=True, priority=0):
+        """Queues a clip upload for the incident created by `event_outbox_id`; higher priority is sent first."""
+        outbox_id = self._insert("clip", file_path=file_path, depends_on=event_outbox_id,
+                                 delete_after_send=int(delete_after_send), priority=priority)
+        print(f"[OUTBOX] Queued clip {os.path.basename(file_path)} (outbox #{outbox_id}).")
+        return outbox_id
+
+    def _insert(self, kind, payload=None, file_path=None, depends_on=None, delete_after_send=0, priority=0):
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (kind, payload, file_path, depends_on, delete_after_send, priority, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, payload, file_path, depends_on, delete_after_send, priority, time.time()))
+            outbox_id = cur.lastrowid
+        self._wake.set()
+        return outbox_id
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    # --- Sender thread ---
+    def start(self):
+        pending = self.pending_count()
+        if pending:
+            print(f"[OUTBOX] Replaying {pending} pending item(s) from {self.db_path}.")
+        self._thread = threading.Thread(target=self._run, name="edge-outbox", daemon=True)
+        self._thread.start()
+
+    def flush(self, timeout=30.0):
+        """Waits up to `timeout` seconds for the outbox to drain; returns True if it did."""
+        deadline = time.monotonic() + timeout
+        while self.pending_count():
+            if time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.2)
+        return True
+
+    def stop(self, timeout=30.0):
+        if not self.flush(timeout):
+            print(f"[OUTBOX] {self.pending_count()} item(s) still pending; they will be replayed on next start.")
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.session.close()
+
+    def _next_ready(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT o.id, o.kind, o.payload, o.file_path, o.attempts, o.delete_after_send, o.upload_id, e.result_id, e.status "
+                "FROM outbox o LEFT JOIN outbox e ON e.id = o.depends_on "
+                "WHERE o.status = 'pending' AND o.next_attempt_at <= ? "
+                "AND (o.kind = 'event' OR e.result_id IS NOT NULL OR e.status IS NULL OR e.status = 'failed') "
+                "ORDER BY o.kind = 'clip', o.priority DESC, o.id LIMIT 1", (time.time(),)).fetchone()
+
+    def _seconds_until_next(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _run(self):
+        last_prune = 0.0
+        while not self._stop.is_set():
+            row = self._next_ready()
+            if row is None:
+                # Clips waiting on an event in backoff look due, so never spin faster than 0.5s
+                wait = self._seconds_until_next()
+                self._wake.wait(timeout=min(max(wait, 0.5), 5.0) if wait is not None else 5.0)
+                self._wake.clear()
+                if time.monotonic() - last_prune > 3600:
+                    self._prune()
+                    last_prune = time.monotonic()
+                continue
+
+            outbox_id, kind, payload, file_path, attempts, delete_after_send, upload_id, incident_id, event_status = row
+            if kind == "event":
+                if not self._deliver_event_batch():
+                    self._send_event(outbox_id, payload, attempts)
+                continue
+            try:
+                if event_status == "failed" or (event_status is None and incident_id is None):
+                    raise PermanentDeliveryError("incident for this clip was never created")
+                self._upload_clip(outbox_id, incident_id, file_path, upload_id)
+                self._mark_sent(outbox_id)
+                if delete_after_send and os.path.exists(file_path):
+                    os.remove(file_path)
+            except PermanentDeliveryError as e:
+                print(f"[ERROR] [OUTBOX] Dropping clip #{outbox_id}: {e}")
+                self._update(outbox_id, status="failed", last_error=str(e))
+            except Exception as e:
+                self._retry_later(outbox_id, "clip", attempts, e)
+
+    def _send_event(self, outbox_id, payload, attempts):
+        """Posts one incident through /events and records the outcome."""
+        try:
+            self._mark_sent(outbox_id, result_id=self._post_event(json.loads(payload)))
+        except PermanentDeliveryError as e:
+            print(f"[ERROR] [OUTBOX] Dropping event #{outbox_id}: {e}")
+            self._update(outbox_id, status="failed", last_error=str(e))
+        except Exception as e:
+            self._retry_later(outbox_id, "event", attempts, e)
+
+    def _retry_later(self, outbox_id, kind, attempts, error):
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempts)) * random.uniform(0.8, 1.2)
+        print(f"[ERROR] [OUTBOX] Delivering {kind} #{outbox_id} failed (attempt {attempts + 1}): {error}. "
+              f"Retrying in {delay:.0f}s.")
+        self._update(outbox_id, attempts=attempts + 1, next_attempt_at=time.time() + delay, last_error=str(error))
+
+    def _deliver_event_batch(self):
+        """
+        Sends every ready event (up to EVENT_BATCH_SIZE) in one /events/batch call. Returns False
+        when there is nothing to batch. If the backend rejects the batch, every event in it is
+        posted one by one right away, so the bad one is isolated without re-sending the batch.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE kind = 'event' AND status = 'pending' "
+                "AND next_attempt_at <= ? ORDER BY id LIMIT ?", (time.time(), EVENT_BATCH_SIZE)).fetchall()
+        if len(rows) < 2:
+            return False
+        try:
+            response = self.session.post(f"{self.base_url}/events/batch",
+                                         json={"incidents": [json.loads(payload) for _, payload, _ in rows]}, timeout=30)
+            self._raise_for_status(response)
+            incident_ids = response.json()["incident_ids"]
+        except PermanentDeliveryError as e:
+            print(f"[OUTBOX] Batch of {len(rows)} incidents rejected ({e}); sending individually.")
+            for outbox_id, payload, attempts in rows:
+                self._send_event(outbox_id, payload, attempts)
+            return True
+        except Exception as e:
+            for outbox_id, _, attempts in rows:
+                delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempts)) * random.uniform(0.8, 1.2)
+                self._update(outbox_id, attempts=attempts + 1, next_attempt_at=time.time() + delay, last_error=str(e))
+            print(f"[ERROR] [OUTBOX] Delivering {len(rows)} incidents failed: {e}. Retrying with backoff.")
+            return True
+        for (outbox_id, _, _), incident_id in zip(rows, incident_ids):
+            self._mark_sent(outbox_id, result_id=incident_id)
+        print(f"✅ [OUTBOX] {len(rows)} incidents created on backend in one batch.")
+        return True
+
+    def _raise_for_status(self, response):
+        # 4xx (other than timeouts/throttling) will not succeed on retry
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise PermanentDeliveryError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+    def _post_event(self, payload):
+        response = self.session.post(f"{self.base_url}/events", json=payload, timeout=10)
+        self._raise_for_status(response)
+        incident_id = response.json()["id"]
+        print(f"✅ [OUTBOX] Incident created on backend: {incident_id}")
+        return incident_id
+
+    def _upload_clip(self, outbox_id, incident_id, file_path, upload_id):
+        if not file_path or not os.path.exists(file_path):
+            raise PermanentDeliveryError(f"clip file not found: {file_path}")
+        total_size = os.path.getsize(file_path)
+
+        offset = None
+        if upload_id:
+            response = self.session.get(f"{self.base_url}/uploads/{upload_id}", timeout=10)
+            if response.status_code == 404:
+                upload_id = None
+            else:
+                self._raise_for_status(response)
+                offset = response.json()["offset"]
+                print(f"[OUTBOX] Resuming upload of {os.path.basename(file_path)} at {offset}/{total_size} bytes.")
+        if not upload_id:
+            payload = {"incident_id": incident_id, "filename": os.path.basename(file_path),
+                       "total_size": total_size, "sha256": _file_sha256(file_path)}
+            response = self.session.post(f"{self.base_url}/uploads", json=payload, timeout=10)
+            self._raise_for_status(response)
+            upload_id, offset = response.json()["id"], 0
+            self._update(outbox_id, upload_id=upload_id)
+
+        resyncs = 0
+        with open(file_path, "rb") as f:
+            while offset < total_size:
+                f.seek(offset)
+                chunk = f.read(CHUNK_BYTES)
+                headers = {"Upload-Offset": str(offset), "Upload-Checksum": f"sha256 {hashlib.sha256(chunk).hexdigest()}",
+                           "Content-Type": "application/octet-stream"}
+                response = self.session.put(f"{self.base_url}/uploads/{upload_id}", data=chunk, headers=headers, timeout=120)
+                if response.status_code in (409, 422):
+                    # Out of sync or corrupted in transit: continue from whatever the server committed
+                    resyncs += 1
+                    if resyncs > 3:
+                        raise requests.exceptions.RequestException(f"upload {upload_id} keeps failing: {response.text[:200]}")
+                    response = self.session.get(f"{self.base_url}/uploads/{upload_id}", timeout=10)
+                    self._raise_for_status(response)
+                    offset = response.json()["offset"]
+                    continue
+                self._raise_for_status(response)
+                offset = response.json()["offset"]
+                resyncs = 0
+
+        response = self.session.post(f"{self.base_url}/uploads/{upload_id}/complete", timeout=60)
+        self._raise_for_status(response)
+        print(f"✅ [OUTBOX] Clip uploaded for incident {incident_id} (clip {response.json().get('clip_id')}).")
+
+    def _mark_sent(self, outbox_id, result_id=None):
+        self._update(outbox_id, status="sent", result_id=result_id, last_error=None)
+
+    def _update(self, outbox_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE outbox SET {columns} WHERE id = ?", (*fields.values(), outbox_id))
+
+    def _prune(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND created_at < ? "
+                "AND id NOT IN (SELECT depends_on FROM outbox WHERE status = 'pending' AND depends_on IS NOT NULL)",
+                (time.time() - SENT_RETENTION_SECONDS,))
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,6 +1,7 @@
 # src/utils.py
 import cv2
 import os
+import numpy as np
 import torch
 from torchvision import transforms
 from torch.utils.data import Dataset
@@ -136,3 +137,84 @@ class AnomalyConfidenceQueue:
     def __len__(self):
         """Returns the current length of the queue."""
         return len(self.q)
+
+
+class ClipRingBuffer:
+    """
+    Fixed-size ring buffer of uint8 BGR frames backed by one NumPy array.
+
+    The first max_view - 1 slots are mirrored after the ring (slot i is also written at
+    i + capacity), so the latest max_view frames are always a contiguous slice of the backing
+    array. That slice can be handed straight to torch.from_numpy() without copying or stacking.
+    The array is allocated on the first append, so idle buffers cost nothing.
+    """
+    __slots__ = ("capacity", "height", "width", "max_view", "_buf", "_write_idx", "_count", "_total")
+
+    def __init__(self, capacity, height=224, width=224, max_view=None):
+        """
+        Args:
+            capacity (int): Maximum number of frames retained.
+            height (int): Frame height stored in the buffer. Larger/smaller frames are resized on write.
+            width (int): Frame width stored in the buffer.
+            max_view (int): Longest window latest() returns as a zero-copy view (default: capacity).
+                Longer windows are returned as copies.
+        """
+        if capacity < 1:
+            raise ValueError("ClipRingBuffer capacity must be at least 1")
+        self.capacity = capacity
+        self.height = height
+        self.width = width
+        self.max_view = capacity if max_view is None else max(1, min(max_view, capacity))
+        self._buf = None
+        self._write_idx = 0
+        self._count = 0
+        self._total = 0
+
+    def append(self, frame):
+        """
+        Copies (or resizes) a BGR frame into the next slot. No new frame arrays are allocated
+        after the first call.
+        """
+        if self._buf is None:
+            self._buf = np.zeros((self.capacity + self.max_view - 1, self.height, self.width, 3), dtype=np.uint8)
+        slot = self._buf[self._write_idx]
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:
+            cv2.resize(frame, (self.width, self.height), dst=slot)
+        else:
+            np.copyto(slot, frame)
+        if self._write_idx < self.max_view - 1:
+            self._buf[self._write_idx + self.capacity] = slot
+        self._write_idx = (self._write_idx + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._total += 1
+
+    def latest(self, n=None):
+        """
+        Returns a contiguous [n, H, W, 3] array of the newest n frames (oldest first).
+        Up to max_view frames this is a view, only valid until the slots are overwritten; copy it
+        if it must outlive that. Longer windows (e.g. a saved pre-roll) are returned as a copy.
+        """
+        n = self._count if n is None else n
+        if n > self._count:
+            raise ValueError(f"Requested {n} frames but only {self._count} are buffered")
+        if n == 0:
+            return np.empty((0, self.height, self.width, 3), dtype=np.uint8)
+        if n > self.max_view:
+            return self._buf[np.arange(self._write_idx - n, self._write_idx) % self.capacity]
+        if self._write_idx >= n:
+            return self._buf[self._write_idx - n:self._write_idx]
+        end = self._write_idx + self.capacity
+        return self._buf[end - n:end]
+
+    def clear(self):
+        """Forgets all buffered frames without releasing the backing array."""
+        self._write_idx = 0
+        self._count = 0
+
+    @property
+    def total_written(self):
+        """Number of frames appended since creation (not reset by clear())."""
+        return self._total
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,114 @@
+import os
+import socket
+import time
+from email import message_from_bytes, policy
+
+import pytest
+
+pytest.importorskip("dotenv")
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+from backend.alert_service import AlertDispatcher  # noqa: E402
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.peers = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content, policy=policy.default))
+        self.peers.append(session.peer)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"\x00" * 1024)
+    return str(path)
+
+
+def make_dispatcher(controller, **kwargs):
+    settings = {"server": controller.hostname, "port": controller.port, "user": None, "password": None,
+                "to": "ops@example.com", "from": "argus@example.com", "starttls": False}
+    kwargs.setdefault("digest_window_seconds", 0)
+    return AlertDispatcher(settings=settings, **kwargs)
+
+
+def test_alerts_reuse_one_smtp_connection(smtp_server, clip):
+    controller, handler = smtp_server
+    dispatcher = make_dispatcher(controller)
+    for anomaly_type in ("Fighting", "Robbery", "Arson"):
+        assert dispatcher.submit(clip, location="Gate", anomaly_type=anomaly_type, camera_id=1)
+        dispatcher.flush(timeout=10)
+
+    assert [m["Subject"].split(":")[1].split()[0] for m in handler.messages] == ["Fighting", "Robbery", "Arson"]
+    assert len(set(handler.peers)) == 1
+    assert handler.messages[0].get_content_type() == "multipart/mixed"  # Clip attached
+
+
+def test_cooldown_suppresses_and_counts_repeats(smtp_server, clip):
+    controller, handler = smtp_server
+    dispatcher = make_dispatcher(controller, cooldown_seconds=0.5)
+    assert dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    assert not dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    assert not dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    assert dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=2)  # Other camera
+    dispatcher.flush(timeout=10)
+    time.sleep(0.6)
+    assert dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    dispatcher.flush(timeout=10)
+
+    assert len(handler.messages) == 3
+    assert "Suppressed       : 2 similar alert(s)" in handler.messages[-1].get_body(("plain",)).get_content()
+
+
+def test_burst_is_sent_as_one_digest_with_links_above_the_cap(smtp_server, clip, tmp_path):
+    controller, handler = smtp_server
+    large = tmp_path / "large.mp4"
+    large.write_bytes(b"\x00" * 4096)
+    dispatcher = make_dispatcher(controller, digest_window_seconds=0.5, max_attachment_bytes=2048)
+    dispatcher.link_builder = lambda path: f"https://argus.example/clips/{path.rsplit('/', 1)[-1]}"
+    assert dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    assert dispatcher.submit(str(large), location="Lobby", anomaly_type="Robbery", camera_id=2)
+    assert dispatcher.submit(clip, location="Yard", anomaly_type="Arson", camera_id=3)
+    dispatcher.flush(timeout=10)
+
+    assert len(handler.messages) == 1
+    message = handler.messages[0]
+    assert message["Subject"].startswith("Argus Core ALERT: 3 anomalies detected")
+    body = message.get_body(("plain",)).get_content()
+    assert "large.mp4: https://argus.example/clips/large.mp4" in body
+    assert [part.get_filename() for part in message.iter_attachments()] == ["clip.mp4", "clip.mp4"]
+
+
+def test_clip_deleted_after_submit_is_still_attached(smtp_server, clip):
+    controller, handler = smtp_server
+    dispatcher = make_dispatcher(controller, digest_window_seconds=0.3)
+    assert dispatcher.submit(clip, location="Gate", anomaly_type="Fighting", camera_id=1)
+    os.remove(clip)  # e.g. the edge outbox finished uploading it
+    dispatcher.flush(timeout=10)
+
+    assert len(handler.messages) == 1
+    attachments = list(handler.messages[0].iter_attachments())
+    assert [part.get_filename() for part in attachments] == ["clip.mp4"]
+    assert attachments[0].get_content() == b"\x00" * 1024
+    assert os.listdir(dispatcher._evidence_dir) == []
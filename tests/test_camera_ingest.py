@@ -0,0 +1,180 @@
+import threading
+import time
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import backend.camera_ingest as ingest  # noqa: E402
+
+FRAME = np.zeros((224, 224, 3), dtype=np.uint8)
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in: fails to open `failures` times, then serves `frames` frames."""
+    opened = 0
+
+    def __init__(self, failures=0, frames=0):
+        FakeCapture.opened += 1
+        self._ok = FakeCapture.opened > failures
+        self._frames_left = frames
+
+    def isOpened(self):
+        return self._ok
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 1000.0
+
+    def grab(self):
+        self._frames_left -= 1
+        return self._frames_left >= 0
+
+    def retrieve(self):
+        return True, FRAME
+
+    def release(self):
+        pass
+
+
+class RecordingEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        if timeout:
+            self.waits.append(timeout)
+        return super().wait(min(timeout or 0, 0.01))
+
+
+class NullBudget:
+    def try_submit(self, fn, *args):
+        return False
+
+
+@pytest.fixture
+def predictions(monkeypatch):
+    """Stubbed src.anomaly_detection: predict_anomaly() blocks until the test releases it."""
+    release = threading.Event()
+    calls = []
+
+    def predict_anomaly(clip):
+        calls.append(clip)
+        release.wait(5)
+        return "Normal_Videos", 0.9
+
+    monkeypatch.setitem(__import__("sys").modules, "src.anomaly_detection",
+                        types.SimpleNamespace(predict_anomaly=predict_anomaly))
+    yield types.SimpleNamespace(release=release, calls=calls)
+    release.set()
+
+
+def make_reader(camera_id=1, budget=None, url="rtsp://camera/stream"):
+    return ingest.CameraReader(camera_id, f"Camera {camera_id}", url, "Gate", budget or NullBudget(), None)
+
+
+def feed_clip(reader):
+    for _ in range(ingest.FRAMES_PER_CLIP):
+        reader._on_frame(FRAME)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_reader_backs_off_until_the_stream_opens(monkeypatch):
+    FakeCapture.opened = 0
+    monkeypatch.setattr(ingest.cv2, "VideoCapture", lambda *args: FakeCapture(failures=3, frames=5))
+    reader = make_reader()
+    reader.stop_event = RecordingEvent()
+    reader.start()
+    wait_until(lambda: reader.frames_sampled > 0)
+    reader.stop()
+    reader.join(timeout=5)
+
+    assert not reader.is_alive()
+    # Three failed opens double the delay; the stream that then ends reconnects after the base delay
+    assert reader.stop_event.waits[:4] == [1.0, 2.0, 4.0, 1.0]
+
+
+def test_budget_skips_clips_of_other_cameras_when_exhausted(predictions):
+    budget = ingest.InferenceBudget(workers=1, max_inflight=1, max_clips_per_sec=0)
+    first, second = make_reader(1, budget), make_reader(2, budget)
+    try:
+        feed_clip(first)
+        feed_clip(second)
+        assert (first.clips_submitted, second.clips_skipped) == (1, 1)
+        predictions.release.set()
+        wait_until(lambda: not first._inferring.is_set())
+        feed_clip(second)
+        assert second.clips_submitted == 1
+    finally:
+        budget.shutdown()
+
+
+def test_token_bucket_limits_clips_per_second(predictions):
+    predictions.release.set()
+    budget = ingest.InferenceBudget(workers=4, max_inflight=4, max_clips_per_sec=1)
+    readers = [make_reader(camera_id, budget) for camera_id in (1, 2, 3)]
+    try:
+        for reader in readers:
+            feed_clip(reader)
+        assert sum(reader.clips_submitted for reader in readers) == 1
+        assert sum(reader.clips_skipped for reader in readers) == 2
+    finally:
+        budget.shutdown()
+
+
+def test_one_camera_never_has_two_clips_in_flight(predictions):
+    budget = ingest.InferenceBudget(workers=2, max_inflight=4, max_clips_per_sec=0)
+    reader = make_reader(1, budget)
+    try:
+        feed_clip(reader)
+        feed_clip(reader)
+        assert (reader.clips_submitted, reader.clips_skipped) == (1, 1)
+        assert len(predictions.calls) <= 1
+        predictions.release.set()
+        wait_until(lambda: not reader._inferring.is_set())
+        feed_clip(reader)
+        assert reader.clips_submitted == 2
+    finally:
+        budget.shutdown()
+
+
+def test_sync_follows_the_camera_table(monkeypatch):
+    FakeCapture.opened = 0
+    monkeypatch.setattr(ingest.cv2, "VideoCapture", lambda *args: FakeCapture(failures=10 ** 6))
+    table = {1: ("Gate", "rtsp://cam/1", "North"), 2: ("Lobby", "rtsp://cam/2", "Main")}
+    service = ingest.CameraIngestService(poll_seconds=0.01)
+    service.load_cameras = lambda: dict(table)
+    try:
+        service.sync()
+        gate, lobby = service.readers[1], service.readers[2]
+        assert gate.is_alive() and lobby.is_alive()
+
+        table[1] = ("Front gate", "rtsp://cam/1", "South")  # Renamed: same reader, new metadata
+        table[2] = ("Lobby", "rtsp://cam/2b", "Main")        # New URL: reader restarted
+        table[3] = ("Yard", "rtsp://cam/3", None)             # Added
+        service.sync()
+        assert service.readers[1] is gate
+        assert (gate.camera_name, gate.location) == ("Front gate", "South")
+        assert service.readers[2] is not lobby and service.readers[2].url == "rtsp://cam/2b"
+        lobby.join(timeout=5)
+        assert not lobby.is_alive()
+        assert service.readers[3].is_alive()
+
+        del table[1]
+        service.sync()
+        assert 1 not in service.readers
+        gate.join(timeout=5)
+        assert not gate.is_alive()
+    finally:
+        service.stop()
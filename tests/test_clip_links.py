@@ -0,0 +1,25 @@
+from backend.clip_links import ClipLinkSigner
+
+
+def test_link_verifies_only_for_its_clip_and_user():
+    signer = ClipLinkSigner("secret")
+    link = signer.sign(7, 3)
+    assert signer.verify(7, 3, link["exp"], link["sig"])
+    assert not signer.verify(8, 3, link["exp"], link["sig"])
+    assert not signer.verify(7, 4, link["exp"], link["sig"])
+
+
+def test_expired_link_is_rejected():
+    signer = ClipLinkSigner("secret", ttl=-1)
+    link = signer.sign(7, 3)
+    assert not signer.verify(7, 3, link["exp"], link["sig"])
+
+
+def test_purposes_do_not_accept_each_others_links():
+    clips = ClipLinkSigner("secret")
+    alerts = ClipLinkSigner("secret", ttl=3600, purpose="alert-link")
+    link = alerts.sign(7, 0)
+    assert alerts.verify(7, 0, link["exp"], link["sig"])
+    assert not clips.verify(7, 0, link["exp"], link["sig"])
+    link = clips.sign(7, 0)
+    assert not alerts.verify(7, 0, link["exp"], link["sig"])
@@ -0,0 +1,58 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from backend.content_store import ContentStore
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 64
+
+
+def test_objects_are_keyed_on_the_digest_alone(tmp_path):
+    store = ContentStore(str(tmp_path))
+    first_hash, first_path = store.put_stream(io.BytesIO(VIDEO))
+    upper = tmp_path / "CLIP.MP4"
+    upper.write_bytes(VIDEO)
+    second_hash, second_path = store.put_file(str(upper))
+
+    assert first_hash == second_hash == hashlib.sha256(VIDEO).hexdigest()
+    assert first_path == second_path == store.object_path(first_hash)
+    assert os.path.basename(first_path) == first_hash
+    assert not upper.exists()
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_aborted_writer_leaves_nothing_behind(tmp_path):
+    store = ContentStore(str(tmp_path))
+    writer = store.open_writer()
+    writer.write(VIDEO[:100])
+    writer.abort()
+    assert os.listdir(store.tmp_dir) == []
+    assert sorted(os.listdir(tmp_path)) == ["tmp"]
+
+
+def test_upload_is_stored_while_it_is_received(tmp_path):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+
+    from backend.upload_stream import receive_multipart_file
+
+    store = ContentStore(str(tmp_path))
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        filename, content_hash, path = await receive_multipart_file(request, store, buffer_bytes=1000)
+        with open(path, "rb") as f:
+            return {"filename": filename, "hash": content_hash, "intact": f.read() == VIDEO}
+
+    client = TestClient(app)
+    response = client.post("/upload", data={"note": "x"}, files={"file": ("A.MP4", VIDEO, "video/mp4")})
+    assert response.json() == {"filename": "A.MP4", "hash": hashlib.sha256(VIDEO).hexdigest(), "intact": True}
+
+    assert client.post("/upload", files={"other": ("notes.txt", b"x", "text/plain")}).status_code == 422
+    assert client.post("/upload", content=VIDEO, headers={"content-type": "video/mp4"}).status_code == 400
+    assert os.listdir(store.tmp_dir) == []
@@ -0,0 +1,32 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import edge_evidence  # noqa: E402
+
+
+def frames(count=8, width=64, height=48):
+    return [np.full((height, width, 3), i * 20, dtype=np.uint8) for i in range(count)]
+
+
+@pytest.mark.parametrize("ffmpeg", ["false", "true"])
+def test_encode_clip_falls_back_to_opencv_when_ffmpeg_fails(tmp_path, monkeypatch, ffmpeg):
+    # `false` exits non-zero; `true` exits 0 at once, breaking the pipe and writing nothing
+    binary = shutil.which(ffmpeg)
+    if binary is None:
+        pytest.skip(f"no '{ffmpeg}' binary")
+    monkeypatch.setattr(edge_evidence, "FFMPEG_BIN", binary)
+    path = str(tmp_path / "clip.mp4")
+
+    assert edge_evidence.encode_clip(frames(), path, fps=10) == path
+    assert os.path.getsize(path) > 0
+
+
+def test_encode_clip_without_frames_writes_nothing(tmp_path):
+    assert edge_evidence.encode_clip([], str(tmp_path / "clip.mp4"), fps=10) is None
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("requests")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from edge_outbox import EdgeOutbox  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = json.dumps(self._body)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeBackend:
+    """Rejects any request containing a 'poison' event, like /events validation would."""
+    def __init__(self):
+        self.calls = []
+        self.next_id = 100
+
+    def post(self, url, json=None, timeout=None):
+        path = url[len("http://backend"):]
+        self.calls.append(path)
+        batch = path == "/events/batch"
+        incidents = json["incidents"] if batch else [json]
+        if any(incident["event_type"] == "poison" for incident in incidents):
+            return FakeResponse(422, {"detail": "bad event"})
+        ids = list(range(self.next_id, self.next_id + len(incidents)))
+        self.next_id += len(incidents)
+        return FakeResponse(200, {"incident_ids": ids} if batch else {"id": ids[0]})
+
+    def close(self):
+        pass
+
+
+def statuses(outbox):
+    return outbox._conn.execute("SELECT status FROM outbox ORDER BY id").fetchall()
+
+
+def test_rejected_batch_is_split_without_being_resent(tmp_path):
+    outbox = EdgeOutbox(str(tmp_path / "outbox.sqlite3"), "http://backend")
+    backend = outbox.session = FakeBackend()
+    for event_type in ("Fighting", "poison", "Robbery", "Arson"):
+        outbox.enqueue_event({"camera_id": 1, "event_type": event_type})
+
+    assert outbox._deliver_event_batch()
+
+    assert backend.calls == ["/events/batch"] + ["/events"] * 4
+    assert statuses(outbox) == [("sent",), ("failed",), ("sent",), ("sent",)]
+    assert outbox._deliver_event_batch() is False  # nothing left to batch
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import Column, DateTime, Float, Integer, String, create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session, declarative_base  # noqa: E402
+
+from backend.incident_stats import IncidentRollup  # noqa: E402
+
+Base = declarative_base()
+
+
+class Incident(Base):
+    __tablename__ = "incidents"
+    id = Column(Integer, primary_key=True)
+    camera_id = Column(Integer, nullable=False)
+    event_type = Column(String(255), nullable=False)
+    score = Column(Float)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(20))
+
+
+class IncidentStatsHourly(Base):
+    __tablename__ = "incident_stats_hourly"
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    camera_id = Column(Integer, primary_key=True)
+    event_type = Column(String(255), primary_key=True)
+    incident_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+
+
+STARTED = datetime(2026, 1, 5, 10, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def rollup():
+    rollup = IncidentRollup(Incident, IncidentStatsHourly, pending_event_types={"Analyzing..."})
+    rollup.install()
+    return rollup
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def rollups(db):
+    t = IncidentStatsHourly
+    return db.execute(select(t.event_type, t.incident_count).order_by(t.event_type)).all()
+
+
+def test_placeholder_is_counted_once_analysed(rollup, db):
+    inc = Incident(camera_id=1, event_type="Analyzing...", started_at=STARTED, status="analyzing")
+    db.add(inc)
+    db.commit()
+    assert rollups(db) == []
+
+    inc.event_type, inc.status, inc.score = "Fighting", "detected_from_upload", 0.9
+    db.commit()
+    assert rollups(db) == [("Fighting", 1)]
+
+    db.delete(inc)
+    db.commit()
+    assert rollups(db) == []
+
+
+def test_rebuild_matches_incremental_rollups(rollup, db):
+    db.add_all([
+        Incident(camera_id=1, event_type="Fighting", score=0.8, started_at=STARTED, status="detected"),
+        Incident(camera_id=1, event_type="Robbery", score=0.7, started_at=STARTED, status="detected"),
+        Incident(camera_id=2, event_type="Analyzing...", started_at=STARTED, status="analysis_failed"),
+    ])
+    db.commit()
+    incremental = rollups(db)
+
+    assert rollup.rebuild(db) == 2
+    assert rollups(db) == incremental == [("Fighting", 1), ("Robbery", 1)]
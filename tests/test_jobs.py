@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text, create_engine  # noqa: E402
+from sqlalchemy.orm import declarative_base, sessionmaker  # noqa: E402
+
+from backend import jobs  # noqa: E402
+
+Base = declarative_base()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(String(20), nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(Text)
+    result = Column(Text)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_now)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=_now)
+    available_at = Column(DateTime(timezone=True), nullable=False, default=_now)
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(engine)
+
+
+def run_one(session_factory, kind, after_job):
+    with session_factory() as db:
+        db.add(jobs.new_job(Job, kind, {}, max_attempts=1))
+        db.commit()
+    runner = jobs.JobRunner(session_factory, Job, "test-worker", after_job=after_job)
+    runner.execute(*runner.claim())
+    with session_factory() as db:
+        return db.query(Job).one().status
+
+
+@pytest.mark.parametrize("outcome, status", [
+    ("return", jobs.STATUS_SUCCEEDED), ("raise", jobs.STATUS_FAILED), ("cancel", jobs.STATUS_CANCELLED),
+])
+def test_after_job_hook_runs_while_the_job_is_still_running(session_factory, monkeypatch, outcome, status):
+    def handler(ctx, payload):
+        if outcome == "raise":
+            raise RuntimeError("boom")
+        if outcome == "cancel":
+            raise jobs.JobCancelled()
+        return {"ok": True}
+    monkeypatch.setitem(jobs._HANDLERS, "test_job", handler)
+
+    seen = []
+
+    def after_job():
+        with session_factory() as db:
+            seen.append(db.query(Job.status).scalar())
+
+    assert run_one(session_factory, "test_job", after_job) == status
+    assert seen == [jobs.STATUS_RUNNING]
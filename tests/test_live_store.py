@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from backend.live_store import (
+    KIND_ALERT, KIND_BYTES, KIND_JSON,
+    InMemoryLiveSessionStore, LiveSessionStore, RedisLiveSessionStore,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle(predicate, timeout=2.0):
+    """Polls until `predicate()` holds; pub/sub delivery is asynchronous."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached in time")
+        await asyncio.sleep(0.01)
+
+
+def make_stores(count, **kwargs):
+    """Stores on one in-process Redis stand-in, as separate workers would share a broker."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return [RedisLiveSessionStore(client=fakeredis.aioredis.FakeRedis(server=server), **kwargs)
+            for _ in range(count)]
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LiveSessionStore()
+
+
+def test_in_memory_store_delivers_until_unsubscribed():
+    async def scenario():
+        store = InMemoryLiveSessionStore()
+        received = []
+        callback = lambda kind, payload: received.append((kind, payload))
+        await store.subscribe("s1", callback)
+        await store.publish_frame("s1", KIND_BYTES, b"jpeg")
+        await store.publish_alert("s1", {"event": "Fighting"})
+        await store.unsubscribe("s1", callback)
+        await store.publish_frame("s1", KIND_BYTES, b"late")
+        return received
+
+    assert run(scenario()) == [(KIND_BYTES, b"jpeg"), (KIND_ALERT, {"event": "Fighting"})]
+
+
+def test_redis_store_relays_frames_and_alerts_between_workers():
+    async def scenario():
+        owner, viewer = make_stores(2)
+        await owner.start()
+        await viewer.start()
+        received = []
+        await viewer.subscribe("s1", lambda kind, payload: received.append((kind, payload)))
+        await owner.publish_frame("s1", KIND_BYTES, memoryview(b"jpeg"))
+        await owner.publish_frame("s1", KIND_JSON, {"type": "frame", "image": "data:..."})
+        await owner.publish_alert("s1", {"event": "Fighting"})
+        await settle(lambda: len(received) == 3)
+        await owner.close()
+        await viewer.close()
+        return received
+
+    received = run(scenario())
+    assert (KIND_BYTES, b"jpeg") in received
+    assert (KIND_JSON, {"type": "frame", "image": "data:..."}) in received
+    assert (KIND_ALERT, {"event": "Fighting"}) in received
+
+
+def test_redis_store_session_has_a_single_owner():
+    pytest.importorskip("lupa")  # release/refresh are Lua scripts
+
+    async def scenario():
+        first, second = make_stores(2)
+        assert await first.claim_session("s1")
+        assert await first.claim_session("s1")  # re-claiming our own session is fine
+        assert not await second.claim_session("s1")
+        await second.release_session("s1")  # not the owner: must not free the key
+        assert not await second.claim_session("s1")
+        await first.release_session("s1")
+        assert await second.claim_session("s1")
+
+    run(scenario())
+
+
+def test_redis_reader_survives_malformed_messages():
+    async def scenario():
+        store, = make_stores(1)
+        await store.start()
+        received = []
+        await store.subscribe("s1", lambda kind, payload: received.append((kind, payload)))
+        channel = store._channel("s1")
+        await store.redis.publish(channel, b"Xunknown tag")
+        await store.redis.publish(channel, b"J{not json")
+        await store.publish_alert("s1", {"event": "Robbery"})
+        await settle(lambda: received)
+        reader = store._reader_task
+        await store.close()
+        return received, reader
+
+    received, reader = run(scenario())
+    assert received == [(KIND_ALERT, {"event": "Robbery"})]
+    assert not reader.done() or reader.cancelled()
+
+
+def test_redis_publish_frame_drops_oldest_when_broker_falls_behind():
+    async def scenario():
+        store, = make_stores(1, publish_queue_size=4)
+        # Publisher task not started: nothing drains the queue
+        for i in range(10):
+            await store.publish_frame("s1", KIND_BYTES, bytes([i]))
+        return store
+
+    store = run(scenario())
+    assert store.frames_dropped == 6
+    assert [message[-1] for _, message in store._outbox] == [6, 7, 8, 9]
+
+
+def test_redis_store_drops_sessions_it_no_longer_owns():
+    pytest.importorskip("lupa")
+
+    async def scenario():
+        first, second = make_stores(2)
+        first.OWNER_TTL_SECONDS = 1  # refresh every third of a second
+        lost = []
+        first.on_ownership_lost = lost.append
+        assert await first.claim_session("s1")
+        await first.start()
+        # The key expired during an outage and another worker took the session over
+        await first.redis.delete(first._owner_key("s1"))
+        assert await second.claim_session("s1")
+        await settle(lambda: lost)
+        owned = set(first._owned)
+        assert not await first.claim_session("s1")
+        await first.close()
+        return lost, owned
+
+    lost, owned = run(scenario())
+    assert lost == ["s1"]
+    assert owned == set()